@@ -1,23 +1,19 @@
 %% 2024 vs 2021 AIR TEMPERATURE ANALYSIS — MATLAB VERSION 
 clc; clear; close all;
 
-file_path = "данныепроекта.xlsx";
+file_path = "flood_exchange.mat";   % python -m flood.exchange (очищенные данные хранилища)
 
-opts = detectImportOptions(file_path, 'VariableNamingRule','preserve');
-T = readtable(file_path, opts);
+S = load(file_path);
+D = S.air;
 
-T.Properties.VariableNames = { ...
-    'region','station_id','station_name','date','t_mean','t_max','t_min'};
-
-allEmpty = all(ismissing(T), 2);
-T(allEmpty,:) = [];
-
-T.date = datetime(T.date,'InputFormat','dd.MM.yyyy','Format','dd.MM.yyyy');
-
-numVars = ["t_mean","t_max","t_min"];
-for v = numVars
-    T.(v) = str2double(string(T.(v)));
-end
+T = table();
+T.region = cellstr(S.stations.region(D.station, :));
+T.station_id = cellstr(S.stations.station_id(D.station, :));
+T.station_name = cellstr(S.stations.name(D.station, :));
+T.date = datetime(D.date, 'ConvertFrom','datenum', 'Format','dd.MM.yyyy');
+T.t_mean = D.t_mean;
+T.t_max = D.t_max;
+T.t_min = D.t_min;
 
 T.year  = year(T.date);
 T.month = month(T.date);
@@ -66,14 +62,14 @@ print('raznica2024vs2021','-dpng','-r300');
 % --- 2024 ---
 T24s = sortrows(T24, ["station_id","date"]);
 G24 = findgroups(T24s.station_id);
-d24_cell = splitapply(@(x){[NaN; diff(x)]}, T24s.t_mean, G24);
-T24s.dT = vertcat(d24_cell{:});
+T24s.dT = [NaN; diff(T24s.t_mean)];
+T24s.dT([true; diff(G24) ~= 0]) = NaN;   % первая строка каждой станции
 
 % --- 2021 ---
 T21s = sortrows(T21, ["station_id","date"]);
 G21 = findgroups(T21s.station_id);
-d21_cell = splitapply(@(x){[NaN; diff(x)]}, T21s.t_mean, G21);
-T21s.dT = vertcat(d21_cell{:});
+T21s.dT = [NaN; diff(T21s.t_mean)];
+T21s.dT([true; diff(G21) ~= 0]) = NaN;   % первая строка каждой станции
 
 % Average dT/dt by date
 dT24 = groupsummary(T24s, "date", "mean", "dT");
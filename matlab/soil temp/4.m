@@ -2,25 +2,19 @@
 
 clc; clear; close all;
 
-file_path = "почва.xlsx";
+file_path = "flood_exchange.mat";   % python -m flood.exchange (очищенные данные хранилища)
 
-opts = detectImportOptions(file_path, 'VariableNamingRule','preserve');
-opts.DataRange = '2:100000';       
-T = readtable(file_path, opts);
+S = load(file_path);
+D = S.soil;
 
-T.Properties.VariableNames(1:7) = { ...
-    'region','station_id','station_name','date','t_mean','t_max','t_min'};
-
-allEmpty = all(ismissing(T), 2);
-T(allEmpty, :) = [];
-
-T.date = datetime(T.date, 'InputFormat','dd.MM.yyyy', 'Format','dd.MM.yyyy');
-
-numVars = {'t_mean','t_max','t_min'};
-for i = 1:numel(numVars)
-    v = T.(numVars{i});
-    T.(numVars{i}) = str2double(string(v));  
-end
+T = table();
+T.region = cellstr(S.stations.region(D.station, :));
+T.station_id = cellstr(S.stations.station_id(D.station, :));
+T.station_name = cellstr(S.stations.name(D.station, :));
+T.date = datetime(D.date, 'ConvertFrom','datenum', 'Format','dd.MM.yyyy');
+T.t_mean = D.t_mean;
+T.t_max = D.t_max;
+T.t_min = D.t_min;
 
 T.year = year(T.date);
 T.month = month(T.date);
@@ -48,14 +42,10 @@ for y = years'
     yearT = sortrows(yearT, {'station_id','date'});
 
     %% dT_dt 
-    yearT.dT_dt = NaN(height(yearT),1);
+    % строки отсортированы по станции: разность соседних, на границе станций NaN
     G = findgroups(yearT.station_id);
-
-    for g = 1:max(G)
-        rows = find(G == g);
-        vals = yearT.t_mean(rows);
-        yearT.dT_dt(rows) = [NaN; diff(vals)];  
-    end
+    yearT.dT_dt = [NaN; diff(yearT.t_mean)];
+    yearT.dT_dt([true; diff(G) ~= 0]) = NaN;
 
     %% first_thaw 
     [G2, reg2, st2] = findgroups(yearT.region, yearT.station_id);
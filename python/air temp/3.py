@@ -4,6 +4,11 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from matplotlib.dates import DateFormatter
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from flood import events, qc
 
 file_path = "данныепроекта.xlsx"   
 df = pd.read_excel(file_path, header=0)
@@ -31,6 +36,11 @@ df['t_mean'] = pd.to_numeric(df['t_mean'], errors='coerce')
 df['t_max'] = pd.to_numeric(df['t_max'], errors='coerce')
 df['t_min'] = pd.to_numeric(df['t_min'], errors='coerce')
 
+# контроль качества: значения с флагами (выбросы, скачки, Мин>Сред и т.п.) -> NaN
+for name, flags in qc.run(df).items():
+    df[name] = flags
+df = qc.apply(df)
+
 df['year'] = df['date'].dt.year
 df['month'] = df['date'].dt.month
 df['day'] = df['date'].dt.day
@@ -72,7 +82,9 @@ plt.xticks(rotation=45)
 plt.savefig('airtemp2024')
 plt.show()
 
-top10 = df.groupby('station_id')['dT_dt'].max().sort_values(ascending=False).head(10)
+# каталог экстремумов: все скачки, а не один максимум на станцию
+catalogue = events.scan(df, k=10, temp='t_mean')
+top10 = events.to_frame(catalogue, 'jump')
 
 print("\nТОП-10 резких скачков температуры (dT/dt):")
 print(top10)
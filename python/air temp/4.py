@@ -5,6 +5,11 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from matplotlib.dates import DateFormatter
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from flood import events
 
 file_path = "данныепроекта.xlsx"
 
@@ -57,11 +62,8 @@ for year in sorted(df['year'].unique()):
                            .reset_index())
     first_thaw.columns = ['region', 'station_id', 'first_thaw_date']
 
-    # ТОП скачков температуры
-    top_jumps = (year_df.groupby('station_id')['dT_dt']
-                 .max()
-                 .sort_values(ascending=False)
-                 .head(10))
+    # ТОП скачков температуры (каталог событий: у станции может быть несколько скачков)
+    top_jumps = events.to_frame(events.scan(year_df, k=10, temp='t_mean'), 'jump')
 
     # средняя температура по месяцам
     monthly_mean = (year_df.groupby(['region', 'month'])['t_mean']
@@ -87,6 +89,10 @@ for year in results:
     print("\nСредняя температура по месяцам:")
     print(results[year]['monthly_mean'])
 
+# экстремумы сразу по всем годам: прогревы, скачки, оттепели с возвратом мороза
+print("\n=== КАТАЛОГ СОБЫТИЙ (все годы) ===")
+print(events.to_frame(events.scan(df, k=10, temp='t_mean')))
+
 unique_years = sorted(df['year'].unique())
 num_years = len(unique_years)
 
@@ -0,0 +1 @@
+"""Общий код для скриптов анализа паводков 2024 (модель, данные, кэши)."""
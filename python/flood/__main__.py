@@ -0,0 +1,268 @@
+"""Единая точка входа: python -m flood <команда> [параметры]
+
+Запуск из папки python:
+
+  python -m flood ingest [файл.xlsx]        листы Excel и сроки SYNOP -> хранилище, станции, QC
+  python -m flood simulate [--years ...]    окна сезона от раскрученного профиля -> results
+  python -m flood thaw-stats [--years ...]  первый переход через 0 и сход снега
+  python -m flood compare [--years ...]     2024 против 2021: средние за месяц, скачки
+  python -m flood map                       карта станций (folium)
+  python -m flood report [--years ...]      бюллетень по регионам (HTML/PDF)
+  python -m flood scenario конфиг.toml ...  сценарии из конфигов с кэшем этапов
+
+Тяжёлые модули (pandas, scipy, matplotlib, folium) импортируются внутри
+команд, а не здесь: справка и разбор аргументов не ждут их загрузки.
+"""
+
+import argparse
+import os
+import sys
+
+FILEPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "данныепроекта.xlsx")
+YEARS = [2021, 2024]
+SEASON = ("02-01", "05-01")  # окно сезона внутри года (ММ-ДД)
+SPINUP_FROM = "2020-10-01"   # одна цепочка раскрутки на все годы
+FORCING_TABLE = "forcing"
+SYNOP_CACHE = os.path.join("cache", "synop")  # кэш python -m flood.synop_fetch
+# таблица хранилища -> (лист Excel, колонки: None — все как есть, иначе имя схемы в store)
+SHEETS = {
+    "forcing": (0, None),
+    "air_temp": (0, "AIR_FROM_COMBINED"),  # t_air_* общего листа -> t_mean/t_max/t_min
+    "soil_temp": ("темп почвы", None),
+}
+
+
+def _window(year):
+    return f"{year}-{SEASON[0]}", f"{year}-{SEASON[1]}"
+
+
+# КОМАНДЫ
+def ingest(args):
+    """Листы -> хранилище, станции по названию (как air temp/2.py), флаги QC"""
+    from . import qc, stations, store
+
+    for table, (sheet, columns) in SHEETS.items():
+        columns = None if columns is None else getattr(store, columns)
+        loaded = store.import_sheet(args.file, sheet, table, force=args.force, columns=columns)
+        columns = store.read_meta(table)["columns"]
+        changed = []
+        if "station_name" in columns:
+            names = store.read_table(table, ["station_name"])["station_name"]
+            stn_id, region = stations.lookup(names)
+            update = {"region": region, "station_id": stn_id}
+            changed = store.changed_rows(table, update)
+            if len(changed):
+                store.write_columns(table, update)
+        if args.qc and (loaded or len(changed)):
+            qc.run_table(table)
+        print(f"{table}: {'загружен' if loaded else 'без изменений'}, станций исправлено в {len(changed)} строках")
+
+    # сроки SYNOP хранятся как есть, суточные колонки выводятся из них по запросу
+    if os.path.isdir(args.synop):
+        from . import synop
+
+        loaded = synop.store_terms(args.synop, force=args.force)
+        daily = synop.daily_table()
+        print(f"{synop.SYNOP_TABLE}: {'загружен' if loaded else 'без изменений'}, станций-суток {len(daily)}")
+
+
+def simulate(args):
+    """Окна сезона по годам от раскрученного профиля (как heat equation/4.py)"""
+    import pandas as pd
+
+    from . import api, basins, heat, spinup, store
+
+    df = store.read_table(FORCING_TABLE)
+    results = []
+    for station in sorted(df["station_id"].dropna().unique()):
+        dfd = heat.station_days(df, station)
+        if dfd.empty:
+            continue
+        profiles, dates = [], []
+        for year in args.years:
+            _, res = spinup.run_window(station, dfd, *_window(year), start=args.spinup_from,
+                                       profiles=profiles if args.profiles else None)
+            res["station_id"] = station
+            res["region"] = dfd["region"].iloc[0]
+            res["year"] = year
+            results.append(res)
+            dates.append(res["date"])
+        if args.profiles:
+            # поле T(z, t) для /profile сервиса: пирамида уровней по станции
+            api.publish_profiles(station, pd.concat(dates), heat.z, profiles)
+    results = pd.concat(results, ignore_index=True)
+    if args.publish:
+        api.publish_results(results)
+
+    print(results.groupby(["region", "year"]).agg(
+        {"M_rate": ["sum", "max"], "Z_0C": "max", "Q_stok": "sum"}).round(1).to_string())
+    basin = basins.basin_runoff(results)
+    basin["year"] = basin["date"].dt.year
+    print(basin.groupby(["basin", "year"]).agg({"Q_stok_mm": "sum", "inflow_m3s": "max"}).round(1).to_string())
+
+    if args.richards:
+        # влагоперенос по Ричардсу: влага раскручивается с осени вместе с теплом
+        from . import richards
+
+        moist = pd.concat([richards.run(df, *_window(year)).assign(year=year) for year in args.years],
+                          ignore_index=True)
+        print(moist.groupby(["region", "year"]).agg(
+            {"supply": "sum", "q_infil": "sum", "Q_stok": "sum", "theta_30": "mean", "ice_30": "mean"}
+        ).round(3).to_string())
+
+    if args.enkf:
+        # усвоение t_soil_mean: состояние ансамбля продолжается с сохранённого (checkpoints/enkf)
+        from . import enkf
+
+        region = df.drop_duplicates("station_id").set_index("station_id")["region"]
+        res = pd.concat([enkf.run(df, *_window(year))[1].assign(year=year) for year in args.years],
+                        ignore_index=True)
+        res["region"] = res["station_id"].map(region)
+        res["innov"] = (res["T_obs"] - res["T_forecast"]).abs()
+        print(res.groupby(["region", "year"]).agg(
+            {"innov": "mean", "bias": "mean", "inflation": "mean", "Z_0C": "max"}).round(2).to_string())
+
+
+def thaw_stats(args):
+    """По регионам и годам: медианные даты первого перехода через 0 и схода снега"""
+    import pandas as pd
+
+    from . import qc, snowstate
+
+    df = qc.read_clean(args.table, ["station_id", "region", "date", args.temp])
+    rows = []
+    for year in args.years:
+        start, end = _window(year)
+        part = df[(df["date"] >= start) & (df["date"] < end)].dropna(subset=["station_id"])
+        if part.empty:
+            continue
+        warm = part[part[args.temp] > 0].groupby("station_id", observed=True)["date"].min()
+        _, tr = snowstate.classify_frame(part, temp=args.temp)
+        melted = tr[tr["to_state"] == snowstate.LABELS[snowstate.MELTED]]
+        thaw = melted.groupby("station_id", observed=True)["date"].max()
+        refreeze = tr[tr["to_state"] == snowstate.LABELS[snowstate.FROZEN]].groupby(
+            "station_id", observed=True).size()
+        st = pd.DataFrame({"first_above_0": warm, "snow_off": thaw, "refreezes": refreeze})
+        st["region"] = part.groupby("station_id", observed=True)["region"].first()
+        st["year"] = year
+        rows.append(st.reset_index(names="station_id"))
+    st = pd.concat(rows, ignore_index=True)
+    st["refreezes"] = st["refreezes"].fillna(0).astype(int)
+
+    out = st.groupby(["region", "year"]).agg(
+        stations=("station_id", "count"),
+        first_above_0=("first_above_0", "median"), snow_off=("snow_off", "median"),
+        refreezes=("refreezes", "mean"))
+    for c in ("first_above_0", "snow_off"):
+        out[c] = out[c].dt.strftime("%d.%m")
+    print(out.round(1).to_string())
+    if args.stations:
+        print(st.to_string(index=False))
+
+
+def compare(args):
+    """Средние за месяц по регионам по годам, разность лет и сильнейшие скачки (как air temp/4.py)"""
+    from . import events, qc
+
+    df = qc.read_clean(args.table, ["station_id", "region", "date", args.temp])
+    df = df[df["date"].dt.year.isin(args.years) & df["date"].dt.month.isin([2, 3, 4])]
+    df = df.assign(year=df["date"].dt.year, month=df["date"].dt.month)
+
+    monthly = df.groupby(["region", "month", "year"], observed=True)[args.temp].mean().unstack("year")
+    first, last = min(args.years), max(args.years)
+    if first in monthly and last in monthly:
+        monthly[f"{last}-{first}"] = monthly[last] - monthly[first]
+    print(f"Средняя {args.temp} по месяцам:")
+    print(monthly.round(2).to_string())
+
+    for year in args.years:
+        jumps = events.to_frame(events.scan(df[df["year"] == year], k=args.top, temp=args.temp), "jump")
+        print(f"\n{year}: топ-{args.top} суточных скачков")
+        print(jumps.to_string(index=False))
+
+
+def map_(args):
+    from . import stationmap
+
+    print(stationmap.build(args.out, open_browser=not args.no_open))
+
+
+def report(args):
+    from . import report as bulletin
+
+    for path in bulletin.build(args.years, workers=args.workers, pdf=not args.no_pdf):
+        print(path)
+
+
+def scenario(args):
+    from . import scenario as scenarios
+
+    for path in args.configs:
+        out = scenarios.run(path)
+        stages = ", ".join(f"{s} {'кэш' if out['reused'][s] else 'расчёт'}" for s in scenarios.STAGES)
+        print(f"\n=== {out['name']}: {stages}")
+        print(scenarios.summary(out["results"]).to_string())
+
+
+# РАЗБОР АРГУМЕНТОВ
+def parser():
+    p = argparse.ArgumentParser(prog="python -m flood", description="Паводок: данные, модель, отчёты")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    def years(cmd):
+        cmd.add_argument("--years", type=int, nargs="+", default=YEARS)
+
+    cmd = sub.add_parser("ingest", help="листы Excel -> хранилище")
+    cmd.add_argument("file", nargs="?", default=FILEPATH)
+    cmd.add_argument("--force", action="store_true", help="перечитать листы, даже если файл не менялся")
+    cmd.add_argument("--no-qc", dest="qc", action="store_false", help="не пересчитывать флаги QC")
+    cmd.add_argument("--synop", default=SYNOP_CACHE, help="кэш сводок SYNOP (если есть)")
+    cmd.set_defaults(run=ingest)
+
+    cmd = sub.add_parser("simulate", help="тепловая модель по окнам сезона")
+    years(cmd)
+    cmd.add_argument("--spinup-from", default=SPINUP_FROM)
+    cmd.add_argument("--no-publish", dest="publish", action="store_false", help="не записывать results")
+    cmd.add_argument("--richards", action="store_true", help="и влагоперенос по Ричардсу (richards.run)")
+    cmd.add_argument("--profiles", action="store_true", help="сохранить поля T(z, t) для /profile сервиса")
+    cmd.add_argument("--enkf", action="store_true", help="и усвоение температуры почвы (enkf.run)")
+    cmd.set_defaults(run=simulate)
+
+    cmd = sub.add_parser("thaw-stats", help="переход через 0 и сход снега")
+    years(cmd)
+    cmd.add_argument("--table", default=FORCING_TABLE)
+    cmd.add_argument("--temp", default="t_soil_mean")
+    cmd.add_argument("--stations", action="store_true", help="и таблицу по станциям")
+    cmd.set_defaults(run=thaw_stats)
+
+    cmd = sub.add_parser("compare", help="сравнение лет по регионам")
+    years(cmd)
+    cmd.add_argument("--table", default=FORCING_TABLE)
+    cmd.add_argument("--temp", default="t_air_mean")
+    cmd.add_argument("--top", type=int, default=10)
+    cmd.set_defaults(run=compare)
+
+    cmd = sub.add_parser("map", help="карта станций")
+    cmd.add_argument("--out", default="kaz_flood_2024.html")
+    cmd.add_argument("--no-open", action="store_true", help="не открывать в браузере")
+    cmd.set_defaults(run=map_)
+
+    cmd = sub.add_parser("report", help="бюллетень по регионам")
+    years(cmd)
+    cmd.add_argument("--workers", type=int, default=None)
+    cmd.add_argument("--no-pdf", action="store_true")
+    cmd.set_defaults(run=report)
+
+    cmd = sub.add_parser("scenario", help="сценарии из TOML-конфигов")
+    cmd.add_argument("configs", nargs="+")
+    cmd.set_defaults(run=scenario)
+    return p
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,234 @@
+"""Локальный HTTP-сервис результатов модели для дашбордов
+
+Запуск из папки python:  python -m flood.api [порт]
+
+  /stations
+  /station?id=KZ-ZAP-01&start=2024-02-01&end=2024-04-30&vars=Z_0C,Q_stok
+  /region?id=KZ-ZAP&start=...&end=...        (среднее по станциям региона)
+      &points=N — не больше ~N дат на переменную (LTTB, пики сохраняются)
+  /summary?id=KZ-ZAP&year=2024               (суммы таяния/стока, max Z_0C)
+  /profile?id=KZ-ZAP-01&start=...&end=...&width=800&height=200
+      поле T(z, t) станции с уровня пирамиды (downsample): mean/min/max
+
+Пирамиды профилей пишет publish_profiles (python -m flood simulate --profiles).
+"""
+
+import json
+import os
+import sys
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from . import downsample, stations, store
+
+RESULTS_TABLE = "results"
+PROFILE_DIR = "profiles"  # в хранилище: пирамида T(z, t) на станцию
+WIDTH = 1000
+VARIABLES = ["Z_0C", "M_rate", "q_infil", "Q_stok"]
+HOST, PORT = "127.0.0.1", 8050
+CACHE_SIZE = 512
+PATHS = ("/stations", "/station", "/region", "/summary", "/profile")
+
+_lock = threading.Lock()
+_loaded = {"version": None}
+
+
+def publish_results(results, root=store.STORE_DIR):
+    """Записать таблицу результатов (station_id, date, VARIABLES) отсортированной по станции и дате"""
+    df = results[["station_id", "date"] + VARIABLES].copy()
+    stations.encode(df)
+    df = df.dropna(subset=["station_id"])
+    df["date"] = pd.to_datetime(df["date"])
+    df = df.sort_values(["station_id", "date"]).reset_index(drop=True)
+    store.write_table(RESULTS_TABLE, df, root)
+
+
+def publish_profiles(station, dates, z, T, root=store.STORE_DIR):
+    """Поле T (сутки x глубина) станции -> пирамида уровней для /profile"""
+    path = os.path.join(root, PROFILE_DIR, station)
+    levels = downsample.build_pyramid(np.asarray(T, dtype=float), np.asarray(dates, dtype="datetime64[ns]"), z)
+    downsample.save_pyramid(levels, path)
+    return path
+
+
+def _arrays(root=store.STORE_DIR):
+    """Memmap-массивы результатов; перечитываются, если таблица обновилась"""
+    version = store.read_meta(RESULTS_TABLE, root)["version"]
+    with _lock:
+        if _loaded["version"] != version:
+            arr = store.read_arrays(RESULTS_TABLE, root=root)
+            codes = np.asarray(arr["station_id"])
+            # границы блоков станций в отсортированной таблице
+            n_st = len(stations.STATIONS)
+            offsets = np.searchsorted(codes, np.arange(n_st + 1))
+            _loaded.update(version=version, arrays=arr, offsets=offsets)
+        return _loaded["version"], _loaded["arrays"], _loaded["offsets"]
+
+
+def _station_slice(arr, offsets, code, start, end):
+    lo, hi = offsets[code], offsets[code + 1]
+    dates = arr["date"][lo:hi]
+    i0 = lo + np.searchsorted(dates, start, side="left")
+    i1 = lo + np.searchsorted(dates, end, side="right")
+    return slice(i0, i1)
+
+
+def _to_list(values):
+    values = np.asarray(values, dtype=float)
+    return [None if np.isnan(v) else round(float(v), 4) for v in values]
+
+
+def _dates(values):
+    return [str(d)[:10] for d in np.asarray(values, dtype="datetime64[D]")]
+
+
+def _period(q):
+    start = np.datetime64(q.get("start", "1900-01-01"), "ns")
+    end = np.datetime64(q.get("end", "2100-01-01"), "ns")
+    return start, end
+
+
+def _thin(out, variables, points):
+    """Общие даты для всех переменных: объединение точек LTTB каждой"""
+    if not points or len(out["date"]) <= points:
+        return out
+    x = np.arange(len(out["date"]), dtype=float)
+    idx = np.unique(np.concatenate([downsample.lttb(x, np.array(out[v], dtype=float), points)
+                                    for v in variables] + [np.array([0, len(x) - 1])]))
+    for k in ["date"] + list(variables):
+        out[k] = [out[k][i] for i in idx]
+    return out
+
+
+def query_station(arr, offsets, station, start, end, variables, points=None):
+    code = stations.STATION_DTYPE.categories.get_loc(station)
+    sl = _station_slice(arr, offsets, code, start, end)
+    out = {"station": station, "date": _dates(arr["date"][sl])}
+    for v in variables:
+        out[v] = _to_list(arr[v][sl])
+    return _thin(out, variables, points)
+
+
+def query_region(arr, offsets, region, start, end, variables, points=None):
+    reg_code = stations.REGION_CODES.index(region)
+    codes = np.flatnonzero(stations.STATION_REGION == reg_code)
+    slices = [_station_slice(arr, offsets, c, start, end) for c in codes]
+
+    dates = np.concatenate([arr["date"][sl] for sl in slices])
+    days, inv = np.unique(dates, return_inverse=True)
+    out = {"region": region, "date": _dates(days), "n_stations": int(sum(sl.stop > sl.start for sl in slices))}
+    for v in variables:
+        vals = np.concatenate([arr[v][sl] for sl in slices]).astype(float)
+        ok = ~np.isnan(vals)
+        s = np.bincount(inv[ok], weights=vals[ok], minlength=len(days))
+        n = np.bincount(inv[ok], minlength=len(days))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[v] = _to_list(s / n)
+    return _thin(out, variables, points)
+
+
+def query_summary(arr, offsets, region, year):
+    start = np.datetime64(f"{year}-01-01", "ns")
+    end = np.datetime64(f"{year}-12-31", "ns")
+    reg = query_region(arr, offsets, region, start, end, VARIABLES)
+    vals = {v: np.array(reg[v], dtype=float) for v in VARIABLES}
+    return {
+        "region": region, "year": int(year),
+        "M_rate_sum": round(float(np.nansum(vals["M_rate"])), 1),
+        "M_rate_max": round(float(np.nanmax(vals["M_rate"], initial=0)), 1),
+        "Z_0C_max": round(float(np.nanmax(vals["Z_0C"], initial=0)), 2),
+        "q_infil_sum": round(float(np.nansum(vals["q_infil"])), 1),
+        "Q_stok_sum": round(float(np.nansum(vals["Q_stok"])), 1),
+    }
+
+
+def _json(data):
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def profile_response(query, root=store.STORE_DIR):
+    """Окно поля T(z, t) станции под экран width x height"""
+    q = dict(query)
+    station = q["id"]
+    if station not in stations.STATION_DTYPE.categories:
+        raise KeyError(station)
+    levels = downsample.load_pyramid(os.path.join(root, PROFILE_DIR, station))
+    height = int(q["height"]) if "height" in q else None
+    v = downsample.view(levels, *_period(q), int(q.get("width", WIDTH)), height)
+    data = {"station": station, "level": v["level"], "date": _dates(v["t"]), "z": _to_list(v["z"])}
+    for s in downsample.STATS:
+        data[s] = [_to_list(row) for row in v[s]]
+    return _json(data)
+
+
+def stations_response():
+    """Реестр станций: не зависит от таблицы результатов"""
+    reg = stations.load_registry()
+    return _json([{"station_id": s, "name": n, "region": r}
+                  for s, n, r in zip(reg["station_id"], reg["name"], reg["region"])])
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _response(version, path, query, root):
+    """Готовый JSON-ответ; ключ включает версию таблицы результатов"""
+    _, arr, offsets = _arrays(root)
+    q = dict(query)
+    variables = [v for v in q.get("vars", ",".join(VARIABLES)).split(",") if v in VARIABLES]
+    points = int(q["points"]) if "points" in q else None
+
+    if path == "/station":
+        data = query_station(arr, offsets, q["id"], *_period(q), variables, points)
+    elif path == "/region":
+        data = query_region(arr, offsets, q["id"], *_period(q), variables, points)
+    elif path == "/summary":
+        data = query_summary(arr, offsets, q["id"], int(q["year"]))
+    else:
+        raise KeyError(path)
+    return _json(data)
+
+
+class Handler(BaseHTTPRequestHandler):
+    root = store.STORE_DIR
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = tuple(sorted((k, v[-1]) for k, v in parse_qs(url.query).items()))
+        try:
+            if url.path not in PATHS:
+                body, status = _json({"error": f"not found: {url.path}"}), 404
+            elif url.path == "/stations":
+                body, status = stations_response(), 200
+            elif url.path == "/profile":
+                body, status = profile_response(query, self.root), 200
+            else:
+                version, _, _ = _arrays(self.root)
+                body, status = _response(version, url.path, query, self.root), 200
+        except FileNotFoundError:
+            body, status = _json({"error": "not published"}), 503
+        except (KeyError, ValueError) as e:
+            body, status = _json({"error": f"bad request: {e}"}), 400
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host=HOST, port=PORT, root=store.STORE_DIR):
+    Handler.root = root
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Сервис результатов: http://{host}:{port}/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    serve(port=int(sys.argv[1]) if len(sys.argv) > 1 else PORT)
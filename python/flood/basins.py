@@ -0,0 +1,133 @@
+"""Сток станций (или ячеек сетки) -> приток по речным бассейнам
+
+Паводок идёт по бассейнам, а не по областям. Связь источников
+(станций или ячеек сетки) с бассейнами задаётся разреженной матрицей
+весов W (бассейны x источники), строки которой в сумме дают 1. Тогда
+суточная матрица стока X (сутки x источники) переводится в слой стока
+по бассейнам одним умножением X @ W.T, сколько бы ни было источников.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+BASINS = ["TOBOL", "URAL", "ILEK", "ESIL"]
+BASIN_NAMES = {"TOBOL": "Тобол", "URAL": "Урал", "ILEK": "Илек", "ESIL": "Есиль"}
+# площади водосборов, км² (Урал — до Атырау без Илека)
+BASIN_AREA_KM2 = {"TOBOL": 426000, "URAL": 190000, "ILEK": 41300, "ESIL": 177000}
+
+# станции по бассейнам, приближённо по положению; если есть координаты
+# станций и сетка бассейнов, веса лучше брать по Тиссену (thiessen_weights)
+BASIN_STATIONS = {
+    "TOBOL": ["KZ-KUS-06", "KZ-KUS-07", "KZ-KUS-08", "KZ-KUS-11", "KZ-KUS-12",
+              "KZ-KUS-13", "KZ-KUS-15", "KZ-KUS-16", "KZ-KUS-17"],
+    "URAL": ["KZ-ZAP-01", "KZ-ZAP-02", "KZ-ZAP-08", "KZ-ZAP-10", "KZ-ZAP-12",
+             "KZ-ATY-01", "KZ-ATY-03", "KZ-ATY-06", "KZ-ATY-10"],
+    "ILEK": ["KZ-AKT-01", "KZ-AKT-08", "KZ-AKT-09", "KZ-AKT-11", "KZ-AKT-13"],
+    "ESIL": ["KZ-SEV-01", "KZ-SEV-02", "KZ-SEV-05", "KZ-SEV-06", "KZ-SEV-07",
+             "KZ-SEV-08", "KZ-SEV-09", "KZ-SEV-11", "KZ-SEV-12"],
+}
+
+MM_KM2_PER_DAY = 1e3 / 86400  # 1 мм/сут с 1 км² -> м³/с
+
+
+def _normalized(rows, cols, vals, n_sources):
+    """csr (бассейны x источники) со строками, нормированными на 1"""
+    W = sparse.csr_matrix((vals, (rows, cols)), shape=(len(BASINS), n_sources))
+    W.sum_duplicates()
+    total = np.asarray(W.sum(axis=1)).ravel()
+    scale = np.divide(1.0, total, out=np.zeros_like(total), where=total > 0)
+    return sparse.diags(scale) @ W
+
+
+def station_weights(station_ids, assignment=BASIN_STATIONS):
+    """Равные веса станций бассейна -> csr (бассейны x станции в порядке station_ids)"""
+    index = {s: j for j, s in enumerate(station_ids)}
+    rows, cols = [], []
+    for b, basin in enumerate(BASINS):
+        for s in assignment.get(basin, []):
+            if s in index:
+                rows.append(b)
+                cols.append(index[s])
+    return _normalized(rows, cols, np.ones(len(rows)), len(station_ids))
+
+
+def _project(lon, lat, lat0):
+    """Долгота/широта -> плоские км (равнопромежуточная около lat0)"""
+    lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+    return np.column_stack([lon * 111.32 * np.cos(np.radians(lat0)), lat * 110.57])
+
+
+def thiessen_weights(cell_lon, cell_lat, cell_basin, cell_area, station_lon, station_lat):
+    """Веса по полигонам Тиссена, построенным на сетке бассейнов.
+
+    Каждая ячейка (cell_basin — индекс в BASINS, -1 вне бассейнов)
+    относится к ближайшей станции; вес станции в бассейне — доля площади
+    его ячеек, ближайших к ней. Станции без координат (NaN) не участвуют.
+    """
+    cell_basin = np.asarray(cell_basin)
+    inside = cell_basin >= 0
+    station_lon = np.asarray(station_lon, dtype=float)
+    station_lat = np.asarray(station_lat, dtype=float)
+    known = np.flatnonzero(~(np.isnan(station_lon) | np.isnan(station_lat)))
+
+    lat0 = np.nanmean(station_lat)
+    tree = cKDTree(_project(station_lon[known], station_lat[known], lat0))
+    _, nearest = tree.query(_project(np.asarray(cell_lon)[inside], np.asarray(cell_lat)[inside], lat0))
+    area = np.broadcast_to(np.asarray(cell_area, dtype=float), cell_basin.shape)[inside]
+    return _normalized(cell_basin[inside], known[nearest], area, len(station_lon))
+
+
+def cell_weights(cell_basin, cell_area):
+    """Сеточный вход: ячейка сама себе источник -> csr (бассейны x ячейки)"""
+    cell_basin = np.asarray(cell_basin)
+    cols = np.flatnonzero(cell_basin >= 0)
+    area = np.broadcast_to(np.asarray(cell_area, dtype=float), cell_basin.shape)[cols]
+    return _normalized(cell_basin[cols], cols, area, len(cell_basin))
+
+
+def aggregate(X, W):
+    """Слой по бассейнам (сутки x бассейны) из X (сутки x источники).
+
+    Пропуски (NaN) не обнуляют бассейн: веса в каждые сутки
+    перенормируются на источники с данными; бассейн без данных -> NaN.
+    """
+    X = np.asarray(X, dtype=float)
+    ok = ~np.isnan(X)
+    WT = W.T.tocsr()
+    num = np.asarray(np.where(ok, X, 0.0) @ WT)
+    den = np.asarray(ok.astype(float) @ WT)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den > 0, num / den, np.nan)
+
+
+def station_matrix(results, column, station_ids=None):
+    """Длинная таблица (station_id, date, column) -> (даты, станции, матрица сутки x станции)"""
+    wide = results.pivot_table(index="date", columns="station_id", values=column,
+                               aggfunc="mean", observed=True)
+    if station_ids is not None:
+        wide = wide.reindex(columns=station_ids)
+    return wide.index, list(wide.columns), wide.to_numpy(dtype=float)
+
+
+def basin_runoff(results, column="Q_stok", W=None):
+    """Суточный приток по бассейнам: слой, мм/сут, и расход, м³/с.
+
+    results — таблица результатов модели по станциям (как в скриптах
+    heat equation); W по умолчанию — station_weights по BASIN_STATIONS.
+    """
+    dates, ids, X = station_matrix(results, column)
+    ids = [str(s) for s in ids]
+    W = station_weights(ids) if W is None else W
+    depth = aggregate(X, W)
+    area = np.array([BASIN_AREA_KM2[b] for b in BASINS], dtype=float)
+
+    out = pd.DataFrame({
+        "basin": np.tile(BASINS, len(dates)),
+        "date": np.repeat(np.asarray(dates), len(BASINS)),
+        f"{column}_mm": depth.ravel(),
+        "inflow_m3s": (depth * area * MM_KM2_PER_DAY).ravel(),
+    })
+    out["basin"] = out["basin"].map(BASIN_NAMES)
+    return out
@@ -0,0 +1,272 @@
+"""Калибровка kappa по регионам, множителей по шифру почвы и k_snow (сопряжённый градиент)
+
+Тепловая модель (неявный Эйлер, как heat.solve_step) считается сразу для
+всех станций: сверху — температура поверхности по воздуху и снегу
+(t_air · exp(-k_snow·H), ветка heat.surface_bc без наблюдений почвы),
+наблюдения почвы в граничное условие не идут. Невязка —
+среднеквадратичное отклонение модели на глубине OBS_DEPTH от
+t_soil_mean, с дня start (до него — прогрев профиля WARMUP_DAYS суток).
+
+Ошибка такой поверхности (снег) намного больше, чем вклад kappa: если
+подбирать одну kappa, она уходит на границы и подменяет собой поправку
+к поверхности. Поэтому k_snow подбирается вместе с kappa, а параметры,
+упёршиеся в границы LOG_BOUND, перечисляются в результате с
+предупреждением — такие значения переносить в heat нельзя.
+
+Градиент невязки по всем параметрам — один прямой и один сопряжённый
+проход: A_n T_n = P T_{n-1} + e0·Tsurf_n,
+            A_n^T λ_n = ∂J/∂T_n + P λ_{n+1},
+            ∂J/∂κ_n = -λ_n · (∂A/∂κ) T_n,   ∂J/∂Tsurf_n = λ_n[0].
+Системы трёхдиагональные, транспонированная решается той же прогонкой.
+L-BFGS по логарифмам параметров сходится за десятки таких проходов.
+
+Параметры: kappa каждого региона, множитель каждого шифра почвы,
+кроме опорного REFERENCE_CODE (=1.0, иначе kappa и множители
+неразличимы), и k_snow. К невязке добавлен слабый штраф за уход от
+табличных значений heat — параметры, о которых данные ничего не
+говорят, остаются табличными.
+
+Запуск из папки python:  python -m flood.calibrate [начало] [конец]
+"""
+
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+
+from . import heat, spinup, store
+from .richards import thomas
+
+OBS_DEPTH = 0.05     # м, глубина, с которой сравнивается t_soil_mean
+WARMUP_DAYS = 60     # суток прогрева профиля до начала невязки
+REFERENCE_CODE = 1   # множитель этого шифра фиксирован = 1
+CODES = sorted(heat.KAPPA_FACTOR_BY_SOILCODE)
+PRIOR_WEIGHT = 0.01  # штраф (ln p - ln p_табл)², в единицах °C²
+LOG_BOUND = np.log(4.0)  # параметры в пределах x4 от табличных
+MAX_ITER = 50
+
+
+# ПАРАМЕТРЫ
+def _free_codes():
+    return [c for c in CODES if c != REFERENCE_CODE]
+
+
+def names():
+    """Имена параметров в порядке вектора"""
+    return [f"kappa[{r}]" for r in heat.REGIONS] + [f"factor[{c}]" for c in _free_codes()] + ["k_snow"]
+
+
+def prior():
+    """Табличные значения heat в порядке вектора параметров"""
+    return np.array([heat.KAPPA_BY_REGION.get(r, heat.DEFAULT_KAPPA) for r in heat.REGIONS]
+                    + [heat.KAPPA_FACTOR_BY_SOILCODE[c] for c in _free_codes()] + [heat.k_snow])
+
+
+def unpack(p):
+    """Вектор параметров -> (kappa по регионам, множители по шифрам, k_snow)"""
+    n = len(heat.REGIONS)
+    kappa = dict(zip(heat.REGIONS, p[:n]))
+    factor = {c: 1.0 for c in CODES}
+    factor.update(zip(_free_codes(), p[n:-1]))
+    return kappa, factor, p[-1]
+
+
+# ДАННЫЕ
+def prepare(df, start, end, grid=None, obs_depth=OBS_DEPTH):
+    """Сплошные ряды всех станций df (heat.load_forcing) -> пакет для модели"""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    first = start - pd.Timedelta(days=WARMUP_DAYS)
+    ids, region, tfill, tair, snow, tobs, codes = [], [], [], [], [], [], []
+    for station in sorted(df["station_id"].dropna().unique()):
+        dfd = heat.station_days(df, station)
+        if dfd.empty or dfd["t_soil_mean"].notna().sum() == 0:
+            continue
+        dfd["Tsurf"] = pd.Series(heat.air_surface(dfd["t_air_mean"], dfd["snow_height_cm"])).interpolate(
+            limit_direction="both")
+        days = spinup.continuous_days(dfd, first, end)
+        ids.append(station)
+        region.append(heat.REGIONS.index(days["region"].iloc[0]))
+        # дни без воздуха (заполненные интерполяцией и климатом) от k_snow не зависят
+        tfill.append(days["Tsurf"].to_numpy(dtype=float))
+        tair.append(days["t_air_mean"].to_numpy(dtype=float))
+        snow.append(np.nan_to_num(days["snow_height_cm"].to_numpy(dtype=float)) / 100)
+        tobs.append(np.where(days["date"] >= start, days["t_soil_mean"].to_numpy(dtype=float), np.nan))
+        code = days["soil_code"].ffill().bfill().round()
+        codes.append(np.where(code.isin(CODES), code, REFERENCE_CODE).astype(int))
+
+    z_nodes = heat.z if grid is None else grid["z"]
+    if grid is None:
+        up = np.full(len(z_nodes), 1 / heat.dz**2)
+        lo = up.copy()
+        lo[-1] = 0.0
+    else:
+        up, lo = grid["up"], grid["lo"]
+    return {
+        "station_id": ids, "region": np.array(region), "dates": pd.date_range(first, end, freq="D"),
+        "Tfill": np.stack(tfill, axis=1), "t_air": np.stack(tair, axis=1), "H": np.stack(snow, axis=1),
+        "Tobs": np.stack(tobs, axis=1), "code": np.stack(codes, axis=1),
+        "up": up, "lo": lo, "h": obs_weights(z_nodes, obs_depth), "z": z_nodes,
+    }
+
+
+def obs_weights(z_nodes, depth=OBS_DEPTH):
+    """Наблюдение на глубине depth: линейная интерполяция между соседними узлами"""
+    j = int(np.clip(np.searchsorted(z_nodes, depth) - 1, 0, len(z_nodes) - 2))
+    w = (depth - z_nodes[j]) / (z_nodes[j + 1] - z_nodes[j])
+    h = np.zeros(len(z_nodes))
+    h[j], h[j + 1] = 1 - w, w
+    return h
+
+
+# МОДЕЛЬ И СОПРЯЖЁННАЯ
+def _bands(kappa, up, lo):
+    """Диагонали A (под, диагональ, над) и ∂A/∂κ для пакета kappa (S,)"""
+    shape = (len(kappa), len(up))
+    da, db, dc = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    da[:, 1:-1] = -heat.dt * lo[1:-1]
+    db[:, 1:-1] = heat.dt * (up[1:-1] + lo[1:-1])
+    dc[:, 1:-1] = -heat.dt * up[1:-1]
+    if lo[-1] > 0:  # нижняя полуячейка
+        da[:, -1], db[:, -1] = -heat.dt * lo[-1], heat.dt * lo[-1]
+    k = kappa[:, None]
+    a, b, c = k * da, 1 + k * db, k * dc
+    if lo[-1] == 0:  # T[-1] = T[-2]
+        a[:, -1] = -1.0
+    return (a, b, c), (da, db, dc)
+
+
+def _keep(lo):
+    """Диагональ P: какие узлы прошлого профиля идут в правую часть"""
+    keep = np.ones(len(lo))
+    keep[0] = 0.0
+    if lo[-1] == 0:
+        keep[-1] = 0.0
+    return keep
+
+
+def surface(batch, k_snow):
+    """Tsurf (сутки x станции) при k_snow и её производная по ln k_snow"""
+    air = batch["t_air"] * np.exp(-k_snow * batch["H"])
+    have = ~np.isnan(air)
+    Ts = np.where(have, air, batch["Tfill"])
+    return Ts, np.where(have, -k_snow * batch["H"] * air, 0.0)
+
+
+def kappa_series(batch, p):
+    """kappa (сутки x станции) при параметрах p"""
+    kappa, factor, _ = unpack(p)
+    base = np.array([kappa[r] for r in heat.REGIONS])[batch["region"]]
+    fac = np.array([factor[c] for c in CODES])[np.searchsorted(CODES, batch["code"])]
+    return base[None, :] * fac
+
+
+def forward(batch, kap, Ts):
+    """Профили T (сутки x станции x узлы) от однородного профиля первого дня"""
+    up, lo = batch["up"], batch["lo"]
+    keep = _keep(lo)
+    D, S = Ts.shape
+    T = np.empty((D, S, len(up)))
+    prev = np.repeat(Ts[0][:, None], len(up), axis=1)
+    for n in range(D):
+        (a, b, c), _ = _bands(kap[n], up, lo)
+        d = prev * keep
+        d[:, 0] = Ts[n]
+        prev = T[n] = thomas(a, b, c, d)
+    return T
+
+
+def misfit(batch, T):
+    """0.5·среднее (T(OBS_DEPTH) - t_soil_mean)² и невязки по суткам/станциям"""
+    resid = T @ batch["h"] - batch["Tobs"]
+    ok = ~np.isnan(resid)
+    return 0.5 * np.mean(resid[ok] ** 2), np.where(ok, resid, 0.0) / ok.sum()
+
+
+def adjoint(batch, kap, T, resid):
+    """∂J/∂κ и ∂J/∂Tsurf (сутки x станции) сопряжённым проходом назад по времени"""
+    up, lo, h = batch["up"], batch["lo"], batch["h"]
+    keep = _keep(lo)
+    D = len(kap)
+    grad = np.empty_like(kap)
+    grad_ts = np.empty_like(kap)
+    carry = np.zeros(T.shape[1:])  # P λ_{n+1}
+    for n in range(D - 1, -1, -1):
+        (a, b, c), (da, db, dc) = _bands(kap[n], up, lo)
+        # A^T: поддиагональ — сдвинутая наддиагональ A и наоборот
+        at = np.zeros_like(a)
+        ct = np.zeros_like(c)
+        at[:, 1:] = c[:, :-1]
+        ct[:, :-1] = a[:, 1:]
+        lam = thomas(at, b, ct, resid[n][:, None] * h + carry)
+        GT = db * T[n]
+        GT[:, 1:] += da[:, 1:] * T[n][:, :-1]
+        GT[:, :-1] += dc[:, :-1] * T[n][:, 1:]
+        grad[n] = -np.sum(lam * GT, axis=1)
+        grad_ts[n] = lam[:, 0]
+        carry = lam * keep
+    grad_ts[0] += carry.sum(axis=1)  # начальный профиль = Tsurf первого дня
+    return grad, grad_ts
+
+
+def objective(logp, batch):
+    """Невязка со штрафом и её градиент по ln p (для L-BFGS)"""
+    p = np.exp(logp)
+    kap = kappa_series(batch, p)
+    Ts, dTs = surface(batch, p[-1])
+    T = forward(batch, kap, Ts)
+    J, resid = misfit(batch, T)
+    gk, gts = adjoint(batch, kap, T, resid)
+
+    # κ_n,s = base[регион] · множитель[шифр]: d/d ln base и d/d ln множителя — одно и то же gk·κ
+    gl = gk * kap
+    n_reg = len(heat.REGIONS)
+    g = np.zeros_like(logp)
+    g[:n_reg] = np.bincount(np.broadcast_to(batch["region"], gl.shape).ravel(), weights=gl.ravel(),
+                            minlength=n_reg)
+    by_code = np.bincount(batch["code"].ravel(), weights=gl.ravel(), minlength=max(CODES) + 1)
+    g[n_reg:-1] = by_code[_free_codes()]
+    g[-1] = np.sum(gts * dTs)
+
+    dev = logp - np.log(prior())
+    return J + 0.5 * PRIOR_WEIGHT * np.sum(dev ** 2), g + PRIOR_WEIGHT * dev
+
+
+def calibrate(df, start, end, grid=None, obs_depth=OBS_DEPTH, maxiter=MAX_ITER):
+    """L-BFGS по параметрам kappa; возвращает таблицы и RMSE до/после"""
+    batch = prepare(df, start, end, grid, obs_depth)
+    p0 = np.log(prior())
+    bounds = [(v - LOG_BOUND, v + LOG_BOUND) for v in p0]
+    res = minimize(objective, p0, args=(batch,), jac=True, method="L-BFGS-B", bounds=bounds,
+                   options={"maxiter": maxiter})
+
+    def rmse(logp):
+        p = np.exp(logp)
+        J, _ = misfit(batch, forward(batch, kappa_series(batch, p), surface(batch, p[-1])[0]))
+        return float(np.sqrt(2 * J))
+
+    # параметр на границе: данные тянут его дальше, чем допускает LOG_BOUND
+    pinned = [n for n, x, v in zip(names(), res.x, p0) if abs(x - v) >= LOG_BOUND * (1 - 1e-6)]
+    if pinned:
+        warnings.warn(f"параметры на границе x{np.exp(LOG_BOUND):.0f} от табличных: {', '.join(pinned)} — "
+                      "невязку определяет не kappa, значения в heat не переносить", stacklevel=2)
+    kappa, factor, k_snow = unpack(np.exp(res.x))
+    return {
+        "kappa_by_region": kappa, "kappa_factor_by_soilcode": factor, "k_snow": float(k_snow),
+        "rmse_prior": rmse(p0), "rmse": rmse(res.x), "at_bounds": pinned,
+        "evaluations": int(res.nfev), "converged": bool(res.success), "stations": batch["station_id"],
+    }
+
+
+if __name__ == "__main__":
+    start = pd.Timestamp(sys.argv[1]) if len(sys.argv) > 1 else pd.Timestamp("2024-02-01")
+    end = pd.Timestamp(sys.argv[2]) if len(sys.argv) > 2 else pd.Timestamp("2024-04-30")
+    out = calibrate(store.read_table("forcing"), start, end)
+    print(f"RMSE на {OBS_DEPTH} м: {out['rmse_prior']:.2f} -> {out['rmse']:.2f} °C, "
+          f"проходов {out['evaluations']}, станций {len(out['stations'])}")
+    print(pd.Series(out["kappa_by_region"], name="kappa").to_string())
+    print(pd.Series(out["kappa_factor_by_soilcode"], name="factor").round(3).to_string())
+    print(f"k_snow: {heat.k_snow} -> {out['k_snow']:.3f}")
+    if out["at_bounds"]:
+        print("на границах (не переносить в heat):", ", ".join(out["at_bounds"]))
@@ -0,0 +1,95 @@
+"""Контрольные точки состояния модели по станциям и датам"""
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+CHECKPOINT_DIR = "checkpoints"
+KEY_COLUMNS = ["date", "Tsurf", "kappa"]  # входы модели, от которых зависит состояние
+
+
+def _station_dir(station, root):
+    return os.path.join(root, station)
+
+
+def save_state(station, state, root=CHECKPOINT_DIR):
+    """Сохранить состояние на дату state['date'] -> root/station/YYYY-MM-DD.npz"""
+    path = _station_dir(station, root)
+    os.makedirs(path, exist_ok=True)
+    fname = os.path.join(path, f"{state['date']:%Y-%m-%d}.npz")
+    np.savez(
+        fname,
+        T=state["T"],
+        F_cum=state["F_cum"],
+        snow_height_cm=state["snow_height_cm"],
+        key=state.get("key", ""),
+    )
+    return fname
+
+
+def checkpoint_dates(station, root=CHECKPOINT_DIR):
+    path = _station_dir(station, root)
+    if not os.path.isdir(path):
+        return []
+    names = [f[:-4] for f in os.listdir(path) if f.endswith(".npz")]
+    return sorted(pd.to_datetime(names, format="%Y-%m-%d"))
+
+
+def load_state(station, date, root=CHECKPOINT_DIR):
+    date = pd.Timestamp(date)
+    fname = os.path.join(_station_dir(station, root), f"{date:%Y-%m-%d}.npz")
+    with np.load(fname) as f:
+        return {
+            "date": date,
+            "T": f["T"].copy(),
+            "F_cum": float(f["F_cum"]),
+            "snow_height_cm": float(f["snow_height_cm"]),
+            "key": str(f["key"]) if "key" in f.files else "",
+        }
+
+
+def data_key(dfd, through):
+    """Хэш суточного ряда станции (KEY_COLUMNS) по дату through включительно"""
+    part = dfd.loc[dfd["date"] <= pd.Timestamp(through), KEY_COLUMNS]
+    digest = hashlib.sha1(pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def latest_state(station, before=None, root=CHECKPOINT_DIR, dfd=None):
+    """Последняя контрольная точка (не позже before) или None.
+
+    dfd: если задан, годится только точка, посчитанная по тому же ряду
+    (data_key совпал) — после правки данных старые состояния не берутся.
+    """
+    dates = checkpoint_dates(station, root)
+    if before is not None:
+        dates = [d for d in dates if d <= pd.Timestamp(before)]
+    for date in reversed(dates):
+        state = load_state(station, date, root)
+        if dfd is None or state["key"] == data_key(dfd, date):
+            return state
+    return None
+
+
+def append_results(station, results, root=CHECKPOINT_DIR):
+    """Дописать суточные результаты станции в root/station/results.csv"""
+    if results.empty:
+        return
+    path = _station_dir(station, root)
+    os.makedirs(path, exist_ok=True)
+    fname = os.path.join(path, "results.csv")
+    results.to_csv(fname, mode="a", header=not os.path.exists(fname), index=False)
+
+
+def collect_results(root=CHECKPOINT_DIR):
+    """Все суточные результаты всех станций одной таблицей"""
+    parts = []
+    for station in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        fname = os.path.join(root, station, "results.csv")
+        if os.path.exists(fname):
+            res = pd.read_csv(fname, parse_dates=["date"])
+            res["station_id"] = station
+            parts.append(res.drop_duplicates("date", keep="last"))
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
@@ -0,0 +1,289 @@
+"""Климатические нормы по станциям и дням года (потоковые накопители)
+
+Для каждой переменной и каждой пары (станция, день года) хранятся
+накопители: число значений, среднее и сумма квадратов отклонений
+(Уэлфорд; пакеты сливаются формулой Чана) и гистограмма значений для
+квантилей. Архив любой длины проходится один раз; новые дни (год,
+сезон, сутки) добавляются к накопителям без пересчёта старых. Какие
+пары (станция, дата) уже учтены и с каким значением, хранится вместе
+с накопителями: дни можно добавлять в любом порядке — и более ранние
+годы тоже, — а исправленный день (или помеченный QC) вычитается из
+накопителей и добавляется заново. Значения с флагами qc_* в норму не
+входят. Накопители привязаны к списку станций реестра, сохранённому
+рядом; новые станции реестра получают пустые строки при загрузке.
+
+Окно сглаживания по дням года применяется при запросе нормы: накопители
+соседних дней сливаются теми же формулами. Аномалии — вычитание нормы
+из значений по индексам (станция, день года).
+
+Запуск из папки python:  python -m flood.climatology [таблица]
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from . import qc, stations, store
+
+CLIM_DIR = "climatology"
+# переменная -> (нижняя граница, верхняя граница, шаг гистограммы)
+VARIABLES = {
+    "t_air_mean": (-60.0, 50.0, 0.5),
+    "t_air_max": (-55.0, 55.0, 0.5),
+    "t_air_min": (-65.0, 45.0, 0.5),
+    "t_soil_mean": (-60.0, 70.0, 0.5),
+    "snow_height_cm": (0.0, 300.0, 2.0),
+}
+N_DOY = 365
+WINDOW_DAYS = 7  # ± дней года при запросе нормы
+
+
+def doy365(dates):
+    """День года 0..364 по невисокосному календарю; 29 февраля -> 28 февраля"""
+    d = pd.DatetimeIndex(dates)
+    doy = d.dayofyear.to_numpy() - 1
+    late = d.is_leap_year & (d.month > 2)
+    return np.where(late | ((d.month == 2) & (d.day == 29)), doy - 1, doy)
+
+
+def _bins(var):
+    lo, hi, step = VARIABLES[var]
+    return lo, step, int(round((hi - lo) / step))
+
+
+def empty(var):
+    nb = _bins(var)[2]
+    shape = (len(stations.STATION_DTYPE.categories), N_DOY)
+    return {
+        "n": np.zeros(shape, dtype=np.int64),
+        "mean": np.zeros(shape),
+        "M2": np.zeros(shape),
+        "hist": np.zeros(shape + (nb,), dtype=np.int32),
+        "absorbed": np.zeros(0, dtype=np.int64),  # отсортированные ключи _keys
+        "values": np.zeros(0),                     # учтённое значение каждой пары
+    }
+
+
+def _keys(codes, dates):
+    """Ключ пары (станция, дата): код станции · 2^32 + номер дня от 1970"""
+    return codes.astype(np.int64) * (1 << 32) + dates.astype("datetime64[D]").astype(np.int64)
+
+
+def _split_keys(keys):
+    """Ключи -> (коды станций, номера дней от 1970)"""
+    codes = (keys + (1 << 31)) >> 32
+    return codes, keys - codes * (1 << 32)
+
+
+def _to_registry(acc, var, saved):
+    """Накопители по списку станций saved -> по текущему реестру (строки по айди)"""
+    current = list(stations.STATION_DTYPE.categories)
+    if saved == current:
+        return acc
+    out = empty(var)
+    index = {s: i for i, s in enumerate(current)}
+    new_code = np.array([index.get(s, -1) for s in saved], dtype=np.int64)
+    have = new_code >= 0
+    for k in ("n", "mean", "M2", "hist"):
+        out[k][new_code[have]] = acc[k][have]
+    codes, days = _split_keys(acc["absorbed"])
+    keep = new_code[codes] >= 0
+    keys = new_code[codes[keep]] * (1 << 32) + days[keep]
+    order = np.argsort(keys)
+    out["absorbed"], out["values"] = keys[order], acc["values"][keep][order]
+    return out
+
+
+def _path(var, root):
+    return os.path.join(root, f"{var}.npz")
+
+
+def load(var, root=CLIM_DIR):
+    if not os.path.exists(_path(var, root)):
+        return empty(var)
+    with np.load(_path(var, root)) as f:
+        if not {"absorbed", "values", "stations"} <= set(f.files):
+            raise ValueError(f"{_path(var, root)}: старый формат без учёта дат — удалите файл и пересоберите нормы")
+        acc = {k: f[k].copy() for k in f.files if k != "stations"}
+        saved = [str(s) for s in f["stations"]]
+    return _to_registry(acc, var, saved)
+
+
+def save(acc, var, root=CLIM_DIR):
+    os.makedirs(root, exist_ok=True)
+    tmp = _path(var, root) + ".tmp.npz"
+    np.savez(tmp, stations=np.array(stations.STATION_DTYPE.categories, dtype=str), **acc)
+    os.replace(tmp, _path(var, root))
+
+
+def _batch(acc, codes, doy, x):
+    """Пакет -> (ячейки, x, n, среднее, M2 по ячейкам, число ячеек)"""
+    ok = ~np.isnan(x) & (codes >= 0)
+    cell = codes[ok].astype(np.int64) * N_DOY + doy[ok]
+    x = x[ok]
+    size = acc["n"].size
+
+    n_b = np.bincount(cell, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_b = np.bincount(cell, weights=x, minlength=size) / n_b
+    M2_b = np.bincount(cell, weights=(x - mean_b[cell]) ** 2, minlength=size)
+    return cell, x, n_b, mean_b, M2_b, size
+
+
+def _hist(acc, cell, x, var, size):
+    lo, step, nb = _bins(var)
+    b = np.clip(((x - lo) / step).astype(np.int64), 0, nb - 1)
+    return np.bincount(cell * nb + b, minlength=size * nb).astype(np.int32)
+
+
+def accumulate(acc, codes, doy, x, var):
+    """Добавить пакет значений x станций codes в дни года doy (на месте).
+
+    Пакет сводится к (n, среднее, M2) по ячейкам через bincount и
+    сливается с накопленным: δ = m_b - m_a, n = n_a + n_b,
+    m = m_a + δ·n_b/n, M2 = M2_a + M2_b + δ²·n_a·n_b/n.
+    """
+    cell, x, n_b, mean_b, M2_b, size = _batch(acc, codes, doy, x)
+    n_a = acc["n"].reshape(-1)
+    mean_a = acc["mean"].reshape(-1)
+    M2_a = acc["M2"].reshape(-1)
+    hit = n_b > 0
+    n = n_a[hit] + n_b[hit]
+    delta = mean_b[hit] - mean_a[hit]
+    mean_a[hit] += delta * n_b[hit] / n
+    M2_a[hit] += M2_b[hit] + delta ** 2 * n_a[hit] * n_b[hit] / n
+    n_a[hit] = n
+    acc["hist"].reshape(-1)[:] += _hist(acc, cell, x, var, size)
+    return acc
+
+
+def remove(acc, codes, doy, x, var):
+    """Вычесть из накопителей ранее добавленный пакет (обратная формула Чана, на месте).
+
+    Остаток a = целое минус пакет b: n_a = n - n_b,
+    m_a = (n·m - n_b·m_b)/n_a, M2_a = M2 - M2_b - δ²·n_a·n_b/n, δ = m_b - m_a.
+    """
+    cell, x, n_b, mean_b, M2_b, size = _batch(acc, codes, doy, x)
+    n_all = acc["n"].reshape(-1)
+    mean = acc["mean"].reshape(-1)
+    M2 = acc["M2"].reshape(-1)
+    hit = n_b > 0
+    n = n_all[hit]
+    n_a = n - n_b[hit]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_a = np.where(n_a > 0, (n * mean[hit] - n_b[hit] * mean_b[hit]) / n_a, 0.0)
+    delta = mean_b[hit] - mean_a
+    M2_a = np.where(n_a > 0, M2[hit] - M2_b[hit] - delta ** 2 * n_a * n_b[hit] / n, 0.0)
+    mean[hit], M2[hit], n_all[hit] = mean_a, np.maximum(M2_a, 0.0), n_a
+    acc["hist"].reshape(-1)[:] -= _hist(acc, cell, x, var, size)
+    return acc
+
+
+def update(df, variables=None, root=CLIM_DIR):
+    """Согласовать нормы со строками df (station_id, date, переменные[, qc_*]).
+
+    Значения с флагами QC отбрасываются (qc.apply). Учтённые пары
+    (станция, дата) запоминаются вместе со значением: повторный вызов с
+    тем же архивом ничего не меняет, новые дни — в том числе более
+    ранние, чем уже учтённые, — сливаются с накопленным (формула Чана
+    не зависит от порядка), а день, значение которого изменилось или
+    пропало (флаг QC), вычитается и добавляется заново. Пары, которых в
+    df нет, не трогаются. Возвращает {переменная: число изменённых значений}.
+    """
+    df = qc.apply(stations.encode(df.copy()))
+    codes = stations.station_codes(df).astype(np.int64)
+    dates = df["date"].to_numpy(dtype="datetime64[D]")
+    doy = doy365(df["date"])
+    keys = _keys(codes, dates)
+    rows = np.flatnonzero((codes >= 0) & ~np.isnat(dates))
+    rows = rows[np.unique(keys[rows], return_index=True)[1]]  # повтор пары в df — первая строка
+    changed = {}
+    for var in [v for v in (variables or VARIABLES) if v in df.columns]:
+        acc = load(var, root)
+        x = pd.to_numeric(df[var], errors="coerce").to_numpy(dtype=float)
+        pos = np.minimum(np.searchsorted(acc["absorbed"], keys[rows]), max(len(acc["absorbed"]) - 1, 0))
+        known = (acc["absorbed"][pos] == keys[rows]) if len(acc["absorbed"]) else np.zeros(len(rows), dtype=bool)
+        old = np.where(known, acc["values"][pos] if len(acc["values"]) else np.nan, np.nan)
+        revised = known & (old != x[rows])  # учтённые значения не бывают NaN
+        fresh = (~known | revised) & ~np.isnan(x[rows])
+
+        r, a = rows[revised], rows[fresh]
+        remove(acc, codes[r], doy[r], old[revised], var)
+        accumulate(acc, codes[a], doy[a], x[a], var)
+        keep = np.ones(len(acc["absorbed"]), dtype=bool)
+        keep[pos[revised]] = False
+        absorbed = np.concatenate([acc["absorbed"][keep], keys[a]])
+        order = np.argsort(absorbed)
+        acc["absorbed"] = absorbed[order]
+        acc["values"] = np.concatenate([acc["values"][keep], x[a]])[order]
+        save(acc, var, root)
+        changed[var] = int(np.count_nonzero(revised | fresh))
+    return changed
+
+
+def _window_sum(a, window):
+    """Сумма по дням года в окне ±window (год замкнут в кольцо), ось 1"""
+    c = np.concatenate([a[:, -window:], a, a[:, :window]], axis=1).cumsum(axis=1)
+    c = np.concatenate([np.zeros_like(c[:, :1]), c], axis=1)
+    return c[:, 2 * window + 1:] - c[:, :-2 * window - 1]
+
+
+def baseline(acc, window=WINDOW_DAYS):
+    """Норма по окну дней года: {"n", "mean", "std"} массивы (станции, 365).
+
+    Слияние ячеек окна: n = Σn, m = Σn·m / n, M2 = Σ(M2 + n·m²) - n·m².
+    """
+    n = _window_sum(acc["n"].astype(float), window)
+    s1 = _window_sum(acc["n"] * acc["mean"], window)
+    s2 = _window_sum(acc["M2"] + acc["n"] * acc["mean"] ** 2, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = s1 / n
+        var = np.maximum(s2 - n * mean ** 2, 0.0) / (n - 1)
+    mean[n == 0] = np.nan
+    return {"n": n, "mean": mean, "std": np.sqrt(var)}
+
+
+def quantiles(acc, var, q, window=WINDOW_DAYS):
+    """Квантили q по гистограммам окна: массив (len(q), станции, 365)"""
+    lo, step, nb = _bins(var)
+    hist = acc["hist"].astype(np.int64)
+    h = np.concatenate([hist[:, -window:], hist, hist[:, :window]], axis=1).cumsum(axis=1)
+    h = np.concatenate([np.zeros_like(h[:, :1]), h], axis=1)
+    h = h[:, 2 * window + 1:] - h[:, :-2 * window - 1]
+    cum = h.cumsum(axis=2)
+    total = cum[..., -1]
+
+    out = np.full((len(q),) + total.shape, np.nan)
+    for i, qi in enumerate(np.atleast_1d(q)):
+        target = qi * total
+        k = np.minimum((cum < target[..., None]).sum(axis=2), nb - 1)
+        below = np.take_along_axis(cum, k[..., None], axis=2)[..., 0] - np.take_along_axis(h, k[..., None], axis=2)[..., 0]
+        inbin = np.take_along_axis(h, k[..., None], axis=2)[..., 0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frac = np.clip((target - below) / inbin, 0.0, 1.0)
+        out[i] = np.where(total > 0, lo + (k + frac) * step, np.nan)
+    return out
+
+
+def anomalies(df, variables=None, window=WINDOW_DAYS, root=CLIM_DIR):
+    """df + колонки <var>_anom (отклонение от нормы) и <var>_z (в долях σ)"""
+    out = df.copy()
+    codes = stations.station_codes(stations.encode(df[["station_id"]].copy())).astype(np.int64)
+    doy = doy365(df["date"])
+    known = codes >= 0
+    for var in [v for v in (variables or VARIABLES) if v in df.columns]:
+        base = baseline(load(var, root), window)
+        mean = np.where(known, base["mean"][np.maximum(codes, 0), doy], np.nan)
+        std = np.where(known, base["std"][np.maximum(codes, 0), doy], np.nan)
+        x = pd.to_numeric(df[var], errors="coerce").to_numpy(dtype=float)
+        out[f"{var}_anom"] = x - mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[f"{var}_z"] = (x - mean) / std
+    return out
+
+
+if __name__ == "__main__":
+    table = sys.argv[1] if len(sys.argv) > 1 else "forcing"
+    print(update(store.read_table(table)))
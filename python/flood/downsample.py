@@ -0,0 +1,174 @@
+"""Прореживание длинных рядов и полей T(z, t) для графиков и сервиса
+
+Экран шириной ~2000 точек, а многолетний часовой расчёт на мелкой
+сетке — миллионы столбцов. Поэтому отдаётся только нужное разрешение:
+
+  - ряды: LTTB (largest triangle three buckets) — из каждого интервала
+    берётся точка, образующая с соседями наибольший треугольник; пики и
+    провалы сохраняются, в отличие от простого шага или среднего
+  - поля: пирамида уровней, каждый следующий в FACTOR раз грубее по
+    времени (и по глубине, пока остаётся не меньше MAX_ROWS узлов), на каждом уровне
+    хранятся среднее, минимум и максимум. Окно просмотра берётся с самого
+    грубого уровня, где в окне ещё не меньше столбцов, чем пикселей
+
+Уровни пирамиды сохраняются отдельными .npy и читаются через memmap:
+срез окна не загружает файл целиком.
+"""
+
+import json
+import os
+import warnings
+
+import numpy as np
+
+FACTOR = 2
+MIN_SIDE = 64      # самый грубый уровень — не меньше стольких столбцов
+MAX_ROWS = 256     # по глубине сжимается, пока узлов остаётся не меньше
+BLOCK_VALUES = 1 << 22  # значений исходного поля за один проход при построении
+STATS = ("mean", "min", "max")
+
+
+# РЯДЫ
+def lttb(x, y, n):
+    """Индексы n точек ряда (x, y) по LTTB; первая и последняя всегда входят"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ok = np.flatnonzero(~np.isnan(y))
+    if len(ok) <= n or n < 3:
+        return ok
+    xs, ys = x[ok], y[ok]
+
+    # границы n-2 внутренних интервалов
+    edges = np.linspace(1, len(xs) - 1, n - 1).astype(np.int64)
+    out = np.empty(n, dtype=np.int64)
+    out[0], out[-1] = 0, len(xs) - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # третья вершина — среднее следующего интервала (последний — конечная точка)
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else len(xs)
+        cx, cy = xs[nlo:nhi].mean(), ys[nlo:nhi].mean()
+        area = np.abs((xs[a] - cx) * (ys[lo:hi] - ys[a]) - (xs[a] - xs[lo:hi]) * (cy - ys[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return ok[out]
+
+
+def series_view(x, y, x0, x1, n):
+    """Окно [x0, x1] отсортированного ряда, прореженное до n точек: (x, y)"""
+    x = np.asarray(x)
+    i0, i1 = np.searchsorted(x, x0, side="left"), np.searchsorted(x, x1, side="right")
+    xw, yw = x[i0:i1], np.asarray(y, dtype=float)[i0:i1]
+    num = xw.astype("datetime64[s]").astype(float) if np.issubdtype(xw.dtype, np.datetime64) else xw
+    idx = lttb(num, yw, n)
+    return xw[idx], yw[idx]
+
+
+# ПИРАМИДА ПОЛЯ
+def _reduce(a, f, axis, how):
+    """Свёртка блоков по f вдоль оси; неполный последний блок дополняется NaN"""
+    n = a.shape[axis]
+    pad = (-n) % f
+    if pad:
+        width = [(0, 0)] * a.ndim
+        width[axis] = (0, pad)
+        a = np.pad(a.astype(float), width, constant_values=np.nan)
+    shape = list(a.shape)
+    shape[axis:axis + 1] = [(n + pad) // f, f]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # блок целиком из NaN
+        return how(a.reshape(shape), axis=axis + 1)
+
+
+def _coarsen(level, ft, fz):
+    out = {}
+    for stat, how in zip(STATS, (np.nanmean, np.nanmin, np.nanmax)):
+        a = level[stat]
+        if ft > 1:
+            a = _reduce(a, ft, 0, how)
+        if fz > 1:
+            a = _reduce(a, fz, 1, how)
+        out[stat] = a
+    out["t"] = level["t"][::ft]
+    out["z"] = _reduce(level["z"], fz, 0, np.nanmean) if fz > 1 else level["z"]
+    return out
+
+
+def build_pyramid(P, t, z, factor=FACTOR, min_side=MIN_SIDE, max_rows=MAX_ROWS):
+    """Пирамида поля P (время x глубина) с осями t, z: список уровней, [0] — исходное.
+
+    Первый уровень строится блоками по ~BLOCK_VALUES значений, так что P может
+    быть memmap больше памяти; дальше уровни уже в factor раз меньше.
+    """
+    t = np.asarray(t)
+    z = np.asarray(z, dtype=float)
+    base = {"mean": P, "min": P, "max": P, "t": t, "z": z}
+    levels = [base]
+    fz = factor if len(z) // factor >= max_rows else 1
+    if len(t) <= min_side:
+        return levels
+
+    block = max(BLOCK_VALUES // max(len(z), 1) // factor, 1) * factor
+    parts = []
+    for i in range(0, len(t), block):
+        chunk = np.asarray(P[i:i + block], dtype=float)
+        parts.append(_coarsen({"mean": chunk, "min": chunk, "max": chunk, "t": t[i:i + block], "z": z},
+                              factor, fz))
+    levels.append({k: np.concatenate([p[k] for p in parts]) if k != "z" else parts[0]["z"]
+                   for k in parts[0]})
+    while len(levels[-1]["t"]) > min_side:
+        fz = factor if len(levels[-1]["z"]) // factor >= max_rows else 1
+        levels.append(_coarsen(levels[-1], factor, fz))
+    return levels
+
+
+def choose_level(levels, t0, t1, width, height=None):
+    """Самый грубый уровень, где в окне [t0, t1] не меньше width столбцов (и height строк)"""
+    rows = min(height or 0, MAX_ROWS, len(levels[0]["z"]))
+    for k in range(len(levels) - 1, 0, -1):
+        t = levels[k]["t"]
+        cols = np.searchsorted(t, t1, side="right") - np.searchsorted(t, t0, side="left")
+        if cols >= width and len(levels[k]["z"]) >= rows:
+            return k
+    return 0
+
+
+def view(levels, t0, t1, width, height=None, z0=None, z1=None):
+    """Окно поля для экрана width x height: {"level", "t", "z", "mean", "min", "max"}"""
+    k = choose_level(levels, t0, t1, width, height)
+    lv = levels[k]
+    # левый край блока может быть раньше t0 — берём и его
+    i0 = max(np.searchsorted(lv["t"], t0, side="right") - 1, 0)
+    i1 = np.searchsorted(lv["t"], t1, side="right")
+    j0 = 0 if z0 is None else max(np.searchsorted(lv["z"], z0, side="right") - 1, 0)
+    j1 = len(lv["z"]) if z1 is None else np.searchsorted(lv["z"], z1, side="right")
+    out = {"level": k, "t": lv["t"][i0:i1], "z": lv["z"][j0:j1]}
+    for s in STATS:
+        out[s] = np.asarray(lv[s][i0:i1, j0:j1])
+    return out
+
+
+def save_pyramid(levels, path):
+    """Уровни -> path/level_K_<stat>.npy (+ оси); уровень 0 хранится один раз"""
+    os.makedirs(path, exist_ok=True)
+    for k, lv in enumerate(levels):
+        for s in (("mean",) if k == 0 else STATS):
+            np.save(os.path.join(path, f"level_{k}_{s}.npy"), np.asarray(lv[s]))
+        np.save(os.path.join(path, f"level_{k}_t.npy"), lv["t"])
+        np.save(os.path.join(path, f"level_{k}_z.npy"), lv["z"])
+    with open(os.path.join(path, "pyramid.json"), "w", encoding="utf-8") as f:
+        json.dump({"levels": len(levels), "shape": list(np.shape(levels[0]["mean"]))}, f)
+
+
+def load_pyramid(path, mmap=True):
+    mode = "r" if mmap else None
+    with open(os.path.join(path, "pyramid.json"), encoding="utf-8") as f:
+        n = json.load(f)["levels"]
+    levels = []
+    for k in range(n):
+        lv = {s: np.load(os.path.join(path, f"level_{k}_{'mean' if k == 0 else s}.npy"), mmap_mode=mode)
+              for s in STATS}
+        lv["t"] = np.load(os.path.join(path, f"level_{k}_t.npy"))
+        lv["z"] = np.load(os.path.join(path, f"level_{k}_z.npy"))
+        levels.append(lv)
+    return levels
@@ -0,0 +1,261 @@
+"""Усвоение наблюдений температуры почвы ансамблевым фильтром Калмана (EnKF)
+
+Вместо того чтобы подставлять t_soil_mean в граничное условие, модель
+гонится от поверхности по воздуху и снегу (heat.air_surface), а
+наблюдение каждые сутки поправляет весь профиль T(z) и, по желанию,
+kappa станции (ln kappa — часть вектора состояния).
+
+  - прогноз: все станции x все члены ансамбля — один пакет (S·M, n),
+    шаг richards.heat_step; к поверхности по воздуху и снегу добавляется
+    смещение станции bias (часть состояния, блуждает на BIAS_WALK за
+    сутки) и шум SURF_SIGMA
+  - анализ: стохастический EnKF с возмущёнными наблюдениями, сразу по
+    всем станциям с наблюдением (einsum + batched solve); поправка
+    профиля ослабевает с удалением от глубины наблюдения (LOC_SCALE),
+    смещение поверхности и ln kappa поправляются без ослабления
+  - раздувание разброса — своё для каждой станции и подстраивается по
+    невязкам: оценка (d² - OBS_SIGMA²) / разброс прогноза сглаживается
+    с весом INFLATION_GAIN, в пределах [1, INFLATION_MAX]
+
+Состояние ансамбля на последние сутки сохраняется (ENKF_DIR), и
+ежедневный запуск (python -m flood simulate --enkf) продолжает фильтр с него.
+
+Запуск из папки python:  python -m flood.enkf [начало] [конец]
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from . import calibrate, checkpoints, heat, richards, spinup, store
+
+ENKF_DIR = os.path.join(checkpoints.CHECKPOINT_DIR, "enkf")
+MEMBERS = 32
+OBS_DEPTH = calibrate.OBS_DEPTH
+OBS_SIGMA = 1.0       # °C, ошибка наблюдения
+SURF_SIGMA = 1.5      # °C, ошибка поверхности по воздуху и снегу
+INIT_SIGMA = 1.0      # °C, начальный разброс профиля
+KAPPA_SIGMA = 0.3     # разброс ln kappa в начале
+KAPPA_WALK = 0.01     # случайное блуждание ln kappa за сутки
+KAPPA_BOUND = np.log(4.0)  # kappa в пределах x4 от табличной
+LOC_SCALE = 0.5       # м, масштаб вертикальной локализации
+BIAS_SIGMA = 2.0      # °C, начальный разброс смещения поверхности
+BIAS_WALK = 0.2       # °C, случайное блуждание смещения за сутки
+BIAS_BOUND = 10.0     # °C, смещение в пределах ±BIAS_BOUND
+INFLATION = 1.05      # начальное раздувание разброса
+INFLATION_MAX = 3.0
+INFLATION_GAIN = 0.05  # вес новой оценки раздувания по невязке суток
+SEED = 0
+
+
+# ДАННЫЕ
+def prepare(df, start, end):
+    """Сплошные ряды станций: поверхность по воздуху, наблюдения почвы, табличная kappa"""
+    ids, region, tsurf, tobs, kappa = [], [], [], [], []
+    for station in sorted(df["station_id"].dropna().unique()):
+        dfd = heat.station_days(df, station)
+        if dfd.empty:
+            continue
+        dfd["Tsurf"] = pd.Series(heat.air_surface(dfd["t_air_mean"], dfd["snow_height_cm"])).interpolate(
+            limit_direction="both")
+        days = spinup.continuous_days(dfd, start, end)
+        ids.append(station)
+        region.append(days["region"].iloc[0])
+        tsurf.append(days["Tsurf"].to_numpy(dtype=float))
+        tobs.append(days["t_soil_mean"].to_numpy(dtype=float))
+        kappa.append(float(days["kappa"].median()))
+    return {
+        "station_id": ids, "region": region, "dates": pd.date_range(start, end, freq="D"),
+        "Tsurf": np.stack(tsurf, axis=1), "Tobs": np.stack(tobs, axis=1), "kappa": np.array(kappa),
+    }
+
+
+# СОСТОЯНИЕ АНСАМБЛЯ
+def initial_ensemble(station_ids, regions, kappa, date, grid, members=MEMBERS, rng=None):
+    """Ансамбль на конец дня перед date: климатический профиль + шум, ln kappa + шум, смещение поверхности"""
+    rng = np.random.default_rng(SEED) if rng is None else rng
+    mean = np.array([spinup.TSURF_CLIMATE.get(r, spinup.DEFAULT_CLIMATE)[0] for r in regions])
+    S, n = len(station_ids), len(grid["z"])
+    T = mean[:, None, None] + INIT_SIGMA * rng.standard_normal((S, members, n))
+    log_kappa = np.log(kappa)[:, None] + KAPPA_SIGMA * rng.standard_normal((S, members))
+    bias = BIAS_SIGMA * rng.standard_normal((S, members))
+    return {"date": pd.Timestamp(date) - pd.Timedelta(days=1), "station_id": list(station_ids),
+            "T": T, "log_kappa": log_kappa, "log_kappa0": np.log(kappa), "bias": bias,
+            "inflation": np.full(S, INFLATION)}
+
+
+def save_state(state, root=ENKF_DIR):
+    os.makedirs(root, exist_ok=True)
+    fname = os.path.join(root, f"{state['date']:%Y-%m-%d}.npz")
+    np.savez(fname, T=state["T"], log_kappa=state["log_kappa"], log_kappa0=state["log_kappa0"],
+             bias=state["bias"], inflation=state["inflation"], station_id=np.array(state["station_id"], dtype=str))
+    return fname
+
+
+def latest_state(before=None, root=ENKF_DIR):
+    """Последнее сохранённое состояние ансамбля (не позже before) или None"""
+    if not os.path.isdir(root):
+        return None
+    dates = sorted(pd.to_datetime([f[:-4] for f in os.listdir(root) if f.endswith(".npz")], format="%Y-%m-%d"))
+    if before is not None:
+        dates = [d for d in dates if d <= pd.Timestamp(before)]
+    if not dates:
+        return None
+    with np.load(os.path.join(root, f"{dates[-1]:%Y-%m-%d}.npz")) as f:
+        state = {"date": dates[-1], "station_id": list(f["station_id"]), "T": f["T"].copy(),
+                 "log_kappa": f["log_kappa"].copy(), "log_kappa0": f["log_kappa0"].copy()}
+        S, M = state["log_kappa"].shape
+        # состояния, сохранённые до появления смещения и раздувания
+        state["bias"] = f["bias"].copy() if "bias" in f.files else np.zeros((S, M))
+        state["inflation"] = f["inflation"].copy() if "inflation" in f.files else np.full(S, INFLATION)
+    return state
+
+
+# ПРОГНОЗ И АНАЛИЗ
+def forecast(state, Tsurf, grid, rng, update_kappa=True):
+    """Сутки вперёд для всех станций и членов сразу; Tsurf (S,)"""
+    S, M, n = state["T"].shape
+    if update_kappa:
+        state["log_kappa"] = state["log_kappa"] + KAPPA_WALK * rng.standard_normal((S, M))
+        lo = state["log_kappa0"][:, None] - KAPPA_BOUND
+        state["log_kappa"] = np.clip(state["log_kappa"], lo, lo + 2 * KAPPA_BOUND)
+    state["bias"] = np.clip(state["bias"] + BIAS_WALK * rng.standard_normal((S, M)), -BIAS_BOUND, BIAS_BOUND)
+    surf = Tsurf[:, None] + state["bias"] + SURF_SIGMA * rng.standard_normal((S, M))
+    T = richards.heat_step(state["T"].reshape(S * M, n), surf.ravel(), np.exp(state["log_kappa"]).ravel(), grid)
+    state["T"] = T.reshape(S, M, n)
+    return state
+
+
+def analysis(X, HX, y, loc, rng, sigma=OBS_SIGMA, inflation=INFLATION):
+    """Стохастический EnKF для пакета станций.
+
+    X (S, M, q) — ансамбль векторов состояния, HX (S, M, p) — он же в
+    пространстве наблюдений, y (S, p), loc (q, p) — множители локализации,
+    inflation — число или (S,) по станциям. Раздувание ослабевает вместе с
+    локализацией: элементы, которые наблюдение не поправляет, не раздуваются.
+    """
+    S, M, p = HX.shape
+    inflation = np.broadcast_to(np.asarray(inflation, dtype=float), (S,))[:, None, None]
+    A = X - X.mean(axis=1, keepdims=True)
+    HA = HX - HX.mean(axis=1, keepdims=True)
+    A = A * (1 + (inflation - 1) * loc.max(axis=1))
+    HA = HA * inflation
+    X = X.mean(axis=1, keepdims=True) + A
+    HX = HX.mean(axis=1, keepdims=True) + HA
+
+    Pxy = np.einsum("smq,smp->sqp", A, HA) / (M - 1) * loc
+    Pyy = np.einsum("smp,smr->spr", HA, HA) / (M - 1) + sigma ** 2 * np.eye(p)
+    D = y[:, None, :] + sigma * rng.standard_normal((S, M, p)) - HX
+    W = np.linalg.solve(Pyy, D.transpose(0, 2, 1))        # (S, p, M)
+    return X + np.einsum("sqp,spm->smq", Pxy, W)
+
+
+def adapt_inflation(inflation, d, var_f, sigma=OBS_SIGMA):
+    """Раздувание по невязке суток d = y - прогноз и дисперсии прогноза var_f (по станциям)
+
+    Ожидается E d² = λ² var_f + σ²; оценка λ² из одних суток сглаживается
+    с весом INFLATION_GAIN.
+    """
+    target = np.sqrt(np.clip((d ** 2 - sigma ** 2) / np.maximum(var_f, 1e-6), 1.0, INFLATION_MAX ** 2))
+    return np.clip((1 - INFLATION_GAIN) * inflation + INFLATION_GAIN * target, 1.0, INFLATION_MAX)
+
+
+def assimilate(state, y, h, z_nodes, rng, update_kappa=True):
+    """Анализ по станциям, где есть наблюдение y (S,) (NaN — нет)"""
+    have = ~np.isnan(y)
+    if not have.any():
+        return state
+    n = len(z_nodes)
+    T = state["T"][have]
+    parts = [T, state["bias"][have][..., None]]
+    if update_kappa:
+        parts.append(state["log_kappa"][have][..., None])
+    X = np.concatenate(parts, axis=2)
+    HX = (T @ h)[..., None]
+
+    d = y[have] - HX[..., 0].mean(axis=1)
+    state["inflation"][have] = adapt_inflation(state["inflation"][have], d, HX[..., 0].var(axis=1, ddof=1))
+
+    depth = float(h @ z_nodes)
+    loc = np.exp(-0.5 * ((z_nodes - depth) / LOC_SCALE) ** 2)
+    loc[0] = 0.0  # поверхность задаётся граничным условием
+    loc = np.append(loc, np.ones(X.shape[2] - n))
+    Xa = analysis(X, HX, y[have][:, None], loc[:, None], rng, inflation=state["inflation"][have])
+
+    state["T"][have] = Xa[..., :n]
+    state["bias"][have] = np.clip(Xa[..., n], -BIAS_BOUND, BIAS_BOUND)
+    if update_kappa:
+        lo = state["log_kappa0"][have][:, None] - KAPPA_BOUND
+        state["log_kappa"][have] = np.clip(Xa[..., -1], lo, lo + 2 * KAPPA_BOUND)
+    return state
+
+
+def run(df, start, end, state=None, grid=None, members=MEMBERS, update_kappa=True, seed=SEED, save=True,
+        root=ENKF_DIR):
+    """Фильтр по суткам [start, end]; state=None — продолжить с сохранённого или начать заново.
+
+    Новый ансамбль стартует с осени (spinup.spinup_start) и до start
+    раскручивается с усвоением, но в таблицу идут только сутки с start.
+    Шум берётся из генератора от (seed, первые сутки расчёта): ежедневное
+    продолжение не повторяет возмущения предыдущего запуска.
+
+    Возвращает (состояние, суточная таблица по станциям: прогноз и анализ
+    на глубине наблюдения, наблюдение, kappa, Z_0C среднего профиля).
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if start > end:
+        raise ValueError(f"начало {start:%Y-%m-%d} позже конца {end:%Y-%m-%d}")
+    grid = heat.region_grid(None) if grid is None else grid
+    if state is None:
+        state = latest_state(start - pd.Timedelta(days=1), root)
+    if state is not None and state["date"] >= end:
+        raise ValueError(f"состояние ансамбля уже на {state['date']:%Y-%m-%d}, не раньше конца {end:%Y-%m-%d}")
+    first = spinup.spinup_start(start) if state is None else state["date"] + pd.Timedelta(days=1)
+    batch = prepare(df, first, end)
+    fresh = state is None or state["station_id"] != batch["station_id"]
+    if fresh:
+        first = spinup.spinup_start(start)
+        batch = prepare(df, first, end)
+    rng = np.random.default_rng([seed, first.toordinal()])
+    if fresh:
+        state = initial_ensemble(batch["station_id"], batch["region"], batch["kappa"], first, grid, members, rng)
+
+    z_nodes = grid["z"]
+    h = calibrate.obs_weights(z_nodes, OBS_DEPTH)
+    rows = []
+    for i, date in enumerate(batch["dates"]):
+        state = forecast(state, batch["Tsurf"][i], grid, rng, update_kappa)
+        prior = state["T"] @ h
+        state = assimilate(state, batch["Tobs"][i], h, z_nodes, rng, update_kappa)
+        if date < start:
+            continue
+        post = state["T"] @ h
+        mean_T = state["T"].mean(axis=1)
+        rows.append(pd.DataFrame({
+            "station_id": batch["station_id"], "date": date,
+            "T_obs": batch["Tobs"][i],
+            "T_forecast": prior.mean(axis=1), "T_forecast_sd": prior.std(axis=1, ddof=1),
+            "T_analysis": post.mean(axis=1), "T_analysis_sd": post.std(axis=1, ddof=1),
+            "kappa": np.exp(state["log_kappa"]).mean(axis=1),
+            "bias": state["bias"].mean(axis=1), "inflation": state["inflation"].copy(),
+            "Z_0C": [heat.freezing_depth(t, z_nodes) for t in mean_T],
+        }))
+    state["date"] = batch["dates"][-1]
+    if save:
+        save_state(state, root)
+    return state, pd.concat(rows, ignore_index=True)
+
+
+if __name__ == "__main__":
+    start = pd.Timestamp(sys.argv[1]) if len(sys.argv) > 1 else pd.Timestamp("2024-02-01")
+    end = pd.Timestamp(sys.argv[2]) if len(sys.argv) > 2 else pd.Timestamp("2024-04-30")
+    _, res = run(store.read_table("forcing"), start, end)
+    innov = (res["T_obs"] - res["T_forecast"]).abs()
+    print(f"средняя |наблюдение - прогноз| на {OBS_DEPTH} м: {innov.mean():.2f} °C")
+    print(f"смещение: {(res['T_obs'] - res['T_forecast']).mean():.2f} °C")
+    by_station = res.groupby("station_id", observed=True)[
+        ["T_forecast_sd", "T_analysis_sd", "kappa", "bias", "inflation"]].mean()
+    by_station["kappa"] *= 1e6
+    print(by_station.round(3).rename(columns={"kappa": "kappa, 1e-6 м²/с"}).to_string())
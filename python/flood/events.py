@@ -0,0 +1,142 @@
+"""Каталог экстремальных событий по всем станциям и годам
+
+Типы событий:
+  jump        — суточный скачок средней температуры dT/dt
+  warm_spell  — серия дней подряд с ростом температуры (величина — общий рост)
+  melt_day    — суточное уменьшение высоты снега, см/сут
+  refreeze    — оттепель, после которой снова мороз (величина — градусо-дни
+                оттепели: сколько успело растаять до образования ледяной корки)
+
+Серии находятся кодированием длин серий по отсортированным массивам, без
+циклов по строкам. Архив идёт кусками (по сезонам), из каждого куска
+отбираются k кандидатов (argpartition, без полной сортировки) и сливаются
+с кучами размера k — память не растёт с длиной архива.
+"""
+
+import heapq
+
+import numpy as np
+import pandas as pd
+
+EVENT_TYPES = ("jump", "warm_spell", "melt_day", "refreeze")
+TOP_K = 20
+FIELDS = ["station_id", "start", "end", "days", "magnitude"]
+
+
+def new_catalogue(k=TOP_K):
+    return {"k": k, "heaps": {t: [] for t in EVENT_TYPES}, "seq": 0}
+
+
+def _runs(cond, breaks):
+    """Серии подряд идущих True в cond; breaks — начало новой станции или разрыв в датах.
+
+    Возвращает (номер серии для каждой строки или -1, индексы начала, индексы конца).
+    """
+    start = cond & (breaks | ~np.r_[False, cond[:-1]])
+    run_id = np.where(cond, np.cumsum(start) - 1, -1)
+    starts = np.flatnonzero(start)
+    ends = np.flatnonzero(cond & np.r_[breaks[1:] | ~cond[1:], True])
+    return run_id, starts, ends
+
+
+def detect(df, temp="t_mean", snow="snow_height_cm"):
+    """Все события куска df (station_id, date, temp[, snow]) -> {тип: DataFrame FIELDS}"""
+    df = df.dropna(subset=["station_id", "date"])
+    codes, uniques = pd.factorize(df["station_id"].astype(str))
+    dates = df["date"].to_numpy(dtype="datetime64[D]")
+    order = np.lexsort((dates, codes))
+    codes, dates = codes[order], dates[order]
+    ids = np.asarray(uniques, dtype=object)
+
+    # строка продолжает ряд предыдущей: та же станция и следующий день
+    cont = np.r_[False, (codes[1:] == codes[:-1]) & (np.diff(dates) == np.timedelta64(1, "D"))]
+    breaks = ~cont
+    out = {}
+
+    def frame(rows_start, rows_end, magnitude):
+        return pd.DataFrame({
+            "station_id": ids[codes[rows_start]],
+            "start": dates[rows_start].astype("datetime64[ns]"),
+            "end": dates[rows_end].astype("datetime64[ns]"),
+            "days": (rows_end - rows_start + 1).astype(np.int32),
+            "magnitude": magnitude,
+        })
+
+    T = pd.to_numeric(df[temp], errors="coerce").to_numpy(dtype=float)[order]
+    dT = np.full(len(T), np.nan)
+    dT[cont] = (T[1:] - T[:-1])[cont[1:]]
+
+    day = np.flatnonzero(~np.isnan(dT))
+    out["jump"] = frame(day, day, dT[day])
+
+    rising = dT > 0
+    run_id, s, e = _runs(rising, breaks)
+    total = np.bincount(run_id[rising], weights=dT[rising], minlength=len(s))
+    out["warm_spell"] = frame(s, e, total)
+
+    thaw = T > 0
+    run_id, s, e = _runs(thaw, breaks)
+    dd = np.bincount(run_id[thaw], weights=T[thaw], minlength=len(s))
+    # оттепель считается, если на следующий день снова T <= 0
+    nxt = np.minimum(e + 1, len(T) - 1)
+    refrozen = (e + 1 < len(T)) & cont[nxt] & (T[nxt] <= 0)
+    out["refreeze"] = frame(s[refrozen], e[refrozen], dd[refrozen])
+
+    if snow in df.columns:
+        S = pd.to_numeric(df[snow], errors="coerce").to_numpy(dtype=float)[order]
+        drop = np.full(len(S), np.nan)
+        drop[cont] = (S[:-1] - S[1:])[cont[1:]]
+        day = np.flatnonzero(drop > 0)
+        out["melt_day"] = frame(day, day, drop[day])
+    return out
+
+
+def add(catalogue, events):
+    """Слить события куска с кучами каталога (на месте)"""
+    k = catalogue["k"]
+    for kind, ev in events.items():
+        if ev.empty:
+            continue
+        mag = ev["magnitude"].to_numpy()
+        top = np.argpartition(-mag, k - 1)[:k] if len(mag) > k else np.arange(len(mag))
+        heap = catalogue["heaps"][kind]
+        cols = [ev[c].to_numpy() for c in FIELDS]
+        for i in top:
+            catalogue["seq"] += 1
+            item = (float(mag[i]), catalogue["seq"], tuple(c[i] for c in cols))
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item[0] > heap[0][0]:
+                heapq.heapreplace(heap, item)
+    return catalogue
+
+
+def season_chunks(df):
+    """Куски по сезонам (с 1 октября): серии событий через границу не проходят"""
+    d = pd.DatetimeIndex(df["date"])
+    season = d.year - (d.month < 10)
+    for _, chunk in df.groupby(np.asarray(season), sort=True):
+        yield chunk
+
+
+def scan(chunks, k=TOP_K, temp="t_mean", snow="snow_height_cm", catalogue=None):
+    """Каталог по потоку кусков (или одной таблице, она делится по сезонам)"""
+    catalogue = new_catalogue(k) if catalogue is None else catalogue
+    if isinstance(chunks, pd.DataFrame):
+        chunks = season_chunks(chunks)
+    for chunk in chunks:
+        add(catalogue, detect(chunk, temp, snow))
+    return catalogue
+
+
+def to_frame(catalogue, kind=None):
+    """Каталог -> таблица по убыванию величины (kind — один тип или все)"""
+    kinds = [kind] if kind else list(EVENT_TYPES)
+    frames = []
+    for t in kinds:
+        rows = [item[2] for item in sorted(catalogue["heaps"][t], key=lambda it: (-it[0], it[1]))]
+        f = pd.DataFrame(rows, columns=FIELDS)
+        f.insert(0, "rank", np.arange(1, len(f) + 1))
+        f.insert(0, "event", t)
+        frames.append(f)
+    return pd.concat(frames, ignore_index=True)
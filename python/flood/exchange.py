@@ -0,0 +1,181 @@
+"""Общий файл обмена с MATLAB (MAT v7.3 = HDF5 с заголовком MATLAB)
+
+Python один раз чистит данные (хранилище store) и выгружает их вместе с
+результатами модели в один файл с постоянной схемой; MATLAB читает его
+обычным load, без readtable/str2double:
+
+    S = load("flood_exchange.mat");
+    S.stations.station_id   % char N x 9, строка k — станция с кодом k
+    S.stations.region       % char N x 6
+    S.stations.name         % char N x w
+    S.air.station           % int16, номер строки в S.stations
+    S.air.date              % double, datenum
+    S.air.t_mean ...        % double, NaN — пропуск
+
+Группы: air, soil (лист «Сред/Макс/Мин»), forcing, results — только те,
+таблицы которых есть в хранилище. Схема постоянная: если в таблице нет
+колонки группы, файл не пишется (ValueError). Строки без станции или
+даты не выгружаются, порядок — по станции и дате. Файл читается и через h5read
+(те же пути: /air/t_mean и т.д.).
+
+h5py нужен только здесь и импортируется внутри функций.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from . import api, stations, store
+
+EXCHANGE_FILE = "flood_exchange.mat"
+SCHEMA_VERSION = 1
+DATENUM_EPOCH = 719529  # datenum(1970,1,1)
+# группа файла -> (таблица хранилища, колонки)
+GROUPS = {
+    "air": ("air_temp", ["t_mean", "t_max", "t_min"]),
+    "soil": ("soil_temp", ["t_mean", "t_max", "t_min"]),
+    "forcing": ("forcing", ["t_air_mean", "t_air_max", "t_air_min", "t_soil_mean", "t_soil_max",
+                            "t_soil_min", "snow_height_cm", "soil_code"]),
+    "results": (api.RESULTS_TABLE, api.VARIABLES),
+}
+USERBLOCK = 512
+
+
+# ЗАПИСЬ В ФОРМАТЕ MATLAB
+def _header():
+    """Первые 128 байт MAT-файла: текст, смещение подсистемы, версия 0x0200, 'IM'"""
+    text = f"MATLAB 7.3 MAT-file, Platform: GLNXA64, Created on: {time.strftime('%a %b %d %H:%M:%S %Y')} HDF5 schema 1.00 ."
+    return text.encode("ascii").ljust(116, b" ") + b"\x00" * 8 + b"\x00\x02" + b"IM"
+
+
+def _put(grp, name, values, cls):
+    """Вектор -> столбец MATLAB (в HDF5 хранится транспонированным)"""
+    ds = grp.create_dataset(name, data=np.asarray(values).reshape(1, -1), compression="gzip")
+    ds.attrs["MATLAB_class"] = np.bytes_(cls)
+
+
+def _put_char(grp, name, strings):
+    """Строки -> char-матрица N x w (UTF-16, дополнена пробелами)"""
+    width = max([len(s) for s in strings] + [1])
+    codes = np.array([[ord(c) for c in s.ljust(width)] for s in strings], dtype=np.uint16).reshape(-1, width)
+    ds = grp.create_dataset(name, data=codes.T)
+    ds.attrs["MATLAB_class"] = np.bytes_("char")
+    ds.attrs["MATLAB_int_decode"] = np.int32(2)
+
+
+def _struct(f, name, fields):
+    import h5py
+
+    grp = f.create_group(name)
+    grp.attrs["MATLAB_class"] = np.bytes_("struct")
+    grp.attrs.create("MATLAB_fields", [np.array(list(k), dtype="S1") for k in fields],
+                     dtype=h5py.vlen_dtype(np.dtype("S1")))
+    return grp
+
+
+def _rows(table, columns, root):
+    """Чистые строки таблицы: коды станций 1..N, datenum, числовые колонки"""
+    meta = store.read_meta(table, root)
+    extra = [c for c in ("station_name",) if c in meta["columns"]]
+    df = store.read_table(table, ["station_id", "date"] + extra + columns, root)
+    sid = df["station_id"].astype(object)
+    if extra:
+        # станция не проставлена — по названию, как в air temp/2.py
+        by_name, _ = stations.lookup(df["station_name"].to_numpy())
+        sid = sid.where(sid.notna(), pd.Series(np.asarray(by_name, dtype=object), index=df.index))
+    codes = np.asarray(pd.Categorical(sid, dtype=stations.STATION_DTYPE).codes)
+    ok = (codes >= 0) & df["date"].notna().to_numpy()
+    order = np.lexsort((df["date"].to_numpy()[ok], codes[ok]))
+
+    out = {
+        "station": (codes[ok][order] + 1).astype(np.int16),
+        "date": df["date"].to_numpy(dtype="datetime64[D]")[ok][order].astype(np.int64) + float(DATENUM_EPOCH),
+    }
+    for c in columns:
+        out[c] = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float)[ok][order]
+    return out
+
+
+def export(path=EXCHANGE_FILE, root=store.STORE_DIR, groups=None):
+    """Выгрузить группы GROUPS, таблицы которых есть в хранилище. Возвращает {группа: строк}"""
+    import h5py
+
+    groups = groups or list(GROUPS)
+    tmp = path + ".tmp"
+    written = {}
+    # схема проверяется до записи: недописанный файл не остаётся
+    for name in groups:
+        table, columns = GROUPS[name]
+        if store.exists(table, root):
+            missing = [c for c in columns if c not in store.read_meta(table, root)["columns"]]
+            if missing:
+                raise ValueError(f"{name} ({table}): нет колонок {missing} — схема файла обмена постоянная")
+    with h5py.File(tmp, "w", userblock_size=USERBLOCK, libver="earliest") as f:
+        meta = _struct(f, "meta", ["schema_version", "created", "tables"])
+        _put(meta, "schema_version", [float(SCHEMA_VERSION)], "double")
+        _put_char(meta, "created", [pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")])
+
+        st = _struct(f, "stations", ["station_id", "region", "name"])
+        _put_char(st, "station_id", [s[0] for s in stations.STATIONS])
+        _put_char(st, "region", [s[2] for s in stations.STATIONS])
+        _put_char(st, "name", [s[1] for s in stations.STATIONS])
+
+        for name in groups:
+            table, columns = GROUPS[name]
+            if not store.exists(table, root):
+                continue
+            rows = _rows(table, columns, root)
+            grp = _struct(f, name, list(rows))
+            _put(grp, "station", rows.pop("station"), "int16")
+            for c, values in rows.items():
+                _put(grp, c, values, "double")
+            written[name] = len(rows["date"])
+        # версии таблиц-источников: MATLAB может проверить, что файл свежий
+        _put_char(meta, "tables", [f"{g}:{GROUPS[g][0]}:v{store.read_meta(GROUPS[g][0], root)['version']}"
+                                   for g in written])
+
+    with open(tmp, "r+b") as fh:
+        fh.write(_header().ljust(USERBLOCK, b"\x00"))
+    os.replace(tmp, path)
+    return written
+
+
+# ЧТЕНИЕ В PYTHON
+def _char(ds):
+    codes = np.asarray(ds).T
+    return ["".join(map(chr, row)).rstrip() for row in codes]
+
+
+def read(path=EXCHANGE_FILE, groups=None):
+    """Файл обмена -> {группа: DataFrame(station_id, region, date, колонки)}"""
+    import h5py
+
+    out = {}
+    with h5py.File(path, "r") as f:
+        ids = np.array(_char(f["stations/station_id"]), dtype=object)
+        regions = np.array(_char(f["stations/region"]), dtype=object)
+        for name in groups or [g for g in GROUPS if g in f]:
+            grp = f[name]
+            code = np.asarray(grp["station"]).ravel().astype(np.int64) - 1
+            df = pd.DataFrame({
+                "station_id": ids[code],
+                "region": regions[code],
+                "date": (np.asarray(grp["date"]).ravel().astype(np.int64) - DATENUM_EPOCH).astype("datetime64[D]")
+                        .astype("datetime64[ns]"),
+            })
+            fields = ["".join(ch.decode() for ch in k) for k in grp.attrs["MATLAB_fields"]]
+            for c in fields:
+                if c not in ("station", "date"):
+                    df[c] = np.asarray(grp[c]).ravel()
+            out[name] = stations.encode(df)
+    return out
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else EXCHANGE_FILE
+    for name, n in export(path).items():
+        print(f"{name}: {n} строк")
+    print(path)
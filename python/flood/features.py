@@ -0,0 +1,276 @@
+"""Признаки для анализа паводка по станциям и суткам (хранилище признаков)
+
+Одни и те же производные величины (dT/dt, градусо-дни, первый переход
+через 0, средние за месяц, глубина промерзания, накопленное таяние и
+инфильтрация) считаются один раз и лежат в таблице хранилища FEATURES_TABLE.
+Скрипты и модели читают их через read().
+
+Наблюдения разворачиваются в матрицы (сутки x станции), все признаки
+по ним — операции над массивами. Накопленные величины обнуляются с
+началом сезона (1 октября, как раскрутка в spinup). Пропущенные дни в
+градусо-дни не входят: ddf_days — сколько дней сезона в них вошло (при
+данных с февраля это не сумма за сезон). Новые дни досчитываются
+инкрементально: пересчёт идёт с начала сезона, в который попадает
+since - LOOKBACK_DAYS, старые строки не трогаются. Если
+таблица наблюдений изменилась задним числом (сверяется хэш входов по
+месяцам), пересчёт начинается с первого изменённого месяца.
+
+Запуск из папки python:  python -m flood.features [таблица] [с_даты]
+"""
+
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from . import checkpoints, heat, spinup, store
+
+FEATURES_TABLE = "features"
+CHAIN_DIR = os.path.join(checkpoints.CHECKPOINT_DIR, "features")
+FEATURES_VERSION = 2  # поднять при изменении формул: таблица пересоберётся
+LOOKBACK_DAYS = 30    # самое длинное скользящее окно
+THAW_FROM = (2, 1)    # первый переход через 0°C ищется с 1 февраля
+TEMP = "t_air_mean"
+INPUT_COLUMNS = ["station_id", "region", "date", "t_air_mean", "t_soil_mean", "snow_height_cm", "soil_code"]
+SNOW = "snow_height_cm"
+
+OBS_FEATURES = ["dT_dt", "warmup_3d", "warmup_7d", "t_30d", "t_month_mean",
+                "ddf_pos", "ddf_neg", "ddf_days", "days_since_thaw", "snow_trend_5d"]
+MODEL_FEATURES = ["Z_0C", "melt_cum", "infil_cum"]
+
+
+# ОПЕРАЦИИ НАД МАТРИЦАМИ (сутки x станции)
+def _rolling_mean(X, w):
+    """Скользящее среднее за w суток по оси 0 без учёта NaN"""
+    ok = ~np.isnan(X)
+    zero = np.zeros((1, X.shape[1]))
+    c = np.vstack([zero, np.cumsum(np.where(ok, X, 0.0), axis=0)])
+    n = np.vstack([zero, np.cumsum(ok, axis=0)])
+    hi = np.arange(1, len(X) + 1)
+    lo = np.maximum(hi - w, 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n[hi] > n[lo], (c[hi] - c[lo]) / (n[hi] - n[lo]), np.nan)
+
+
+def _segment_cumsum(X, seg):
+    """Накопленная сумма по оси 0, заново с начала каждого сегмента seg (D,)"""
+    c = np.cumsum(X, axis=0)
+    start = np.flatnonzero(np.r_[True, seg[1:] != seg[:-1]])
+    before = np.vstack([np.zeros((1, X.shape[1])), c])[start]
+    return c - np.repeat(before, np.diff(np.r_[start, len(seg)]), axis=0)
+
+
+def _lag_diff(X, k):
+    """(X[t] - X[t-k]) / k; первые k суток — NaN"""
+    out = np.full(X.shape, np.nan)
+    out[k:] = (X[k:] - X[:-k]) / k
+    return out
+
+
+def season_ids(dates):
+    """Номер сезона (год его начала 1 октября) для каждой даты"""
+    d = pd.DatetimeIndex(dates)
+    before = (d.month < spinup.SPINUP_MONTH) | ((d.month == spinup.SPINUP_MONTH) & (d.day < spinup.SPINUP_DAY))
+    return d.year.to_numpy() - before.astype(int)
+
+
+def obs_features(dates, T, S):
+    """Признаки из наблюдений: T, S — матрицы (сутки x станции) температуры и снега"""
+    season = season_ids(dates)
+    month = pd.DatetimeIndex(dates).to_period("M").asi8
+    ok = ~np.isnan(T)
+    T0 = np.where(ok, T, 0.0)
+
+    dT = _lag_diff(T, 1)
+    month_n = _segment_cumsum(ok.astype(float), month)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        month_mean = np.where(month_n > 0, _segment_cumsum(T0, month) / month_n, np.nan)
+
+    # первый день сезона после THAW_FROM со средней выше 0
+    d = pd.DatetimeIndex(dates)
+    after = ((d.month > THAW_FROM[0]) | ((d.month == THAW_FROM[0]) & (d.day >= THAW_FROM[1])))
+    after &= d.month < spinup.SPINUP_MONTH
+    warm = (T > 0) & after[:, None]
+    idx = np.arange(len(dates), dtype=float)[:, None]
+    first = np.where(warm, idx, np.inf)
+    for s in np.unique(season):
+        rows = season == s
+        first[rows] = np.minimum.accumulate(first[rows], axis=0)
+    since_thaw = np.where(np.isfinite(first), idx - first, np.nan)
+
+    return {
+        "dT_dt": dT,
+        "warmup_3d": _rolling_mean(dT, 3),
+        "warmup_7d": _rolling_mean(dT, 7),
+        "t_30d": _rolling_mean(T, LOOKBACK_DAYS),
+        "t_month_mean": month_mean,
+        "ddf_pos": _segment_cumsum(np.maximum(T0, 0.0), season),
+        "ddf_neg": _segment_cumsum(np.maximum(-T0, 0.0), season),
+        "ddf_days": _segment_cumsum(ok.astype(float), season),
+        "days_since_thaw": since_thaw,
+        "snow_trend_5d": _lag_diff(S, 5),
+    }
+
+
+def model_features(df, station_ids, dates, chain_start, root=CHAIN_DIR):
+    """Глубина промерзания и накопленные таяние/инфильтрация по модели heat.
+
+    Модель идёт одной цепочкой от chain_start по сплошному ряду станции;
+    состояния на конец каждого месяца сохраняются, и пересчёт с любой
+    даты начинается с ближайшего из них — результат тот же, что и при
+    расчёте с начала цепочки. Состояние берётся, только если ряд станции
+    до его даты не изменился (checkpoints.data_key).
+    """
+    cache_root = os.path.join(root, f"{chain_start:%Y-%m-%d}")
+    season = season_ids(dates)
+    out = {k: np.full((len(dates), len(station_ids)), np.nan) for k in MODEL_FEATURES}
+    for j, station in enumerate(station_ids):
+        dfd = heat.station_days(df, station)
+        if dfd.empty:
+            continue
+        state = checkpoints.latest_state(station, before=dates[0] - pd.Timedelta(days=1), root=cache_root, dfd=dfd)
+        if state is None:
+            mean, _ = spinup.TSURF_CLIMATE.get(dfd["region"].iloc[0], spinup.DEFAULT_CLIMATE)
+            state = heat.initial_state(mean, chain_start)
+        days = spinup.continuous_days(dfd, chain_start, dates[-1])
+        days = days[days["date"] > state["date"]]
+
+        parts = []
+        for _, chunk in days.groupby(days["date"].dt.to_period("M")):
+            state, res = heat.advance(state, chunk)
+            state["key"] = checkpoints.data_key(dfd, state["date"])
+            checkpoints.save_state(station, state, cache_root)
+            parts.append(res)
+        res = pd.concat(parts).set_index("date").reindex(dates)
+        out["Z_0C"][:, j] = res["Z_0C"].to_numpy()
+        out["melt_cum"][:, j] = res["M_rate"].fillna(0).to_numpy()
+        out["infil_cum"][:, j] = res["q_infil"].fillna(0).to_numpy()
+    for k in ("melt_cum", "infil_cum"):
+        out[k] = _segment_cumsum(out[k], season)
+    return out
+
+
+# СБОРКА ТАБЛИЦЫ
+def _wide(df, col, station_ids, dates):
+    wide = df.pivot_table(index="date", columns="station_id", values=col, aggfunc="mean", observed=True)
+    return wide.reindex(index=dates, columns=station_ids).to_numpy(dtype=float)
+
+
+def build(df, start=None, end=None, model=True, chain_start=None):
+    """Признаки для строк df (station_id, date, t_air_mean, ...) с датой в [start, end].
+
+    Расчёт идёт с начала сезона, в который попадает start - LOOKBACK_DAYS,
+    чтобы накопленные суммы и скользящие окна были полными.
+    """
+    df = df.dropna(subset=["station_id", "date"])
+    start = pd.Timestamp(start) if start is not None else df["date"].min()
+    end = pd.Timestamp(end) if end is not None else df["date"].max()
+    ctx = spinup.spinup_start(start - pd.Timedelta(days=LOOKBACK_DAYS))
+    chain_start = spinup.spinup_start(df["date"].min()) if chain_start is None else chain_start
+    ctx = max(ctx, chain_start)
+    part = df[(df["date"] >= ctx) & (df["date"] <= end)]
+
+    dates = pd.date_range(ctx, end, freq="D")
+    station_ids = sorted(str(s) for s in part["station_id"].unique())
+    T = _wide(part, TEMP, station_ids, dates)
+    S = _wide(part, SNOW, station_ids, dates)
+    feats = obs_features(dates, T, S)
+    if model:
+        # ряды станций целиком: заполнение пропусков не зависит от окна
+        feats.update(model_features(df, station_ids, dates, chain_start))
+
+    # обратно в длинную таблицу: только станции-сутки, которые есть в данных
+    present = ~np.isnan(_wide(part.assign(_one=1.0), "_one", station_ids, dates))
+    present &= (dates >= start)[:, None]
+    sj, di = np.nonzero(present.T)  # по станциям, внутри — по датам
+    out = pd.DataFrame({"station_id": np.asarray(station_ids, dtype=object)[sj], "date": dates[di]})
+    for name, X in feats.items():
+        out[name] = X[di, sj]
+    return out
+
+
+def month_keys(src):
+    """Хэш входов (INPUT_COLUMNS) по месяцам: {"ГГГГ-ММ": хэш}"""
+    part = src[INPUT_COLUMNS].astype({"station_id": str, "region": str})
+    part = part.sort_values(["station_id", "date"], kind="stable")
+    keys = {}
+    for month, rows in part.groupby(part["date"].dt.to_period("M")):
+        digest = hashlib.sha1(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes())
+        keys[str(month)] = digest.hexdigest()[:16]
+    return keys
+
+
+def changed_since(meta, keys):
+    """Начало первого месяца до meta['through'], чьи входы изменились, или None"""
+    through = pd.Timestamp(meta["through"]).to_period("M")
+    old = meta["months"]
+    changed = [m for m in sorted(set(keys) | set(old))
+               if pd.Period(m, "M") <= through and keys.get(m) != old.get(m)]
+    return pd.Period(changed[0], "M").to_timestamp() if changed else None
+
+
+def update(table="forcing", since=None, model=True, root=store.STORE_DIR):
+    """Собрать или дополнить FEATURES_TABLE по таблице наблюдений хранилища.
+
+    since=None: если признаки уже есть и формулы не менялись, считаются
+    только дни после последней даты в признаках, а если таблица
+    наблюдений с тех пор менялась (version) — ещё и с первого месяца,
+    где изменились входы; иначе — всё заново. Возвращает число
+    пересчитанных строк.
+    """
+    src = store.read_table(table, root=root)
+    src = src.dropna(subset=["station_id", "date"])
+    version = store.read_meta(table, root)["version"]
+    keys = month_keys(src)
+
+    old = None
+    if store.exists(FEATURES_TABLE, root):
+        meta = store.read_meta(FEATURES_TABLE, root).get("source", {})
+        if (meta.get("table") == table and meta.get("features") == FEATURES_VERSION and meta.get("model") == model
+                and "months" in meta):
+            old = store.read_table(FEATURES_TABLE, root=root)
+            if since is None:
+                since = pd.Timestamp(meta["through"]) + pd.Timedelta(days=1)
+            if meta.get("version") != version:
+                changed = changed_since(meta, keys)
+                since = min(pd.Timestamp(since), changed) if changed is not None else since
+    if old is None:
+        since = None
+
+    if since is not None and since > src["date"].max():
+        return 0
+    new = build(src, start=since, model=model, chain_start=spinup.spinup_start(src["date"].min()))
+    if since is not None:
+        keep = old[old["date"] < pd.Timestamp(since)].copy()
+        keep["station_id"] = keep["station_id"].astype(str)
+        new = pd.concat([keep, new], ignore_index=True)
+        new = new.sort_values(["station_id", "date"], kind="stable").reset_index(drop=True)
+
+    new["station_id"] = pd.Categorical(new["station_id"])
+    store.write_table(FEATURES_TABLE, new, root, source={
+        "table": table, "version": version, "features": FEATURES_VERSION, "model": model,
+        "through": str(new["date"].max().date()), "months": keys,
+    })
+    return int((new["date"] >= pd.Timestamp(since)).sum()) if since is not None else len(new)
+
+
+def read(columns=None, stations=None, start=None, end=None, root=store.STORE_DIR):
+    """Признаки из хранилища (station_id, date + columns), с отбором по станциям и датам"""
+    cols = None if columns is None else ["station_id", "date"] + [c for c in columns if c not in ("station_id", "date")]
+    df = store.read_table(FEATURES_TABLE, cols, root)
+    mask = np.ones(len(df), dtype=bool)
+    if stations is not None:
+        mask &= df["station_id"].astype(str).isin(list(stations)).to_numpy()
+    if start is not None:
+        mask &= (df["date"] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (df["date"] <= pd.Timestamp(end)).to_numpy()
+    return df[mask].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    table = sys.argv[1] if len(sys.argv) > 1 else "forcing"
+    since = pd.Timestamp(sys.argv[2]) if len(sys.argv) > 2 else None
+    print(f"{FEATURES_TABLE}: пересчитано строк {update(table, since)}")
@@ -0,0 +1,333 @@
+"""1D тепловая модель почвы + таяние и инфильтрация (из heat equation/2.py)"""
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import solve_banded
+
+from . import stations
+
+REGIONS = ["KZ-ATY", "KZ-ZAP", "KZ-AKT", "KZ-KUS", "KZ-SEV"]
+
+# СЕТКА ПО ГЛУБИНЕ
+L = 1.0
+dz = 0.02
+z = np.arange(0, L + dz, dz)
+Nz = len(z)
+dt = 24 * 3600  # сутки
+
+# ТЕПЛОФИЗИЧЕСКИЕ ПАРАМЕТРЫ
+KAPPA_BY_REGION = {
+    "KZ-SEV": 0.90e-6, "KZ-KUS": 0.90e-6,  # черноземы
+    "KZ-AKT": 0.70e-6, "KZ-ATY": 0.65e-6,  # каштановые/песчаные
+    "KZ-ZAP": 0.65e-6
+}
+DEFAULT_KAPPA = 0.75e-6
+KAPPA_FACTOR_BY_SOILCODE = {0: 0.80, 1: 1.00, 2: 1.10, 3: 1.20, 4: 0.85, 5: 0.85, 6: 0.90, 7: 0.90, 8: 0.95, 9: 0.90}
+k_snow = 6.0  # затухание T под снегом
+SEASON_START = (10, 1)  # 1 октября: с него сезон, накопленное таяние F_cum обнуляется
+
+# ФАЗОВЫЙ ПЕРЕХОД
+L_f = 3.34e5    # Дж/кг (скрытая теплота)
+rho_ice = 917   # кг/м³
+C_soil = 2.0e6  # Дж/м³К
+
+# ПАРАМЕТРЫ ДАРСИ ПО РЕГИОНАМ
+DARSI_PARAMS = {
+    "KZ-SEV": {"K_sat": 5.0, "psi_f": 25},   # черноземы
+    "KZ-KUS": {"K_sat": 6.0, "psi_f": 22},
+    "KZ-AKT": {"K_sat": 10.0, "psi_f": 15},  # каштановые
+    "KZ-ATY": {"K_sat": 30.0, "psi_f": 10},  # песчаные
+    "KZ-ZAP": {"K_sat": 15.0, "psi_f": 18}
+}
+
+# ГОРИЗОНТЫ: (нижняя граница м, множитель теплопроводности, C Дж/м³К)
+# множитель — к теплопроводности верхнего горизонта (kappa * C_soil)
+HORIZONS_BY_REGION = {
+    "KZ-SEV": [(0.4, 1.00, 2.2e6), (1.2, 1.15, 2.1e6), (np.inf, 1.30, 2.0e6)],
+    "KZ-KUS": [(0.4, 1.00, 2.2e6), (1.2, 1.15, 2.1e6), (np.inf, 1.30, 2.0e6)],
+    "KZ-AKT": [(0.3, 1.00, 2.0e6), (1.0, 1.20, 1.9e6), (np.inf, 1.30, 1.9e6)],
+    "KZ-ATY": [(0.3, 1.00, 1.8e6), (np.inf, 1.20, 1.8e6)],
+    "KZ-ZAP": [(0.3, 1.00, 1.9e6), (np.inf, 1.20, 1.9e6)],
+}
+
+COLUMNS = {
+    "Регион": "region", "Станция_айди": "station_id", "Дата": "date",
+    "Средтемпвоздуха": "t_air_mean", "Средтемппочвы": "t_soil_mean",
+    "Высотапокровасм": "snow_height_cm", "Шифрпочвы": "soil_code"
+}
+
+
+def to_num(s):
+    return pd.to_numeric(s, errors="coerce")
+
+
+def load_forcing(filepath):
+    """Суточные данные станций в виде для модели"""
+    df = pd.read_excel(filepath)
+    df = df.rename(columns=COLUMNS)
+    stations.encode(df)
+
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df = df.dropna(subset=["date"])
+    df["date"] = df["date"].dt.floor("D")
+    df = df[df["region"].isin(REGIONS)]
+
+    for c in ["t_air_mean", "t_soil_mean", "snow_height_cm", "soil_code"]:
+        df[c] = to_num(df[c])
+    return df
+
+
+def surface_bc(row):
+    """Граничное условие поверхности"""
+    if pd.notna(row["t_soil_mean"]):
+        return row["t_soil_mean"]
+    H = row["snow_height_cm"] / 100 if pd.notna(row["snow_height_cm"]) else 0.0
+    return row["t_air_mean"] * np.exp(-k_snow * H)
+
+
+def air_surface(t_air, snow_height_cm, k=None):
+    """Поверхность по воздуху и снегу (ветка surface_bc без наблюдений почвы), по массивам"""
+    H = np.nan_to_num(np.asarray(snow_height_cm, dtype=float)) / 100
+    return np.asarray(t_air, dtype=float) * np.exp(-(k_snow if k is None else k) * H)
+
+
+def build_kappa(row):
+    base = KAPPA_BY_REGION.get(row["region"], DEFAULT_KAPPA)
+    code = row["soil_code"]
+    factor = KAPPA_FACTOR_BY_SOILCODE.get(int(code), 1.0) if pd.notna(code) else 1.0
+    return base * factor
+
+
+def station_days(df, station):
+    """Суточный ряд одной станции с Tsurf и kappa"""
+    dfs = df[df["station_id"] == station]
+    dfd = dfs.groupby("date", as_index=False).agg({
+        "region": "first",
+        "t_air_mean": "mean",
+        "t_soil_mean": "mean",
+        "snow_height_cm": "mean",
+        "soil_code": "median"
+    })
+    dfd["Tsurf"] = dfd.apply(surface_bc, axis=1).interpolate(limit_direction="both")
+    dfd["kappa"] = dfd.apply(build_kappa, axis=1)
+    return dfd
+
+
+# СЕТКА: УЗЛЫ, ШИРИНЫ ЯЧЕЕК, КОЭФФИЦИЕНТЫ СВЯЗИ
+def stretched_z(L, dz_top, growth):
+    """Узлы 0..L со сгущением к поверхности: шаг растёт в growth раз"""
+    if growth == 1:
+        return np.linspace(0, L, int(round(L / dz_top)) + 1)
+    n = int(np.ceil(np.log1p(L * (growth - 1) / dz_top) / np.log(growth)))
+    h = dz_top * growth ** np.arange(n)
+    zz = np.concatenate([[0.0], np.cumsum(h)])
+    zz[-1] = L
+    if zz[-1] - zz[-2] < 0.5 * h[-2]:  # слишком короткий последний шаг
+        zz = np.delete(zz, -2)
+    return zz
+
+
+def _horizon_values(depths, horizons, col, default):
+    if not horizons:
+        return np.full(len(depths), default)
+    bottoms = np.array([hz[0] for hz in horizons])
+    values = np.array([hz[col] for hz in horizons])
+    idx = np.minimum(np.searchsorted(bottoms, depths, side="left"), len(horizons) - 1)
+    return values[idx]
+
+
+def make_grid(z_nodes, horizons=None, bottom_cell=True):
+    """Сетка для solve_step: произвольные узлы и свойства по горизонтам.
+
+    Конечные объёмы: узел i связан с соседями через грани посередине,
+    теплопроводность грани — по горизонту её середины, теплоёмкость —
+    по горизонту узла. up/lo — коэффициенты без множителя kappa*dt;
+    на равномерной сетке без горизонтов up = lo = 1/dz².
+
+    bottom_cell: нижний узел — полуячейка с нулевым потоком снизу
+    (нужно для крупного нижнего шага); иначе T[-1] = T[-2], как в скриптах.
+    """
+    zz = np.asarray(z_nodes, dtype=float)
+    h = np.diff(zz)
+    width = np.empty_like(zz)
+    width[1:-1] = (zz[2:] - zz[:-2]) / 2
+    width[0], width[-1] = h[0], h[-1]
+
+    k_rel = _horizon_values((zz[:-1] + zz[1:]) / 2, horizons, 1, 1.0)
+    C = _horizon_values(zz, horizons, 2, C_soil)
+
+    up = np.zeros(len(zz))
+    lo = np.zeros(len(zz))
+    up[1:-1] = C_soil * k_rel[1:] / (C[1:-1] * width[1:-1] * h[1:])
+    lo[1:-1] = C_soil * k_rel[:-1] / (C[1:-1] * width[1:-1] * h[:-1])
+    if bottom_cell:
+        lo[-1] = C_soil * k_rel[-1] / (C[-1] * h[-1] / 2 * h[-1])
+    return {"z": zz, "width": width, "up": up, "lo": lo}
+
+
+def region_grid(region, L_deep=3.0, dz_top=0.005, growth=1.08):
+    """Глубокая растянутая сетка с горизонтами региона (~50 узлов на 3 м)"""
+    return make_grid(stretched_z(L_deep, dz_top, growth), HORIZONS_BY_REGION.get(region))
+
+
+# СХЕМЫ ПО ВРЕМЕНИ
+SCHEMES = ("be", "cn", "trbdf2")  # неявный Эйлер, Кранк-Николсон, TR-BDF2
+SCHEME = "be"
+GAMMA = 2 - np.sqrt(2)  # доля шага трапеций в TR-BDF2
+
+
+def _coeffs(n, kappa, grid):
+    """r_up, r_lo: коэффициенты связи узлов за шаг dt"""
+    if grid is None:
+        r_up = np.full(n, kappa * dt / dz**2)
+        r_lo = r_up.copy()
+        r_lo[-1] = 0.0
+        return r_up, r_lo
+    return kappa * dt * grid["up"], kappa * dt * grid["lo"]
+
+
+def _operator(T, r_up, r_lo):
+    """L·T за шаг dt: внутренние узлы и нижняя полуячейка (граница — 0)"""
+    out = np.zeros_like(T)
+    out[1:-1] = r_lo[1:-1] * T[:-2] - (r_up[1:-1] + r_lo[1:-1]) * T[1:-1] + r_up[1:-1] * T[2:]
+    out[-1] = r_lo[-1] * (T[-2] - T[-1])
+    return out
+
+
+def _implicit(b, top, c, r_up, r_lo):
+    """Решить (I - c·L) X = b при X[0] = top (ленточная матрица)"""
+    n = len(b)
+    ab = np.zeros((3, n))
+    ab[0, 2:] = -(c * r_up[1:-1])                   # над диагональю
+    ab[1, 1:-1] = 1 + c * (r_up[1:-1] + r_lo[1:-1])
+    ab[2, :-2] = -(c * r_lo[1:-1])                  # под диагональю
+    ab[1, 0] = 1.0
+
+    b = b.copy()
+    b[0] = top
+    if r_lo[-1] > 0:  # нижняя полуячейка
+        ab[1, -1] = 1 + c * r_lo[-1]
+        ab[2, -2] = -(c * r_lo[-1])
+    else:
+        ab[1, -1] = 1.0
+        ab[2, -2] = -1.0
+        b[-1] = 0.0
+    return solve_banded((1, 1), ab, b)
+
+
+def solve_step(Tn, Tsurf, kappa, grid=None, scheme=SCHEME):
+    """Шаг dt: T[0] = Tsurf, нулевой поток снизу (ленточная матрица).
+
+    grid=None — равномерная сетка z скриптов (арифметика как раньше,
+    чтобы не сдвигать уже посчитанные ряды и контрольные точки).
+    scheme: "be" — неявный Эйлер (1-й порядок), "cn" — Кранк-Николсон
+    (2-й порядок, но колеблется при резкой смене Tsurf), "trbdf2" —
+    трапеции на GAMMA*dt + BDF2 (2-й порядок, L-устойчива).
+    """
+    r_up, r_lo = _coeffs(len(Tn), kappa, grid)
+    if scheme == "be":
+        return _implicit(Tn, Tsurf, 1.0, r_up, r_lo)
+    if scheme == "cn":
+        return _implicit(Tn + 0.5 * _operator(Tn, r_up, r_lo), Tsurf, 0.5, r_up, r_lo)
+    if scheme == "trbdf2":
+        g = GAMMA
+        top = Tn[0] + g * (Tsurf - Tn[0])  # Tsurf внутри суток — линейно
+        T_g = _implicit(Tn + g / 2 * _operator(Tn, r_up, r_lo), top, g / 2, r_up, r_lo)
+        b = (T_g - (1 - g)**2 * Tn) / (g * (2 - g))
+        return _implicit(b, Tsurf, (1 - g) / (2 - g), r_up, r_lo)
+    raise ValueError(f"неизвестная схема: {scheme}")
+
+
+def freezing_depth(T, z_nodes=z):
+    """Глубина изотермы 0°C"""
+    for i in range(1, len(T)):
+        if T[i-1] > 0 >= T[i]:  # переход через 0°C
+            return z_nodes[i-1]
+    return 0.0 if T[0] > 0 else np.nan
+
+
+def melt_rate(T_prev, T_curr, width=None):
+    """Интенсивность таяния мм/сутки (width — ширины ячеек узлов сетки)"""
+    if width is None:
+        ice_prev = np.sum(T_prev < 0) * dz * rho_ice / 1000  # м вод. слоя
+        ice_curr = np.sum(T_curr < 0) * dz * rho_ice / 1000
+    else:
+        ice_prev = np.sum(width[T_prev < 0]) * rho_ice / 1000
+        ice_curr = np.sum(width[T_curr < 0]) * rho_ice / 1000
+    return max(0, (ice_prev - ice_curr) * 24)
+
+
+def green_ampt_infil(M_rate, Z_0C, region, F_cum, darsi=None):
+    """Инфильтрация Green-Ampt (устойчивая реализация); darsi — вместо DARSI_PARAMS"""
+    params = (DARSI_PARAMS if darsi is None else darsi)[region]
+    K_sat = params["K_sat"] / 24      # мм/ч
+    psi_f = params["psi_f"] / 100     # м
+
+    # Редукция по глубине талого слоя
+    thawed_eff = min(1.0, Z_0C / 0.3) if Z_0C > 0 else 0.0
+    K_red = K_sat * thawed_eff
+
+    # защита от F = 0
+    if F_cum <= 1e-6:
+        f = K_red
+    else:
+        f = K_red * (psi_f + F_cum) / F_cum
+
+    return min(f, M_rate)
+
+
+# СОСТОЯНИЕ МОДЕЛИ
+def initial_state(Tsurf0, date, grid=None):
+    """Однородный профиль на день до старта (как в скриптах)"""
+    return {
+        "date": pd.Timestamp(date) - pd.Timedelta(days=1),
+        "T": np.full(Nz if grid is None else len(grid["z"]), float(Tsurf0)),
+        "F_cum": 0.0,
+        "snow_height_cm": np.nan,
+    }
+
+
+def advance(state, dfd, grid=None, scheme=SCHEME, profiles=None):
+    """Продвинуть модель по дням dfd начиная с состояния state.
+
+    grid — сетка make_grid той же длины, что профиль state["T"]
+    (None — равномерная сетка z); scheme — схема по времени (SCHEMES);
+    profiles — список, куда дописывается профиль T на конец каждого дня.
+    Возвращает новое состояние и таблицу суточных результатов.
+    """
+    T = state["T"].copy()
+    z_nodes, width = (z, None) if grid is None else (grid["z"], grid["width"])
+    F_cum = state["F_cum"]
+    snow = state["snow_height_cm"]
+    rows = []
+
+    for _, row in dfd.iterrows():
+        if (row["date"].month, row["date"].day) == SEASON_START:
+            F_cum = 0.0  # Green-Ampt считается по таянию текущего сезона
+        T_prev = T
+        T = solve_step(T_prev, row["Tsurf"], row["kappa"], grid, scheme)
+        if profiles is not None:
+            profiles.append(T)
+
+        Z_0C = freezing_depth(T, z_nodes)
+        M = melt_rate(T_prev, T, width)
+        F_cum += M * 0.001  # м
+        q_infil = green_ampt_infil(M, Z_0C, row["region"], F_cum)
+
+        if pd.notna(row["snow_height_cm"]):
+            snow = row["snow_height_cm"]
+
+        rows.append({
+            "date": row["date"], "Z_0C": Z_0C, "M_rate": M,
+            "q_infil": q_infil, "Q_stok": M - q_infil,
+            "F_cum": F_cum, "snow_height_cm": snow,
+        })
+
+    results = pd.DataFrame(rows)
+    new_state = {
+        "date": dfd["date"].iloc[-1] if len(dfd) else state["date"],
+        "T": T,
+        "F_cum": F_cum,
+        "snow_height_cm": snow,
+    }
+    return new_state, results
@@ -0,0 +1,184 @@
+"""Контроль качества наблюдений станций (массивно, по всем станциям сразу)
+
+Для каждой проверяемой колонки X в таблице хранилища ведётся колонка
+флагов qc_X (битовая маска uint8):
+
+  RANGE    — значение вне физических пределов
+  SPIKE    — одиночный выброс относительно соседних дней
+  STEP     — скачок к предыдущему дню больше допустимого
+  PERSIST  — одно и то же значение N дней подряд
+  CONSIST  — нарушено t_min <= t_mean <= t_max или почва/воздух расходятся
+
+Запуск из папки python:  python -m flood.qc <таблица> [с_даты]
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from . import store
+
+RANGE, SPIKE, STEP, PERSIST, CONSIST = 1, 2, 4, 8, 16
+
+# пределы и пороги по колонкам: (min, max, spike, step, persist_days)
+LIMITS = {
+    "t_mean": (-55, 45, 12, 18, 5),
+    "t_max": (-50, 50, 14, 20, 5),
+    "t_min": (-60, 40, 14, 20, 5),
+    "t_air_mean": (-55, 45, 12, 18, 5),
+    "t_air_max": (-50, 50, 14, 20, 5),
+    "t_air_min": (-60, 40, 14, 20, 5),
+    "t_soil_mean": (-55, 60, 15, 20, 5),
+    "t_soil_max": (-50, 70, 18, 25, 5),
+    "t_soil_min": (-60, 50, 18, 25, 5),
+    "snow_height_cm": (0, 300, 40, 50, None),
+}
+# тройки (min, mean, max) для проверки согласованности
+TRIPLES = [
+    ("t_min", "t_mean", "t_max"),
+    ("t_air_min", "t_air_mean", "t_air_max"),
+    ("t_soil_min", "t_soil_mean", "t_soil_max"),
+]
+SOIL_AIR_MAX_DIFF = 25.0  # °C, суточные средние почвы и воздуха
+WINDOW_DAYS = 10          # запас истории при инкрементальном прогоне
+# старые дни, флаги которых зависят от новых: SPIKE/STEP — предыдущий день,
+# PERSIST — серия, которая может продолжиться в новые дни
+REFLAG_DAYS = max([1] + [p - 1 for *_, p in LIMITS.values() if p])
+
+
+def _neighbours(codes, dates):
+    """Маски: у строки есть предыдущий/следующий день той же станции"""
+    day = np.timedelta64(1, "D")
+    has_prev = np.zeros(len(codes), dtype=bool)
+    has_prev[1:] = (codes[1:] == codes[:-1]) & (dates[1:] - dates[:-1] == day)
+    has_next = np.zeros(len(codes), dtype=bool)
+    has_next[:-1] = has_prev[1:]
+    return has_prev, has_next
+
+
+def _persistence(x, codes, min_len):
+    """Флаг для серий одинаковых значений длиной >= min_len.
+
+    Нуль не считается: 0°C днями держится при таянии (нулевая завеса).
+    """
+    same = np.zeros(len(x), dtype=bool)
+    same[1:] = (x[1:] == x[:-1]) & (codes[1:] == codes[:-1])
+    run_id = np.cumsum(~same)
+    run_len = np.bincount(run_id)
+    return (run_len[run_id] >= min_len) & ~np.isnan(x) & (x != 0)
+
+
+def check_column(x, codes, dates, limits):
+    """Флаги одной колонки (строки отсортированы по станции и дате)"""
+    lo, hi, spike_thr, step_thr, persist_days = limits
+    flags = np.zeros(len(x), dtype=np.uint8)
+    valid = ~np.isnan(x)
+
+    flags[valid & ((x < lo) | (x > hi))] |= RANGE
+
+    has_prev, has_next = _neighbours(codes, dates)
+    prev = np.full(len(x), np.nan)
+    nxt = np.full(len(x), np.nan)
+    prev[1:] = np.where(has_prev[1:], x[:-1], np.nan)
+    nxt[:-1] = np.where(has_next[:-1], x[1:], np.nan)
+    with np.errstate(invalid="ignore"):
+        d1, d2 = x - prev, nxt - x
+        spike = (np.abs(d1) > spike_thr) & (np.abs(d2) > spike_thr) & (np.sign(d1) != np.sign(d2))
+        step = np.abs(d1) > step_thr
+    flags[spike] |= SPIKE
+    flags[step & ~spike] |= STEP
+
+    if persist_days:
+        flags[_persistence(x, codes, persist_days)] |= PERSIST
+    return flags
+
+
+def run(df, columns=None):
+    """Флаги для всех проверяемых колонок df -> {qc_col: массив} в порядке строк df"""
+    columns = [c for c in (columns or LIMITS) if c in df.columns]
+    codes = pd.factorize(df["station_id"])[0].astype(np.int64)
+    dates = df["date"].to_numpy(dtype="datetime64[D]")
+    order = np.lexsort((dates, codes))
+    codes_s, dates_s = codes[order], dates[order]
+
+    flags = {}
+    for c in columns:
+        x = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float64)[order]
+        f = np.zeros(len(df), dtype=np.uint8)
+        f[order] = check_column(x, codes_s, dates_s, LIMITS[c])
+        flags[f"qc_{c}"] = f
+
+    with np.errstate(invalid="ignore"):
+        for lo, mid, hi in TRIPLES:
+            if {lo, mid, hi} <= set(df.columns):
+                bad = (df[lo] > df[mid]).to_numpy() | (df[mid] > df[hi]).to_numpy()
+                for c in (lo, mid, hi):
+                    if f"qc_{c}" in flags:
+                        flags[f"qc_{c}"][bad] |= CONSIST
+        if {"t_soil_mean", "t_air_mean"} <= set(df.columns) and "qc_t_soil_mean" in flags:
+            bad = (np.abs(df["t_soil_mean"] - df["t_air_mean"]) > SOIL_AIR_MAX_DIFF).to_numpy()
+            flags["qc_t_soil_mean"][bad] |= CONSIST
+    return flags
+
+
+def run_table(table, since=None, root=store.STORE_DIR):
+    """Проверить таблицу хранилища и записать колонки qc_*.
+
+    since: если задано, пересчитываются флаги строк с датой >= since и
+    REFLAG_DAYS дней до него (их соседи и серии пришли с новыми днями);
+    история берётся с запасом WINDOW_DAYS, остальные флаги не трогаются.
+    Если какой-то колонки qc_* ещё нет, прогон полный: иначе строки до
+    окна выглядели бы проверенными.
+    """
+    stored = store.read_meta(table, root)["columns"]
+    columns = [c for c in LIMITS if c in stored]
+    df = store.read_table(table, ["station_id", "date"] + columns, root)
+    if any(f"qc_{c}" not in stored for c in columns):
+        since = None
+
+    if since is None:
+        flags = run(df, columns)
+    else:
+        since = np.datetime64(pd.Timestamp(since), "ns")
+        dates = df["date"].to_numpy()
+        part = np.flatnonzero(dates >= since - np.timedelta64(WINDOW_DAYS, "D"))
+        new = dates[part] >= since - np.timedelta64(REFLAG_DAYS, "D")
+        part_flags = run(df.iloc[part].reset_index(drop=True), columns)
+        flags = {}
+        for name, f in part_flags.items():
+            old = np.array(store.read_arrays(table, [name], root)[name])
+            old[part[new]] = f[new]
+            flags[name] = old
+
+    store.write_columns(table, flags, root)
+    return flags
+
+
+def apply(df, keep=0):
+    """Обнулить (NaN) значения с флагами, кроме разрешённых битов keep"""
+    df = df.copy()
+    for c in LIMITS:
+        q = f"qc_{c}"
+        if c in df.columns and q in df.columns:
+            df.loc[(df[q].to_numpy() & ~np.uint8(keep)) > 0, c] = np.nan
+    return df
+
+
+def read_clean(table, columns, root=store.STORE_DIR, keep=0):
+    """Колонки таблицы хранилища, где значения с флагами QC заменены на NaN (см. apply)"""
+    stored = store.read_meta(table, root)["columns"]
+    flags = [f"qc_{c}" for c in columns if f"qc_{c}" in stored]
+    return apply(store.read_table(table, list(columns) + flags, root), keep).drop(columns=flags)
+
+
+def summary(flags):
+    names = {"RANGE": RANGE, "SPIKE": SPIKE, "STEP": STEP, "PERSIST": PERSIST, "CONSIST": CONSIST}
+    rows = {q: {n: int(np.count_nonzero(f & b)) for n, b in names.items()} for q, f in flags.items()}
+    return pd.DataFrame(rows).T
+
+
+if __name__ == "__main__":
+    table = sys.argv[1]
+    since = sys.argv[2] if len(sys.argv) > 2 else None
+    print(summary(run_table(table, since)))
@@ -0,0 +1,209 @@
+"""Реанализ (ERA5 и подобные, NetCDF/GRIB) как замена пропускам станций
+
+Файлы открываются лениво (xarray; GRIB через cfgrib), из каждого
+читается только окно по времени и рамка вокруг станций реестра, так что
+многогигабайтный файл целиком в память не попадает. Файлы ERA5 обычно
+помесячные — это и есть куски, по которым идёт чтение. Вырезки
+кэшируются в хранилище и пересчитываются, только если изменились файлы
+или запрос.
+
+xarray нужен только здесь и импортируется внутри функций.
+"""
+
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import resample, stations, store
+
+# имя в файле -> (колонка скриптов, сдвиг, множитель)
+VARIABLES = {
+    "t2m": ("t_air", -273.15, 1.0),       # K -> °C
+    "skt": ("t", -273.15, 1.0),           # температура поверхности
+    "stl1": ("t_soil", -273.15, 1.0),     # почва 0-7 см
+    "sd": ("snow_height_cm", 0.0, 100 / 0.3),  # м в.э. -> см снега при плотности 0.3
+}
+DEFAULT_VARIABLES = ["t2m", "stl1", "sd"]
+# разные написания координат в NetCDF/GRIB
+COORD_NAMES = {"valid_time": "time", "lat": "latitude", "lon": "longitude"}
+GRIB_EXT = (".grib", ".grb", ".grib2", ".grb2")
+CHUNKS = {"time": 24 * 31}  # если есть dask: кусок — месяц часовых полей
+BBOX_PAD = 0.5              # градусы вокруг крайних станций
+CACHE_PREFIX = "reanalysis"
+
+
+def _open(path):
+    """Ленивое открытие одного файла с приведёнными именами координат"""
+    import xarray as xr
+
+    engine = "cfgrib" if path.lower().endswith(GRIB_EXT) else None
+    chunks = CHUNKS if importlib.util.find_spec("dask") else None
+    ds = xr.open_dataset(path, engine=engine, chunks=chunks)
+    return ds.rename({k: v for k, v in COORD_NAMES.items() if k in ds.variables and v not in ds.variables})
+
+
+def registry_bbox(registry=None, pad=BBOX_PAD):
+    """(запад, юг, восток, север) вокруг станций реестра с координатами"""
+    registry = stations.load_registry() if registry is None else registry
+    lon, lat = registry["longitude"].astype(float), registry["latitude"].astype(float)
+    if lon.isna().all():
+        raise ValueError("в реестре нет координат станций (stations_flood_regions.csv)")
+    return lon.min() - pad, lat.min() - pad, lon.max() + pad, lat.max() + pad
+
+
+def _window(ds, variables, bbox, start, end):
+    """Ленивая вырезка: только нужные переменные, время и рамка"""
+    west, south, east, north = bbox
+    lat = ds["latitude"].values
+    lat_slice = slice(north, south) if lat[0] > lat[-1] else slice(south, north)  # ERA5: с севера
+    return ds[variables].sel(time=slice(start, end), latitude=lat_slice, longitude=slice(west, east))
+
+
+def _files_key(paths, variables, bbox, start, end):
+    """Ключ кэша: файлы (размер, время изменения) и параметры запроса"""
+    files = [(os.path.basename(p), os.path.getsize(p), int(os.path.getmtime(p))) for p in paths]
+    text = json.dumps([files, variables, [round(float(v), 4) for v in bbox], str(start), str(end)])
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def expand(paths):
+    """Путь, маска или список -> отсортированный список файлов"""
+    if isinstance(paths, str):
+        paths = [paths]
+    files = sorted({f for p in paths for f in (glob.glob(p) if glob.has_magic(p) else [p])})
+    if not files:
+        raise FileNotFoundError(f"нет файлов реанализа: {paths}")
+    return files
+
+
+def extract(paths, start, end, bbox, variables=DEFAULT_VARIABLES):
+    """Вырезка по всем файлам -> Dataset в памяти (время, широта, долгота).
+
+    Файлы читаются по одному; в память попадает только вырезка каждого.
+    """
+    import xarray as xr
+
+    start, end = pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(hours=23)
+    parts = []
+    for path in expand(paths):
+        with _open(path) as ds:
+            times = ds["time"].values
+            if len(times) == 0 or times[0] > end.to_datetime64() or times[-1] < start.to_datetime64():
+                continue
+            parts.append(_window(ds, [v for v in variables if v in ds], bbox, start, end).load())
+    if not parts:
+        raise ValueError(f"в файлах реанализа нет данных за {start.date()}..{end.date()}")
+    return xr.concat(parts, dim="time", data_vars="all").sortby("time")
+
+
+def _nearest(coord, values):
+    """Индексы ближайших узлов монотонной оси coord для точек values"""
+    coord = np.asarray(coord, dtype=float)
+    flip = coord[0] > coord[-1]
+    axis = coord[::-1] if flip else coord
+    i = np.clip(np.searchsorted(axis, values), 1, len(axis) - 1)
+    i -= (values - axis[i - 1]) < (axis[i] - values)
+    return len(coord) - 1 - i if flip else i
+
+
+def _daily_columns(codes, times, series, variables):
+    """Срочные ряды точек -> суточные колонки скриптов (через resample.daily)"""
+    out = None
+    for v in variables:
+        name, shift, scale = VARIABLES[v]
+        d = resample.daily(codes, times, series[v] * scale + shift)
+        if name == "snow_height_cm":
+            d = d[["station_code", "date", "mean"]].rename(columns={"mean": name})
+        else:
+            d = resample.to_script_columns(d, name)[["station_code", "date", f"{name}_mean", f"{name}_max", f"{name}_min"]]
+        out = d if out is None else out.merge(d, on=["station_code", "date"], how="outer")
+    return out
+
+
+def point_daily(ds, lon, lat, variables=None):
+    """Суточные ряды в ближайших узлах к точкам (lon, lat) -> длинная таблица с point = номер точки"""
+    variables = [v for v in (variables or DEFAULT_VARIABLES) if v in ds]
+    lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+    iy, ix = _nearest(ds["latitude"].values, lat), _nearest(ds["longitude"].values, lon)
+
+    times = ds["time"].values
+    n_t, n_p = len(times), len(lon)
+    # ряды точка за точкой подряд: порядок, который ждёт resample.daily
+    codes = np.repeat(np.arange(n_p), n_t)
+    t = np.tile(times, n_p)
+    series = {v: ds[v].transpose("time", "latitude", "longitude").values[:, iy, ix].T.ravel().astype(np.float64)
+              for v in variables}
+    return _daily_columns(codes, t, series, variables).rename(columns={"station_code": "point"})
+
+
+def station_forcing(paths, start, end, registry=None, variables=None, root=store.STORE_DIR):
+    """Суточный реанализ в точках станций реестра (station_id, region, date, колонки скриптов).
+
+    Результат кэшируется в таблице "reanalysis_<ключ>" хранилища.
+    """
+    registry = stations.load_registry() if registry is None else registry
+    registry = registry.dropna(subset=["longitude", "latitude"]).reset_index(drop=True)
+    variables = variables or DEFAULT_VARIABLES
+    bbox = registry_bbox(registry)
+    files = expand(paths)
+
+    key = _files_key(files, variables, bbox, start, end)
+    table = f"{CACHE_PREFIX}_{key}"
+    if store.exists(table, root):
+        return store.read_table(table, root=root)
+
+    ds = extract(files, start, end, bbox, variables)
+    daily = point_daily(ds, registry["longitude"], registry["latitude"], variables)
+    daily.insert(0, "station_id", registry["station_id"].to_numpy()[daily["point"].to_numpy()])
+    daily.insert(1, "region", registry["region"].to_numpy()[daily["point"].to_numpy()])
+    daily = daily.drop(columns="point").sort_values(["station_id", "date"]).reset_index(drop=True)
+    stations.encode(daily)
+    store.write_table(table, daily, root, source={"files": [os.path.basename(f) for f in files], "key": key})
+    return daily
+
+
+def grid_daily(paths, start, end, bbox, variables=None):
+    """Суточные поля в рамке для сеточного расчёта: (Dataset дат, широт, долгот).
+
+    Суточные Сред/Макс/Мин считаются над вырезкой; для тепловой модели
+    на сетке каждая ячейка идёт как отдельная «станция».
+    """
+    import xarray as xr
+
+    variables = variables or DEFAULT_VARIABLES
+    ds = extract(paths, start, end, bbox, variables)
+    out = {}
+    for v in [v for v in variables if v in ds]:
+        name, shift, scale = VARIABLES[v]
+        day = (ds[v] * scale + shift).resample(time="1D")
+        if name == "snow_height_cm":
+            out[name] = day.mean()
+        else:
+            out[f"{name}_mean"], out[f"{name}_max"], out[f"{name}_min"] = day.mean(), day.max(), day.min()
+    return xr.Dataset(out)
+
+
+def fill_gaps(df, reanalysis, columns=("t_air_mean", "t_soil_mean", "snow_height_cm")):
+    """Пропуски станционных рядов df -> значения реанализа в той же станции и дате.
+
+    Добавляет колонку filled_<col> (True там, где значение взято из реанализа).
+    """
+    cols = [c for c in columns if c in df.columns and c in reanalysis.columns]
+    key = ["station_id", "date"]
+    right = reanalysis[key + cols].copy()
+    right["station_id"] = right["station_id"].astype(str)
+    left = df.assign(_sid=df["station_id"].astype(str), _row=np.arange(len(df)))
+    merged = left.merge(right.rename(columns={"station_id": "_sid", **{c: f"_r_{c}" for c in cols}}),
+                        on=["_sid", "date"], how="left").sort_values("_row")
+
+    df = df.copy()
+    for c in cols:
+        gap = df[c].isna().to_numpy() & merged[f"_r_{c}"].notna().to_numpy()
+        df[f"filled_{c}"] = gap
+        df.loc[gap, c] = merged[f"_r_{c}"].to_numpy()[gap]
+    return df
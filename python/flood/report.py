@@ -0,0 +1,193 @@
+"""Сводный бюллетень по регионам (HTML, при наличии weasyprint — и PDF)
+
+Всё берётся из хранилища, модель не пересчитывается:
+  - RESULTS_TABLE (api.publish_results): таяние, инфильтрация, сток, Z_0C
+  - таблица наблюдений (forcing): число станций и даты схода снега
+    (snowstate по температуре поверхности почвы)
+
+Раздел каждого региона (таблицы и графики) собирается в отдельном
+процессе; главный процесс только склеивает готовые куски HTML.
+matplotlib и weasyprint необязательны и импортируются внутри функций:
+без первого в отчёте нет графиков, без второго — PDF.
+
+Запуск из папки python:  python -m flood.report [год ...]
+"""
+
+import base64
+import html
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import snowstate, stations, store
+from .api import RESULTS_TABLE, VARIABLES
+
+REPORT_DIR = "reports"
+YEARS = (2021, 2024)
+FORCING_TABLE = "forcing"
+SURFACE_TEMP = ("t_soil_mean", "t_air_mean")  # первая найденная колонка
+REGION_NAMES = {
+    "KZ-ATY": "Атырауская область",
+    "KZ-ZAP": "Западно-Казахстанская область",
+    "KZ-AKT": "Актюбинская область",
+    "KZ-KUS": "Костанайская область",
+    "KZ-SEV": "Северо-Казахстанская область",
+}
+STYLE = """
+body { font-family: sans-serif; margin: 2em; }
+table { border-collapse: collapse; margin: 0.5em 0 1.5em; font-size: 90%; }
+th, td { border: 1px solid #999; padding: 2px 8px; text-align: right; }
+th { background: #eee; }
+h2 { page-break-before: always; }
+img { max-width: 100%; }
+"""
+
+
+# ДАННЫЕ РЕГИОНА
+def _region_rows(table, region, columns, years, root):
+    """Строки таблицы хранилища по станциям региона и выбранным годам"""
+    df = store.read_table(table, ["station_id", "date"] + columns, root)
+    codes = stations.station_codes(stations.encode(df[["station_id"]].copy()))
+    reg = stations.REGION_CODES.index(region)
+    mask = (codes >= 0) & (stations.STATION_REGION[np.maximum(codes, 0)] == reg)
+    mask &= df["date"].dt.year.isin(list(years)).to_numpy()
+    df = df[mask].copy()
+    df["station_id"] = df["station_id"].astype(str)
+    df["year"] = df["date"].dt.year
+    return df.reset_index(drop=True)
+
+
+def summary(res):
+    """По годам: суммы таяния/инфильтрации/стока и максимумы (среднее по станциям за сутки)"""
+    daily = res.groupby(["year", "date"])[VARIABLES].mean()
+    return daily.groupby("year").agg(
+        M_rate_sum=("M_rate", "sum"), M_rate_max=("M_rate", "max"),
+        q_infil_sum=("q_infil", "sum"), Q_stok_sum=("Q_stok", "sum"),
+        Z_0C_max=("Z_0C", "max"),
+    ).round(2)
+
+
+def station_table(res, obs):
+    """По станциям и годам: сток, max Z_0C, дата схода снега"""
+    tab = res.groupby(["station_id", "year"]).agg(
+        Q_stok_sum=("Q_stok", "sum"), Z_0C_max=("Z_0C", "max")).round(2)
+    temp = next((c for c in SURFACE_TEMP if c in obs.columns), None)
+    if temp is None or obs.empty:
+        return tab.reset_index()
+
+    melted = []
+    for _, part in obs.groupby("year"):
+        _, tr = snowstate.classify_frame(part, temp=temp)
+        melted.append(tr[tr["to_state"] == snowstate.LABELS[snowstate.MELTED]])
+    tr = pd.concat(melted, ignore_index=True)
+    # последний сход — после него снег уже не возвращался
+    thaw = tr.assign(year=tr["date"].dt.year).groupby(["station_id", "year"])["date"].max()
+    tab["thaw_date"] = thaw.reindex(tab.index).dt.strftime("%d.%m")
+    return tab.reset_index()
+
+
+# ГРАФИКИ
+def _figure(res, region):
+    """Сток и Z_0C по сезону, по годам -> PNG в base64 или None без matplotlib"""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return None
+
+    fig, axes = plt.subplots(2, 1, figsize=(10, 6), sharex=True)
+    for year, part in res.groupby("year"):
+        daily = part.groupby("date")[["Q_stok", "Z_0C"]].mean()
+        day = daily.index.dayofyear
+        axes[0].plot(day, daily["Q_stok"], label=str(year))
+        axes[1].plot(day, daily["Z_0C"], label=str(year))
+    axes[0].set_ylabel("Сток, мм/сут")
+    axes[1].set_ylabel("Z₀°C, м")
+    axes[1].invert_yaxis()
+    axes[1].set_xlabel("День года")
+    axes[0].set_title(REGION_NAMES.get(region, region))
+    for ax in axes:
+        ax.grid(True)
+        ax.legend()
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=100)
+    plt.close(fig)
+    return base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+# РАЗДЕЛЫ
+def _table_html(df):
+    return df.to_html(index=False, na_rep="—", border=0)
+
+
+def region_section(region, years=YEARS, root=store.STORE_DIR):
+    """HTML-раздел региона и его строка сводки; выполняется в процессе-исполнителе"""
+    res = _region_rows(RESULTS_TABLE, region, VARIABLES, years, root)
+    cols = [c for c in SURFACE_TEMP if c in store.read_meta(FORCING_TABLE, root)["columns"]]
+    obs = _region_rows(FORCING_TABLE, region, cols, years, root)
+
+    summ = summary(res)
+    name = REGION_NAMES.get(region, region)
+    parts = [f"<h2>{html.escape(name)} ({region})</h2>",
+             f"<p>Станций в наблюдениях: {obs['station_id'].nunique()}, "
+             f"в результатах модели: {res['station_id'].nunique()}</p>"]
+    if res.empty:
+        parts.append("<p>Нет результатов модели за выбранные годы.</p>")
+    else:
+        parts += ["<h3>Итоги по годам</h3>", _table_html(summ.reset_index()),
+                  "<h3>По станциям</h3>", _table_html(station_table(res, obs))]
+        png = _figure(res, region)
+        if png is not None:
+            parts.append(f'<img src="data:image/png;base64,{png}" alt="{region}">')
+    return {"region": region, "html": "\n".join(parts), "summary": summ.assign(region=region)}
+
+
+def build(years=YEARS, regions=None, root=store.STORE_DIR, out_dir=REPORT_DIR, workers=None, pdf=True):
+    """Собрать бюллетень по всем регионам; разделы — параллельно. Возвращает пути файлов"""
+    regions = regions or stations.REGION_CODES
+    years = tuple(int(y) for y in years)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        sections = list(pool.map(region_section, regions, [years] * len(regions), [root] * len(regions)))
+
+    overview = pd.concat([s["summary"] for s in sections]).reset_index()
+    overview = overview.pivot(index="region", columns="year",
+                              values=["Q_stok_sum", "M_rate_sum", "Z_0C_max"]) if not overview.empty else overview
+    title = f"Паводок: сводка по регионам ({', '.join(map(str, years))})"
+    doc = "\n".join([
+        "<!DOCTYPE html>", '<html lang="ru"><head><meta charset="utf-8">',
+        f"<title>{html.escape(title)}</title><style>{STYLE}</style></head><body>",
+        f"<h1>{html.escape(title)}</h1>",
+        f"<p>Результаты модели: версия {store.read_meta(RESULTS_TABLE, root)['version']}, "
+        f"сформировано {pd.Timestamp.now():%d.%m.%Y %H:%M}</p>",
+        "<h3>Сток и промерзание по регионам</h3>",
+        overview.round(2).to_html(na_rep="—", border=0),
+        *[s["html"] for s in sections],
+        "</body></html>",
+    ])
+
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.join(out_dir, f"bulletin_{'_'.join(map(str, years))}")
+    with open(stem + ".html", "w", encoding="utf-8") as f:
+        f.write(doc)
+    paths = [stem + ".html"]
+    if pdf:
+        try:
+            import weasyprint
+        except ImportError:
+            return paths
+        weasyprint.HTML(string=doc).write_pdf(stem + ".pdf")
+        paths.append(stem + ".pdf")
+    return paths
+
+
+if __name__ == "__main__":
+    years = [int(y) for y in sys.argv[1:]] or YEARS
+    for path in build(years):
+        print(path)
@@ -0,0 +1,126 @@
+"""Срочные (3-часовые/часовые) наблюдения -> суточные характеристики
+
+Ряды хранятся как есть (station, time, value). Суточные Сред/Макс/Мин,
+градусо-часы и число переходов через 0°C за сутки считаются на лету
+редукциями по корзинам (станция, сутки) и кэшируются в хранилище.
+"""
+
+import numpy as np
+import pandas as pd
+
+from . import store
+
+
+def day_bins(station_codes, times):
+    """Номер корзины (станция, сутки) для каждого наблюдения.
+
+    Наблюдения должны быть отсортированы по станции и времени.
+    Возвращает (bins, начала корзин, коды станций корзин, даты корзин).
+    """
+    codes = np.asarray(station_codes, dtype=np.int64)
+    days = np.asarray(times, dtype="datetime64[D]")
+    new = np.ones(len(codes), dtype=bool)
+    new[1:] = (codes[1:] != codes[:-1]) | (days[1:] != days[:-1])
+    bins = np.cumsum(new) - 1
+    starts = np.flatnonzero(new)
+    return bins, starts, codes[starts], days[starts]
+
+
+def _reduce(values, bins, starts):
+    """mean/max/min/count по подряд идущим корзинам без учёта NaN"""
+    nbins = len(starts)
+    ok = ~np.isnan(values)
+    n = np.bincount(bins, weights=ok, minlength=nbins).astype(np.int64)
+    s = np.bincount(bins, weights=np.where(ok, values, 0.0), minlength=nbins)
+    vmax = np.maximum.reduceat(np.where(ok, values, -np.inf), starts)
+    vmin = np.minimum.reduceat(np.where(ok, values, np.inf), starts)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = s / n
+    empty = n == 0
+    vmax[empty] = np.nan
+    vmin[empty] = np.nan
+    return mean, vmax, vmin, n
+
+
+def degree_hours(values, times, bins, nbins, base=0.0):
+    """Сумма положительных (T - base) * Δt в часах за сутки.
+
+    Каждое наблюдение представляет интервал до следующего срока той же
+    корзины (последнее — до конца суток, первое — ещё и с 00:00), так
+    что интервалы покрывают сутки целиком.
+    """
+    t = np.asarray(times, dtype="datetime64[m]")
+    day_start = t.astype("datetime64[D]").astype("datetime64[m]")
+    day_end = day_start + np.timedelta64(1, "D")
+    nxt = np.empty_like(t)
+    nxt[:-1] = t[1:]
+    nxt[-1] = day_end[-1]
+    last = np.ones(len(bins), dtype=bool)
+    last[:-1] = bins[1:] != bins[:-1]
+    nxt[last] = day_end[last]
+    first = np.ones(len(bins), dtype=bool)
+    first[1:] = bins[1:] != bins[:-1]
+    begin = np.where(first, day_start, t)
+
+    hours = (nxt - begin).astype(np.float64) / 60.0
+    warm = np.clip(np.nan_to_num(values - base, nan=0.0), 0, None)
+    return np.bincount(bins, weights=warm * hours, minlength=nbins)
+
+
+def freeze_thaw_cycles(values, bins, nbins, threshold=0.0):
+    """Число смен знака (T - threshold) между соседними сроками внутри суток"""
+    sign = np.sign(values - threshold)
+    sign[sign == 0] = 1
+    change = np.zeros(len(values), dtype=bool)
+    change[1:] = (sign[1:] != sign[:-1]) & (bins[1:] == bins[:-1])
+    change[1:] &= ~(np.isnan(values[1:]) | np.isnan(values[:-1]))
+    return np.bincount(bins[change], minlength=nbins)
+
+
+def daily(station_codes, times, values):
+    """Суточная таблица: station_code, date, mean, max, min, n, degree_hours, ft_cycles"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return pd.DataFrame(columns=["station_code", "date", "mean", "max", "min", "n", "degree_hours", "ft_cycles"])
+    bins, starts, codes, dates = day_bins(station_codes, times)
+    nbins = len(starts)
+    mean, vmax, vmin, n = _reduce(values, bins, starts)
+    return pd.DataFrame({
+        "station_code": codes,
+        "date": dates.astype("datetime64[ns]"),
+        "mean": mean,
+        "max": vmax,
+        "min": vmin,
+        "n": n,
+        "degree_hours": degree_hours(values, times, bins, nbins),
+        "ft_cycles": freeze_thaw_cycles(values, bins, nbins),
+    })
+
+
+def daily_cached(table, column, root=store.STORE_DIR):
+    """Суточные характеристики колонки срочной таблицы из хранилища.
+
+    Результат кэшируется в таблице "<table>_daily_<column>" и
+    пересчитывается, только если исходная таблица изменилась.
+    """
+    cache = f"{table}_daily_{column}"
+    version = store.read_meta(table, root)["version"]
+    if store.exists(cache, root) and store.read_meta(cache, root).get("source") == {"table": table, "version": version}:
+        return store.read_table(cache, root=root)
+
+    arr = store.read_arrays(table, ["station_id", "time", column], root)
+    codes, times = np.asarray(arr["station_id"]), np.asarray(arr["time"])
+    order = np.lexsort((times, codes))
+    order = order[codes[order] >= 0]  # станции вне реестра
+    out = daily(codes[order], times[order], np.asarray(arr[column])[order])
+    store.write_table(cache, out, root, source={"table": table, "version": version})
+    return out
+
+
+def to_script_columns(obs_daily, prefix):
+    """mean/max/min -> имена колонок скриптов, напр. prefix='t_air' -> t_air_mean"""
+    return obs_daily.rename(columns={
+        "mean": f"{prefix}_mean", "max": f"{prefix}_max", "min": f"{prefix}_min",
+        "degree_hours": f"{prefix}_degree_hours", "ft_cycles": f"{prefix}_ft_cycles",
+    })
@@ -0,0 +1,359 @@
+"""Влагоперенос в почве (уравнение Ричардса) вместе с тепловой колонкой
+
+Все станции (и члены ансамбля) считаются одним пакетом: состояние —
+массивы (S, n), на каждой итерации решается S трёхдиагональных
+систем прогонкой сразу по всем станциям.
+
+  - смешанная форма (масса сохраняется), неявный Эйлер с подшагами
+  - ван Генухтен-Муалем (с входом воздуха по Фогелю) по регионам,
+    K_sat из heat.DARSI_PARAMS
+  - лёд (T < 0) снижает проводимость: K * 10^(-OMEGA * доля льда)
+  - сверху: водоотдача снега (только в дни, когда снег мокрый или
+    растаял — snowstate); что не впитывается, поднимает напор на
+    поверхности и уходит в сток; снизу — свободный дренаж
+
+Влага раскручивается той же цепочкой, что и тепло (с осени перед
+сезоном): SAT0 — только начало цепочки. Состояние пакета (T, ψ) на
+конец каждого месяца сохраняется в RICHARDS_DIR, и следующий расчёт
+начинается с ближайшего, если входы до его даты не менялись.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import checkpoints, heat, snowstate, spinup
+
+# ВАН ГЕНУХТЕН: θr, θs, α (1/м), n
+VG_PARAMS = {
+    "KZ-SEV": (0.080, 0.45, 1.0, 1.35),  # черноземы
+    "KZ-KUS": (0.080, 0.45, 1.2, 1.38),
+    "KZ-AKT": (0.078, 0.43, 3.6, 1.56),  # каштановые
+    "KZ-ATY": (0.065, 0.41, 7.5, 1.89),  # песчаные
+    "KZ-ZAP": (0.070, 0.42, 5.0, 1.70)
+}
+OMEGA = 7.0        # импеданс льда
+ICE_DT = 0.5       # °C, интервал замерзания поровой воды
+SS = 1e-5          # 1/м, упругая ёмкость насыщенной зоны
+AIR_ENTRY = -0.02  # м, напор входа воздуха (Фогель): K и θ у насыщения без особенности
+SNOW_DENSITY = 0.3 # доля воды в снеге: 1 см снега -> 3 мм воды
+SAT0 = 0.6         # начальная насыщенность профиля
+
+DAY = 86400.0
+DT_START, DT_MIN, DT_MAX = 3600.0, 10.0, DAY
+MAX_ITER = 20
+MASS_TOL = 1e-6    # м воды на ячейку за подшаг
+MAX_DPSI = 2.0     # м, ограничение шага итерации
+RUNOFF_RATE = 1e-3 # 1/с: сток с поверхности на 1 м избыточного напора
+POND_SMOOTH = 1e-3 # м, сглаживание начала стока
+RICHARDS_DIR = os.path.join(checkpoints.CHECKPOINT_DIR, "richards")
+
+
+def params_for(regions):
+    """Параметры станций -> dict массивов (S, 1)"""
+    rows = np.array([VG_PARAMS[r] for r in regions], dtype=float)
+    k_sat = np.array([heat.DARSI_PARAMS[r]["K_sat"] for r in regions], dtype=float)
+    p = {k: rows[:, i:i + 1] for i, k in enumerate(["theta_r", "theta_s", "alpha", "n"])}
+    p["m"] = 1 - 1 / p["n"]
+    p["K_sat"] = k_sat[:, None] / 1000 / DAY  # мм/сут -> м/с
+    return p
+
+
+def _theta_m(p):
+    """θ при ψ -> 0 для кривой, проходящей через θs в точке AIR_ENTRY"""
+    return p["theta_r"] + (p["theta_s"] - p["theta_r"]) * (1 + (p["alpha"] * -AIR_ENTRY) ** p["n"]) ** p["m"]
+
+
+def _se_m(psi, p):
+    """Насыщенность относительно θm (ψ ниже AIR_ENTRY)"""
+    x = np.abs(np.minimum(psi, AIR_ENTRY)) * p["alpha"]
+    return (1 + x ** p["n"]) ** (-p["m"])
+
+
+def psi_from_saturation(se, p):
+    se_m = np.clip(se, 1e-6, 1.0) * (p["theta_s"] - p["theta_r"]) / (_theta_m(p) - p["theta_r"])
+    return -((se_m ** (-1 / p["m"]) - 1) ** (1 / p["n"])) / p["alpha"]
+
+
+def water_content(psi, p):
+    """Полное содержание воды (жидкая + лёд), м³/м³"""
+    theta = p["theta_r"] + (_theta_m(p) - p["theta_r"]) * _se_m(psi, p)
+    return theta + SS * np.maximum(psi - AIR_ENTRY, 0.0)
+
+
+def ice_content(theta, T, p):
+    frac = np.clip(-T / ICE_DT, 0.0, 1.0)
+    return frac * (theta - p["theta_r"])
+
+
+def conductivity(psi, T, p):
+    """K(ψ, T): Муалем (с поправкой Фогеля) и импеданс льда, м/с"""
+    se_m = _se_m(psi, p)
+    se_s = (p["theta_s"] - p["theta_r"]) / (_theta_m(p) - p["theta_r"])
+    se = np.minimum(se_m / se_s, 1.0)
+
+    def f(x):
+        return 1 - (1 - x ** (1 / p["m"])) ** p["m"]
+
+    k = p["K_sat"] * np.sqrt(se) * (f(se_m) / f(se_s)) ** 2
+    theta = water_content(psi, p)
+    return k * 10 ** (-OMEGA * ice_content(theta, T, p) / theta)
+
+
+def thomas(a, b, c, d):
+    """Прогонка сразу для пакета систем: a — под, b — диагональ, c — над (..., n)"""
+    n = b.shape[-1]
+    cp = np.empty_like(b)
+    dp = np.empty_like(d)
+    cp[..., 0] = c[..., 0] / b[..., 0]
+    dp[..., 0] = d[..., 0] / b[..., 0]
+    for i in range(1, n):
+        m = b[..., i] - a[..., i] * cp[..., i - 1]
+        cp[..., i] = c[..., i] / m
+        dp[..., i] = (d[..., i] - a[..., i] * dp[..., i - 1]) / m
+    x = np.empty_like(d)
+    x[..., -1] = dp[..., -1]
+    for i in range(n - 2, -1, -1):
+        x[..., i] = dp[..., i] - cp[..., i] * x[..., i + 1]
+    return x
+
+
+def _widths(z):
+    h = np.diff(z)
+    w = np.empty(len(z))
+    w[1:-1] = (h[:-1] + h[1:]) / 2
+    w[0], w[-1] = h[0] / 2, h[-1] / 2
+    return h, w
+
+
+def residual(psi, theta_n, q_top, T, z, p, dt):
+    """Невязка баланса массы по ячейкам, м/с.
+
+    Верхняя ячейка получает всю водоотдачу q_top; избыточный напор на
+    поверхности уходит в сток ~ RUNOFF_RATE * ψ[0] (ψ[0] > 0 держится на
+    уровне миллиметров, так что это и есть условие затопленной
+    поверхности, но без переключений). Возвращает (R, сток м/с, дренаж м/с).
+    """
+    h, w = _widths(z)
+    K = conductivity(psi, T, p)
+    # K на границе ячеек — среднее геометрическое: на фронте промачивания
+    # и под мёрзлым слоем арифметическое сильно завышает поток
+    q = np.sqrt(K[:, :-1] * K[:, 1:]) * (1 - np.diff(psi, axis=1) / h)  # вниз > 0
+    pond = np.maximum(psi[:, 0], 0.0)
+    runoff = RUNOFF_RATE * pond**2 / (pond + POND_SMOOTH)  # гладко от нуля
+
+    R = w * (water_content(psi, p) - theta_n) / dt
+    R[:, :-1] += q
+    R[:, -1] += K[:, -1]
+    R[:, 1:] -= q
+    R[:, 0] += runoff - q_top
+    return R, runoff, K[:, -1]
+
+
+def picard_matrix(psi, args):
+    """Матрица модифицированного Пикара (Celia и др., 1990): трёхдиагональная.
+
+    Проводимость берётся с прошлой итерации, ёмкость C = dθ/dψ — разностью
+    назад (в точке входа воздуха — ненасыщенная ветвь). Производных K по ψ
+    нет, поэтому на фронте промачивания сухой почвы итерации не разносит.
+    """
+    theta_n, q_top, T, z, p, dt = args
+    h, w = _widths(z)
+    K = conductivity(psi, T, p)
+    k = np.sqrt(K[:, :-1] * K[:, 1:]) / h
+    eps = 1e-6 * np.maximum(1.0, np.abs(psi))
+    C = (water_content(psi, p) - water_content(psi - eps, p)) / eps
+
+    diag = w * C / dt
+    diag[:, :-1] += k
+    diag[:, 1:] += k
+    lower, upper = np.zeros_like(psi), np.zeros_like(psi)
+    lower[:, 1:] = -k
+    upper[:, :-1] = -k
+    pond = np.maximum(psi[:, 0], 0.0)
+    diag[:, 0] += RUNOFF_RATE * pond * (pond + 2 * POND_SMOOTH) / (pond + POND_SMOOTH) ** 2
+    return lower, diag, upper
+
+
+def picard(psi, args):
+    """Решить residual = 0 для всего пакета; вернуть (ψ, сошлось ли).
+
+    Узел, переходящий через вход воздуха, останавливается на нём: выше
+    ёмкость почти нулевая, и шаг оттуда перебрасывает узел туда и обратно.
+    Сходимость — по изменению запаса воды в ячейках за итерацию и по
+    невязке массы (как в HYDRUS по θ): по напору нельзя, в насыщенной
+    промёрзшей ячейке ни ёмкости, ни проводимости и ψ не определён.
+    """
+    psi = psi.copy()
+    dt, z, p = args[-1], args[3], args[4]
+    w = _widths(z)[1]
+    R = residual(psi, *args)[0]
+    for _ in range(MAX_ITER):
+        dpsi = np.clip(thomas(*picard_matrix(psi, args), -R), -MAX_DPSI, MAX_DPSI)
+        cross = (psi - AIR_ENTRY) * (psi + dpsi - AIR_ENTRY) < 0
+        dpsi[cross] = AIR_ENTRY - psi[cross]
+        change = w * np.abs(water_content(psi + dpsi, p) - water_content(psi, p))
+        psi += dpsi
+        R = residual(psi, *args)[0]
+        if np.all(change < MASS_TOL) and np.all(np.abs(R) * dt < MASS_TOL):
+            return psi, True
+    return psi, False
+
+
+def initial_state(regions, z, sat=SAT0):
+    p = params_for(regions)
+    psi = psi_from_saturation(np.full((len(regions), len(z)), sat), p)
+    return {"psi": psi, "dt": DT_START}
+
+
+def step_day(state, supply, T, z, p):
+    """Сутки влагопереноса при профиле температуры T (S, n) и водоотдаче supply мм/сут.
+
+    Возвращает новое состояние и суточные суммы (мм): инфильтрация, сток,
+    дренаж и ошибка баланса (в пределах допуска, если итерации сошлись).
+    """
+    psi, dt_sub = state["psi"], state["dt"]
+    q_top = np.asarray(supply, dtype=float) / 1000 / DAY
+    runoff = np.zeros(len(psi))
+    drain = np.zeros(len(psi))
+    error = np.zeros(len(psi))
+
+    t = 0.0
+    while t < DAY:
+        h = min(dt_sub, DAY - t)
+        args = (water_content(psi, p), q_top, T, z, p, h)
+        new, ok = picard(psi, args)
+        if not ok and dt_sub > DT_MIN:
+            dt_sub = max(dt_sub / 2, DT_MIN)
+            continue
+
+        # на минимальном шаге итерация принимается, остаток невязки
+        # идёт в ошибку баланса
+        R, q_run, q_out = residual(new, *args)
+        runoff += q_run * h
+        drain += q_out * h
+        error += R.sum(axis=1) * h
+        psi = new
+        t += h
+        dt_sub = min(dt_sub * 1.5, DT_MAX)
+
+    runoff_mm = runoff * 1000
+    return {"psi": psi, "dt": dt_sub}, {
+        "q_infil": np.asarray(supply) - runoff_mm,
+        "Q_stok": runoff_mm,
+        "drainage": drain * 1000,
+        "mass_error": error * 1000,
+    }
+
+
+def snowmelt(snow_height_cm):
+    """Водоотдача снега, мм/сут, по уменьшению высоты покрова (D, S)"""
+    drop = np.maximum(-np.diff(snow_height_cm, axis=0, prepend=snow_height_cm[:1]), 0.0)
+    return drop * 10 * SNOW_DENSITY
+
+
+def heat_step(T, Tsurf, kappa, grid):
+    """Неявный шаг тепловой колонки сразу для всех станций (прогонка)"""
+    r_up = kappa[:, None] * heat.dt * grid["up"]
+    r_lo = kappa[:, None] * heat.dt * grid["lo"]
+    a, b, c = -r_lo, 1 + r_up + r_lo, -r_up
+    d = T.copy()
+    a[:, 0], b[:, 0], c[:, 0], d[:, 0] = 0.0, 1.0, 0.0, Tsurf
+    c[:, -1] = 0.0
+    return thomas(a, b, c, d)
+
+
+# СОСТОЯНИЕ ЦЕПОЧКИ
+def inputs_key(ids, z, *series, through):
+    """Хэш станций, сетки и входов (D, S) по сутки through включительно"""
+    digest = hashlib.sha1("|".join(ids).encode("utf-8"))
+    digest.update(np.ascontiguousarray(z, dtype=float).tobytes())
+    for x in series:
+        digest.update(np.ascontiguousarray(x[:through + 1], dtype=float).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def save_state(date, T, state, ids, key, root=RICHARDS_DIR):
+    os.makedirs(root, exist_ok=True)
+    fname = os.path.join(root, f"{date:%Y-%m-%d}.npz")
+    np.savez(fname, T=T, psi=state["psi"], dt=state["dt"], station_id=np.array(ids, dtype=str), key=key)
+    return fname
+
+
+def latest_state(before, key_at, root=RICHARDS_DIR):
+    """Последнее состояние (не позже before), чей ключ совпал с key_at(дата); (дата, T, состояние) или None"""
+    if not os.path.isdir(root):
+        return None
+    dates = sorted(pd.to_datetime([f[:-4] for f in os.listdir(root) if f.endswith(".npz")], format="%Y-%m-%d"))
+    for date in reversed([d for d in dates if d <= pd.Timestamp(before)]):
+        with np.load(os.path.join(root, f"{date:%Y-%m-%d}.npz")) as f:
+            if str(f["key"]) == key_at(date):
+                return date, f["T"].copy(), {"psi": f["psi"].copy(), "dt": float(f["dt"])}
+    return None
+
+
+def run(df, start, end, spin_from=None, grid=None, root=RICHARDS_DIR):
+    """Сезон для всех станций df (heat.load_forcing) одним пакетом.
+
+    Тепло и влага считаются на одной сетке (по умолчанию глубокая
+    растянутая сетка heat.region_grid) и раскручиваются вместе, с осени
+    перед start; в таблицу идут сутки с start. Возвращает суточную
+    таблицу по станциям.
+    """
+    spin_from = spinup.spinup_start(start) if spin_from is None else pd.Timestamp(spin_from)
+    grid = heat.region_grid(None) if grid is None else grid
+    z = grid["z"]
+
+    ids, regions, series = [], [], []
+    for station in sorted(df["station_id"].dropna().unique()):
+        dfd = heat.station_days(df, station)
+        if dfd.empty:
+            continue
+        days = spinup.continuous_days(dfd, spin_from, end)
+        ids.append(station)
+        regions.append(days["region"].iloc[0])
+        series.append(days)
+
+    dates = pd.DatetimeIndex(series[0]["date"])
+    Tsurf = np.stack([d["Tsurf"].to_numpy() for d in series], axis=1)
+    kappa = np.stack([d["kappa"].to_numpy() for d in series], axis=1)
+    snow = np.stack([d["snow_height_cm"].interpolate(limit_direction="both").fillna(0).to_numpy()
+                     for d in series], axis=1)
+    # оседание снега в мороз — не таяние
+    supply = snowmelt(snow) * snowstate.melting(snowstate.classify(Tsurf))
+
+    p = params_for(regions)
+    cache_root = os.path.join(root, f"{spin_from:%Y-%m-%d}")
+
+    def key_at(date):
+        return inputs_key(ids, z, Tsurf, kappa, supply, through=dates.get_loc(date))
+
+    saved = latest_state(pd.Timestamp(start) - pd.Timedelta(days=1), key_at, cache_root)
+    if saved is None:
+        first = 0
+        T = np.repeat(Tsurf[:1].T, len(z), axis=1)
+        state = initial_state(regions, z)
+    else:
+        date, T, state = saved
+        first = dates.get_loc(date) + 1
+
+    rows = []
+    for i in range(first, len(dates)):
+        date = dates[i]
+        T = heat_step(T, Tsurf[i], kappa[i], grid)
+        state, out = step_day(state, supply[i], T, z, p)
+        if date.is_month_end:
+            save_state(date, T, state, ids, key_at(date), cache_root)
+        if date < pd.Timestamp(start):
+            continue
+        theta = water_content(state["psi"], p)
+        top = z <= 0.3
+        rows.append(pd.DataFrame({
+            "station_id": ids, "region": regions, "date": date,
+            "supply": supply[i], **out,
+            "theta_30": theta[:, top].mean(axis=1),
+            "ice_30": ice_content(theta, T, p)[:, top].mean(axis=1),
+        }))
+    return pd.concat(rows, ignore_index=True)
@@ -0,0 +1,203 @@
+"""Сценарии расчёта из TOML-конфигов с кэшем этапов по хэшу
+
+Годы, окна сезона, регионы и физические параметры (k_snow, kappa,
+DARSI_PARAMS) задаются в конфиге, а не правкой модулей; чего нет в
+конфиге — берётся из heat. Конфиг может наследовать другой (extends).
+
+Расчёт идёт тремя этапами, у каждого свой ключ — sha256 от его
+параметров, ключа предыдущего этапа и (для первого) версии таблицы
+наблюдений в хранилище:
+
+  forcing   суточные ряды станций: Tsurf (k_snow), kappa     ← table, regions, k_snow, kappa_*
+  profiles  тепловая модель по окнам: Z_0C, таяние           ← years, date_range, spinup_from, scheme
+  runoff    Green-Ampt: инфильтрация и сток                 ← darsi_params
+
+Результат этапа лежит таблицей хранилища в SCENARIO_CACHE; если ключ
+не изменился, этап не пересчитывается. Вариант, в котором поменялись
+только DARSI_PARAMS, считает один runoff на готовых профилях.
+
+Запуск из папки python:  python -m flood.scenario scenarios/base.toml [...]
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sys
+import tomllib
+
+import pandas as pd
+
+from . import heat, spinup, store
+
+SCENARIO_CACHE = os.path.join("cache", "scenarios")
+FORCING_COLUMNS = ["station_id", "region", "date", "t_air_mean", "t_soil_mean", "snow_height_cm", "soil_code"]
+SEASON = ("02-01", "05-01")  # окно по умолчанию для года без date_range
+# этап -> параметры конфига, от которых он зависит (по порядку расчёта)
+STAGES = {
+    "forcing": ["table", "regions", "k_snow", "kappa_by_region", "kappa_factor_by_soilcode"],
+    "profiles": ["years", "date_range", "spinup_from", "scheme"],
+    "runoff": ["darsi_params"],
+}
+
+
+# КОНФИГ
+def defaults():
+    """Конфиг из текущих значений heat (как в скриптах heat equation)"""
+    return {
+        "name": "default", "table": "forcing", "regions": list(heat.REGIONS),
+        "years": [2021, 2024], "date_range": {}, "spinup_from": "2020-10-01", "scheme": heat.SCHEME,
+        "k_snow": heat.k_snow,
+        "kappa_by_region": dict(heat.KAPPA_BY_REGION),
+        "kappa_factor_by_soilcode": dict(heat.KAPPA_FACTOR_BY_SOILCODE),
+        "darsi_params": copy.deepcopy(heat.DARSI_PARAMS),
+        "publish": False,
+    }
+
+
+def _merge(base, over):
+    out = dict(base)
+    for k, v in over.items():
+        out[k] = _merge(out[k], v) if isinstance(v, dict) and isinstance(out.get(k), dict) else v
+    return out
+
+
+def _normalise(cfg):
+    """Единые типы: 6 и 6.0 в TOML должны давать один и тот же хэш"""
+    cfg = dict(cfg)
+    cfg["regions"] = [str(r) for r in cfg["regions"]]
+    cfg["years"] = sorted(int(y) for y in cfg["years"])
+    ranges = {int(y): [str(a), str(b)] for y, (a, b) in cfg["date_range"].items()}
+    cfg["date_range"] = {y: ranges.get(y, [f"{y}-{SEASON[0]}", f"{y}-{SEASON[1]}"]) for y in cfg["years"]}
+    if cfg["scheme"] not in heat.SCHEMES:
+        raise ValueError(f"scheme: {cfg['scheme']} (допустимо {heat.SCHEMES})")
+    cfg["k_snow"] = float(cfg["k_snow"])
+    cfg["kappa_by_region"] = {str(r): float(v) for r, v in cfg["kappa_by_region"].items()}
+    cfg["kappa_factor_by_soilcode"] = {int(c): float(v) for c, v in cfg["kappa_factor_by_soilcode"].items()}
+    cfg["darsi_params"] = {str(r): {k: float(v) for k, v in p.items()} for r, p in cfg["darsi_params"].items()}
+    missing = set(cfg["regions"]) - set(cfg["darsi_params"])
+    if missing:
+        raise ValueError(f"darsi_params: нет регионов {sorted(missing)}")
+    return cfg
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        cfg = tomllib.load(f)
+    parent = cfg.pop("extends", None)
+    if parent is None:
+        return cfg
+    return _merge(_read(os.path.join(os.path.dirname(os.path.abspath(path)), parent)), cfg)
+
+
+def load(path):
+    """TOML-конфиг (с цепочкой extends) поверх defaults()"""
+    cfg = _merge(defaults(), {"name": os.path.splitext(os.path.basename(path))[0]})
+    return _normalise(_merge(cfg, _read(path)))
+
+
+def stage_keys(cfg, root=store.STORE_DIR):
+    """Ключ каждого этапа: хэш его параметров, ключа предыдущего этапа и версии данных"""
+    meta = store.read_meta(cfg["table"], root)
+    parent = json.dumps({"version": meta.get("version"), "nrows": meta["nrows"],
+                         "source": meta.get("source")}, sort_keys=True, default=str)
+    keys = {}
+    for stage, params in STAGES.items():
+        blob = json.dumps({"stage": stage, "parent": parent, **{p: cfg[p] for p in params}}, sort_keys=True)
+        parent = keys[stage] = hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+    return keys
+
+
+# ЭТАПЫ
+def forcing_stage(cfg, root=store.STORE_DIR):
+    """Суточные ряды станций с Tsurf и kappa по параметрам сценария"""
+    df = store.read_table(cfg["table"], FORCING_COLUMNS, root)
+    df = df[df["region"].isin(cfg["regions"])]
+    parts = []
+    for station in sorted(df["station_id"].dropna().unique()):
+        dfd = heat.station_days(df, station)
+        if dfd.empty:
+            continue
+        dfd.insert(0, "station_id", station)
+        parts.append(dfd)
+    out = pd.concat(parts, ignore_index=True)
+
+    # то же, что heat.surface_bc и heat.build_kappa, но с k_snow и kappa сценария
+    air = heat.air_surface(out["t_air_mean"], out["snow_height_cm"], cfg["k_snow"])
+    out["Tsurf"] = out["t_soil_mean"].where(out["t_soil_mean"].notna(), pd.Series(air, index=out.index))
+    out["Tsurf"] = out.groupby("station_id")["Tsurf"].transform(lambda s: s.interpolate(limit_direction="both"))
+    base = out["region"].astype(str).map(cfg["kappa_by_region"]).fillna(heat.DEFAULT_KAPPA)
+    code = out["soil_code"].round().astype("Int64")
+    factor = code.map(cfg["kappa_factor_by_soilcode"]).astype(float).fillna(1.0)
+    out["kappa"] = base * factor
+    return out
+
+
+def profiles_stage(forcing, cfg, spin_root):
+    """Окна сезона от раскрученного профиля (spinup.run_window); без инфильтрации"""
+    parts = []
+    for station, dfd in forcing.groupby("station_id", sort=True):
+        dfd = dfd.sort_values("date").reset_index(drop=True)
+        for year in cfg["years"]:
+            date_start, date_end = cfg["date_range"][year]
+            _, res = spinup.run_window(station, dfd, date_start, date_end, start=cfg["spinup_from"],
+                                       root=spin_root, scheme=cfg["scheme"])
+            res = res[["date", "Z_0C", "M_rate", "F_cum"]]
+            res.insert(0, "station_id", station)
+            res.insert(1, "region", dfd["region"].iloc[0])
+            res["year"] = year
+            parts.append(res)
+    return pd.concat(parts, ignore_index=True)
+
+
+def runoff_stage(profiles, cfg):
+    """Green-Ampt по готовым Z_0C и таянию с DARSI_PARAMS сценария"""
+    out = profiles.copy()
+    out["q_infil"] = [heat.green_ampt_infil(m, z, r, f, cfg["darsi_params"])
+                      for m, z, r, f in zip(out["M_rate"], out["Z_0C"], out["region"].astype(str), out["F_cum"])]
+    out["Q_stok"] = out["M_rate"] - out["q_infil"]
+    return out
+
+
+# ЗАПУСК
+def _cached(stage, key, compute, cache, name):
+    """Таблица этапа из кэша или compute() с сохранением. Возвращает (таблица, взята ли из кэша)"""
+    table = f"{stage}-{key}"
+    if store.exists(table, cache):
+        return store.read_table(table, root=cache), True
+    df = compute()
+    store.write_table(table, df, cache, source={"scenario": name, "stage": stage})
+    return df, False
+
+
+def run(cfg, root=store.STORE_DIR, cache=SCENARIO_CACHE):
+    """Сценарий (путь к TOML или готовый конфиг) -> результаты и ключи/повторы этапов"""
+    cfg = load(cfg) if isinstance(cfg, str) else _normalise(_merge(defaults(), cfg))
+    keys = stage_keys(cfg, root)
+    reused = {}
+    f, reused["forcing"] = _cached("forcing", keys["forcing"], lambda: forcing_stage(cfg, root), cache, cfg["name"])
+    # цепочка раскрутки зависит от kappa и Tsurf (ключ forcing) и от схемы — своя на каждую пару
+    spin_root = os.path.join(cache, f"spinup-{keys['forcing']}-{cfg['scheme']}")
+    p, reused["profiles"] = _cached("profiles", keys["profiles"], lambda: profiles_stage(f, cfg, spin_root),
+                                    cache, cfg["name"])
+    results, reused["runoff"] = _cached("runoff", keys["runoff"], lambda: runoff_stage(p, cfg), cache, cfg["name"])
+
+    if cfg["publish"]:
+        from . import api
+        api.publish_results(results, root)
+    return {"name": cfg["name"], "results": results, "keys": keys, "reused": reused}
+
+
+def summary(results):
+    return results.groupby(["region", "year"], observed=True).agg(
+        {"M_rate": ["sum", "max"], "Z_0C": "max", "q_infil": "sum", "Q_stok": "sum"}).round(1)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("python -m flood.scenario конфиг.toml [...]")
+    for path in sys.argv[1:]:
+        out = run(path)
+        stages = ", ".join(f"{s} {'кэш' if out['reused'][s] else 'расчёт'} ({out['keys'][s]})" for s in STAGES)
+        print(f"\n=== {out['name']}: {stages}")
+        print(summary(out["results"]).to_string())
@@ -0,0 +1,105 @@
+"""Состояние снега (мороз / мокрый / растаял) по всем станциям сразу
+
+По температуре поверхности, с гистерезисом: вверх состояние поднимается
+при T >= 0 (мокрый) и T > 1.5 °C (растаял), вниз опускается только при
+T < 1.0 (снова мокрый) и T < -0.5 °C (мороз). Смена принимается, если
+новое состояние держится PERSIST_DAYS дней подряд; датой перехода
+считается первый из них. Пропуски (NaN) состояние не меняют.
+
+Считается над матрицей (сутки x станции): цикл только по суткам, все
+станции — одной операцией.
+"""
+
+import numpy as np
+import pandas as pd
+
+UNKNOWN, FROZEN, WET, MELTED = -1, 0, 1, 2
+LABELS = {
+    FROZEN: "Снег (мороз)",
+    WET: "Мокрый снег",
+    MELTED: "Снег растаял",
+    UNKNOWN: "Неопределено",
+}
+UP = (0.0, 1.5)      # T >= 0 -> мокрый, T > 1.5 -> растаял
+DOWN = (-0.5, 1.0)   # T < 1.0 -> не выше мокрого, T < -0.5 -> мороз
+PERSIST_DAYS = 2
+
+
+def _levels(T):
+    """Куда тянет температура: (уровень при подъёме, уровень при спуске)"""
+    up = (T >= UP[0]).astype(np.int8) + (T > UP[1])
+    down = (T >= DOWN[0]).astype(np.int8) + (T >= DOWN[1])
+    return up, down
+
+
+def classify(T, persist=PERSIST_DAYS):
+    """Коды состояний (сутки x станции) по матрице температуры поверхности T"""
+    T = np.asarray(T, dtype=float)
+    up, down = _levels(T)
+    states = np.full(T.shape, UNKNOWN, dtype=np.int8)
+    s = np.full(T.shape[1], UNKNOWN, dtype=np.int8)
+    pending = s.copy()
+    count = np.zeros(T.shape[1], dtype=np.int32)
+
+    for t in range(len(T)):
+        valid = ~np.isnan(T[t])
+        # первое значение — без гистерезиса и без выдержки
+        first = valid & (s == UNKNOWN)
+        s[first] = up[t, first]
+
+        target = np.where(up[t] > s, up[t], np.where(down[t] < s, down[t], s))
+        change = valid & ~first & (target != s)
+        same = change & (target == pending)
+        count = np.where(same, count + 1, np.where(change, 1, np.where(valid, 0, count)))
+        pending = np.where(change, target, pending)
+
+        switch = change & (count >= persist)
+        s[switch] = pending[switch]
+        count[switch] = 0
+        states[t] = s
+        # выдержка: уже прожитые дни нового состояния тоже получают его код
+        for back in range(1, persist):
+            if t - back >= 0:
+                states[t - back, switch] = s[switch]
+    return states
+
+
+def transitions(states, dates, station_ids):
+    """Даты смены состояния -> таблица station_id, date, from_state, to_state"""
+    states = np.asarray(states)
+    prev = np.vstack([np.full((1, states.shape[1]), UNKNOWN, dtype=states.dtype), states[:-1]])
+    ti, sj = np.nonzero((states != prev) & (prev != UNKNOWN))
+    order = np.lexsort((ti, sj))
+    ti, sj = ti[order], sj[order]
+    labels = np.vectorize(LABELS.get, otypes=[object])
+    return pd.DataFrame({
+        "station_id": np.asarray(station_ids, dtype=object)[sj],
+        "date": pd.DatetimeIndex(dates)[ti],
+        "from_state": labels(prev[ti, sj]),
+        "to_state": labels(states[ti, sj]),
+    })
+
+
+def melting(states):
+    """Маска дней, когда снег может отдавать воду (мокрый или растаял)"""
+    return (states == WET) | (states == MELTED)
+
+
+def classify_frame(df, temp="t_surface_mean", persist=PERSIST_DAYS):
+    """Для длинной таблицы (station_id, date, temp): коды состояний по строкам и таблица переходов"""
+    wide = df.pivot_table(index="date", columns="station_id", values=temp, aggfunc="mean", observed=True)
+    dates = pd.date_range(wide.index.min(), wide.index.max(), freq="D")
+    wide = wide.reindex(dates)
+    states = classify(wide.to_numpy(dtype=float), persist)
+
+    col = {s: j for j, s in enumerate(wide.columns)}
+    j = df["station_id"].map(col).to_numpy()
+    i = dates.get_indexer(pd.DatetimeIndex(df["date"]))
+    ok = ~pd.isna(j) & (i >= 0)
+    codes = np.full(len(df), UNKNOWN, dtype=np.int8)
+    codes[ok] = states[i[ok], j[ok].astype(int)]
+    return codes, transitions(states, dates, wide.columns)
+
+
+def labels(codes):
+    return pd.Series(codes).map(LABELS).to_numpy()
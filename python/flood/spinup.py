@@ -0,0 +1,91 @@
+"""Непрерывный многолетний расчёт с раскруткой (spin-up) от осени и кэшем состояний"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import checkpoints, heat
+
+SPINUP_DIR = os.path.join(checkpoints.CHECKPOINT_DIR, "spinup")
+
+SPINUP_MONTH, SPINUP_DAY = heat.SEASON_START  # раскрутка начинается с сезона, 1 октября
+MAX_GAP_DAYS = 5                   # короткие пропуски интерполируются
+
+# климат поверхности: (среднегодовая T, амплитуда), °C — приблизительно по нормам
+TSURF_CLIMATE = {
+    "KZ-SEV": (2.0, 18.0),
+    "KZ-KUS": (3.5, 17.5),
+    "KZ-AKT": (5.0, 16.5),
+    "KZ-ZAP": (6.0, 16.0),
+    "KZ-ATY": (9.0, 16.0)
+}
+DEFAULT_CLIMATE = (5.0, 17.0)
+COLDEST_DOY = 15  # середина января
+
+
+def spinup_start(date, years=0):
+    """Осень перед date (и ещё years лет назад)"""
+    date = pd.Timestamp(date)
+    year = date.year if (date.month, date.day) >= (SPINUP_MONTH, SPINUP_DAY) else date.year - 1
+    return pd.Timestamp(year - years, SPINUP_MONTH, SPINUP_DAY)
+
+
+def climate_tsurf(region, dates):
+    mean, amp = TSURF_CLIMATE.get(region, DEFAULT_CLIMATE)
+    doy = pd.DatetimeIndex(dates).dayofyear.to_numpy()
+    return mean - amp * np.cos(2 * np.pi * (doy - COLDEST_DOY) / 365.25)
+
+
+def continuous_days(dfd, start, end):
+    """Сплошной суточный ряд [start, end]: пропуски закрываются интерполяцией и климатом"""
+    region = dfd["region"].iloc[0]
+    dates = pd.date_range(start, end, freq="D")
+
+    days = dfd.set_index("date").reindex(dates)
+    days.index.name = "date"
+
+    days["Tsurf"] = days["Tsurf"].interpolate(limit=MAX_GAP_DAYS, limit_area="inside")
+    gap = days["Tsurf"].isna()
+    days.loc[gap, "Tsurf"] = climate_tsurf(region, days.index[gap])
+
+    days["kappa"] = days["kappa"].ffill().bfill()
+    days["kappa"] = days["kappa"].fillna(heat.KAPPA_BY_REGION.get(region, heat.DEFAULT_KAPPA))
+    days["region"] = region
+    return days.reset_index()
+
+
+def state_at(station, date, dfd, start=None, years=0, root=SPINUP_DIR, scheme=heat.SCHEME):
+    """Раскрученное состояние станции на конец дня перед date.
+
+    Берётся ближайшее закэшированное состояние цепочки, начатой в start,
+    и досчитывается до нужной даты; промежуточные состояния сохраняются
+    на конец каждого месяца. Состояние из кэша годится, только если ряд
+    станции до его даты не изменился (checkpoints.data_key); у каждой
+    схемы по времени (heat.SCHEMES) своя цепочка.
+    """
+    date = pd.Timestamp(date)
+    target = date - pd.Timedelta(days=1)
+    start = pd.Timestamp(start) if start is not None else spinup_start(date, years)
+    cache_root = os.path.join(root, f"{start:%Y-%m-%d}-{scheme}")
+
+    state = checkpoints.latest_state(station, before=target, root=cache_root, dfd=dfd)
+    if state is None:
+        mean, _ = TSURF_CLIMATE.get(dfd["region"].iloc[0], DEFAULT_CLIMATE)
+        state = heat.initial_state(mean, start)
+
+    if state["date"] < target:
+        days = continuous_days(dfd, state["date"] + pd.Timedelta(days=1), target)
+        for _, chunk in days.groupby(days["date"].dt.to_period("M")):
+            state, _ = heat.advance(state, chunk, scheme=scheme)
+            state["key"] = checkpoints.data_key(dfd, state["date"])
+            checkpoints.save_state(station, state, cache_root)
+    return state
+
+
+def run_window(station, dfd, date_start, date_end, start=None, years=0, root=SPINUP_DIR, scheme=heat.SCHEME,
+               profiles=None):
+    """Расчёт окна [date_start, date_end] от раскрученного профиля (profiles — см. heat.advance)"""
+    state = state_at(station, date_start, dfd, start=start, years=years, root=root, scheme=scheme)
+    days = continuous_days(dfd, date_start, date_end)
+    return heat.advance(state, days, scheme=scheme, profiles=profiles)
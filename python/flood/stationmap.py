@@ -0,0 +1,100 @@
+"""Карта станций по регионам паводков (из card.py)
+
+Координаты — из реестра станций (stations.load_registry). Строки csv
+координат, которых нет в реестре (название не распознано или повтор
+станции), тоже наносятся, как в исходном card.py, но с предупреждением:
+их стоит добавить в stations.NAME_VARIANTS. folium необязателен и
+импортируется внутри build.
+"""
+
+import warnings
+import webbrowser
+
+import pandas as pd
+
+from . import stations
+
+MAP_FILE = "kaz_flood_2024.html"
+CENTER = (47.5, 67.0)
+ZOOM = 5
+COLORS = {
+    "KZ-ATY": "blue",
+    "KZ-AKT": "green",
+    "KZ-KUS": "purple",
+    "KZ-SEV": "orange",
+    "KZ-ZAP": "pink"
+}
+
+
+def _legend():
+    items = "".join(
+        f'    <i style="background: {color}; width: 12px; height: 12px; float: left; '
+        f'margin-right: 6px; opacity: 0.9"></i>{region}<br>\n'
+        for region, color in COLORS.items())
+    return f"""
+<div style="
+    position: fixed;
+    bottom: 40px; left: 40px;
+    width: 220px;
+    background-color: white;
+    border:2px solid grey;
+    z-index:9999;
+    font-size:14px;
+    padding: 10px;
+">
+<b>Регионы паводков 2024 КЗ</b><br>
+<div style="margin-top:5px">
+{items}</div>
+</div>
+"""
+
+
+def points(coords_path=stations.COORDS_FILE):
+    """Станции для карты: реестр с координатами + строки csv вне реестра (in_registry=False)"""
+    reg = stations.load_registry(coords_path).dropna(subset=["latitude", "longitude"])
+    df = reg[["name", "region", "latitude", "longitude"]].astype({"region": object}).assign(in_registry=True)
+
+    coords = stations.load_coords(coords_path)
+    if coords is not None:
+        extra = coords[coords["station_id"].isna() | coords["station_id"].duplicated()]
+        extra = extra.dropna(subset=["latitude", "longitude"])
+        if len(extra):
+            warnings.warn(f"{len(extra)} строк {coords_path} нет в реестре станций, на карте по csv: "
+                          f"{', '.join(extra['stn'].astype(str))}")
+            extra = extra.rename(columns={"stn": "name"})[["name", "region", "latitude", "longitude"]]
+            df = pd.concat([df, extra.assign(in_registry=False)], ignore_index=True)
+    return df
+
+
+def build(path=MAP_FILE, open_browser=True):
+    """Сохранить карту станций в path (HTML) и, по желанию, открыть её"""
+    import folium
+
+    df = points()
+    m = folium.Map(location=list(CENTER), zoom_start=ZOOM)
+
+    for _, row in df.iterrows():
+        note = "" if row["in_registry"] else "<br><i>нет в реестре станций</i>"
+        popup_text = f"""
+        <b>Станция:</b> {row['name']}<br>
+        <b>Регион:</b> {row['region']}<br>
+        <b>Широта:</b> {row['latitude']}<br>
+        <b>Долгота:</b> {row['longitude']}{note}
+        """
+
+        folium.CircleMarker(
+            location=[row["latitude"], row["longitude"]],
+            radius=6,
+            color=COLORS.get(row["region"], "gray"),
+            fill=True,
+            fill_color=COLORS.get(row["region"], "gray"),
+            fill_opacity=0.85,
+            tooltip=row["name"],
+            popup=popup_text
+        ).add_to(m)
+
+    m.get_root().html.add_child(folium.Element(_legend()))
+    m.save(path)
+    if open_browser:
+        webbrowser.open(path)
+    return path
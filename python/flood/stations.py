@@ -0,0 +1,184 @@
+"""Единый реестр станций: айди, варианты названий, регион, координаты, коды"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# порядок регионов задаёт их целочисленные коды
+REGION_CODES = ["KZ-ATY", "KZ-AKT", "KZ-KUS", "KZ-SEV", "KZ-ZAP"]
+
+STATIONS = [
+    ("KZ-ATY-01", "Атырау", "KZ-ATY"),
+    ("KZ-ATY-02", "Ганюшкино", "KZ-ATY"),
+    ("KZ-ATY-03", "Индерборский", "KZ-ATY"),
+    ("KZ-ATY-04", "Карабау", "KZ-ATY"),
+    ("KZ-ATY-05", "Кульсары", "KZ-ATY"),
+    ("KZ-ATY-06", "Махамбет", "KZ-ATY"),
+    ("KZ-ATY-07", "Новый Уштоган", "KZ-ATY"),
+    ("KZ-ATY-08", "Пешной", "KZ-ATY"),
+    ("KZ-ATY-09", "Сагиз", "KZ-ATY"),
+    ("KZ-ATY-10", "Тайпак", "KZ-ATY"),
+
+    ("KZ-AKT-01", "Актобе", "KZ-AKT"),
+    ("KZ-AKT-02", "Аяккум", "KZ-AKT"),
+    ("KZ-AKT-03", "Ильинский", "KZ-AKT"),
+    ("KZ-AKT-04", "Иргиз", "KZ-AKT"),
+    ("KZ-AKT-05", "Карабутак", "KZ-AKT"),
+    ("KZ-AKT-06", "Караулкельды", "KZ-AKT"),
+    ("KZ-AKT-07", "Комсомольское", "KZ-AKT"),
+    ("KZ-AKT-08", "Кос-Истек", "KZ-AKT"),
+    ("KZ-AKT-09", "Мартук", "KZ-AKT"),
+    ("KZ-AKT-10", "Мугоджарская", "KZ-AKT"),
+    ("KZ-AKT-11", "Новоалексеевка", "KZ-AKT"),
+    ("KZ-AKT-12", "Нура", "KZ-AKT"),
+    ("KZ-AKT-13", "Родниковка", "KZ-AKT"),
+    ("KZ-AKT-14", "Темир", "KZ-AKT"),
+    ("KZ-AKT-15", "Уил", "KZ-AKT"),
+    ("KZ-AKT-16", "Шалкар", "KZ-AKT"),
+    ("KZ-AKT-17", "Эмба", "KZ-AKT"),
+
+    ("KZ-KUS-01", "Амангельды", "KZ-KUS"),
+    ("KZ-KUS-02", "Аркалык", "KZ-KUS"),
+    ("KZ-KUS-03", "Аршалинский З/СВХ", "KZ-KUS"),
+    ("KZ-KUS-04", "Диевская", "KZ-KUS"),
+    ("KZ-KUS-05", "Екидин", "KZ-KUS"),
+    ("KZ-KUS-06", "Железнодорожный СВХ.", "KZ-KUS"),
+    ("KZ-KUS-07", "Житикара", "KZ-KUS"),
+    ("KZ-KUS-08", "Карабалык", "KZ-KUS"),
+    ("KZ-KUS-09", "Караменды", "KZ-KUS"),
+    ("KZ-KUS-10", "Карасу", "KZ-KUS"),
+    ("KZ-KUS-11", "Костанай", "KZ-KUS"),
+    ("KZ-KUS-12", "Кушмурун", "KZ-KUS"),
+    ("KZ-KUS-13", "Михайловка", "KZ-KUS"),
+    ("KZ-KUS-14", "Пресногорьковка", "KZ-KUS"),
+    ("KZ-KUS-15", "Рудный", "KZ-KUS"),
+    ("KZ-KUS-16", "Сарыколь", "KZ-KUS"),
+    ("KZ-KUS-17", "Тобол", "KZ-KUS"),
+    ("KZ-KUS-18", "Торгай", "KZ-KUS"),
+
+    ("KZ-SEV-01", "Благовещенка", "KZ-SEV"),
+    ("KZ-SEV-02", "Возвышенка", "KZ-SEV"),
+    ("KZ-SEV-03", "Дмитриевка", "KZ-SEV"),
+    ("KZ-SEV-04", "Кишкенеколь", "KZ-SEV"),
+    ("KZ-SEV-05", "Петропавловск", "KZ-SEV"),
+    ("KZ-SEV-06", "Рузаевка", "KZ-SEV"),
+    ("KZ-SEV-07", "Саумалколь", "KZ-SEV"),
+    ("KZ-SEV-08", "Сергеевка", "KZ-SEV"),
+    ("KZ-SEV-09", "Тайынша", "KZ-SEV"),
+    ("KZ-SEV-10", "Тимирязево", "KZ-SEV"),
+    ("KZ-SEV-11", "Чкалово", "KZ-SEV"),
+    ("KZ-SEV-12", "Явленка", "KZ-SEV"),
+
+    ("KZ-ZAP-01", "Аксай", "KZ-ZAP"),
+    ("KZ-ZAP-02", "Джамбейты", "KZ-ZAP"),
+    ("KZ-ZAP-03", "Джангала", "KZ-ZAP"),
+    ("KZ-ZAP-04", "Джаныбек", "KZ-ZAP"),
+    ("KZ-ZAP-05", "Жалпактал", "KZ-ZAP"),
+    ("KZ-ZAP-06", "Каменка", "KZ-ZAP"),
+    ("KZ-ZAP-07", "Каратюба", "KZ-ZAP"),
+    ("KZ-ZAP-08", "Уральск", "KZ-ZAP"),
+    ("KZ-ZAP-09", "Урда", "KZ-ZAP"),
+    ("KZ-ZAP-10", "Чапаево", "KZ-ZAP"),
+    ("KZ-ZAP-11", "Чингирлау", "KZ-ZAP"),
+    ("KZ-ZAP-12", "Январцево", "KZ-ZAP")
+]
+
+# другие написания (имена исходных файлов, сокращения)
+NAME_VARIANTS = {
+    "KZ-AKT-08": ["косистек"],
+    "KZ-AKT-10": ["муголджарская"],
+    "KZ-KUS-03": ["аршалинский"],
+    "KZ-KUS-06": ["железнодорожный"],
+    "KZ-SEV-01": ["благов"],
+    "KZ-SEV-02": ["возв", "возвышенко"],
+}
+
+# координаты с https://flymeteo.org/synop/station_index.php (см. card.py)
+COORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "stations_flood_regions.csv")
+
+REGION_DTYPE = pd.CategoricalDtype(REGION_CODES)
+STATION_DTYPE = pd.CategoricalDtype([s[0] for s in STATIONS])
+
+# регион каждой станции в виде кода
+STATION_REGION = np.array([REGION_CODES.index(s[2]) for s in STATIONS], dtype=np.int8)
+
+
+def normalize_name(name):
+    """Ключ для сравнения названий: нижний регистр, только буквы"""
+    name = str(name).lower().replace("ё", "е")
+    return re.sub(r"[^a-zа-я]", "", name)
+
+
+def _name_index():
+    index = {}
+    for stn_id, name, _ in STATIONS:
+        index[normalize_name(name)] = stn_id
+        for variant in NAME_VARIANTS.get(stn_id, []):
+            index[normalize_name(variant)] = stn_id
+    return index
+
+
+NAME_INDEX = _name_index()
+
+
+def load_coords(coords_path=COORDS_FILE):
+    """Строки csv координат как есть + station_id по названию (NaN — нет в реестре); None, если файла нет"""
+    if not coords_path or not os.path.exists(coords_path):
+        return None
+    coords = pd.read_csv(coords_path, encoding="utf-8")
+    coords["station_id"] = lookup(coords["stn"])[0].astype(object)
+    return coords
+
+
+def load_registry(coords_path=COORDS_FILE):
+    """Таблица станций; координаты/высота/шифр почвы из csv, если он есть"""
+    reg = pd.DataFrame(STATIONS, columns=["station_id", "name", "region"])
+    reg["variants"] = [NAME_VARIANTS.get(s, []) for s in reg["station_id"]]
+    for c in ["wmo", "latitude", "longitude", "elevation", "soil_code"]:
+        reg[c] = np.nan
+
+    coords = load_coords(coords_path)
+    if coords is not None:
+        coords = coords.dropna(subset=["station_id"]).drop_duplicates("station_id")
+        coords = coords.set_index("station_id")
+        for c in ["wmo", "latitude", "longitude", "elevation", "soil_code"]:
+            if c in coords.columns:
+                reg[c] = reg["station_id"].map(coords[c])
+
+    return encode(reg)
+
+
+def _to_codes(values, dtype, key=str.strip):
+    """Значения -> Categorical реестра; ключ считается один раз на уникальное значение"""
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+    cats = {c: i for i, c in enumerate(dtype.categories)}
+    uniq_codes = np.array([cats.get(key(str(u)), -1) for u in uniques] + [-1], dtype=np.int16)
+    return pd.Categorical.from_codes(uniq_codes[codes], dtype=dtype)
+
+
+def encode(df, region_col="region", station_col="station_id"):
+    """region/station_id -> категориальные с кодами реестра (in place)"""
+    if region_col in df.columns:
+        df[region_col] = _to_codes(df[region_col].to_numpy(), REGION_DTYPE)
+    if station_col in df.columns:
+        df[station_col] = _to_codes(df[station_col].to_numpy(), STATION_DTYPE)
+    return df
+
+
+def region_codes(df, col="region"):
+    return df[col].cat.codes.to_numpy()
+
+
+def station_codes(df, col="station_id"):
+    return df[col].cat.codes.to_numpy()
+
+
+def lookup(names):
+    """Названия станций -> (station_id, region) категориальные; неизвестные = NaN"""
+    stn = _to_codes(np.asarray(names, dtype=object), STATION_DTYPE,
+                    key=lambda n: NAME_INDEX.get(normalize_name(n), ""))
+    codes = np.asarray(stn.codes)
+    region = np.where(codes >= 0, STATION_REGION[codes], -1)
+    return stn, pd.Categorical.from_codes(region, dtype=REGION_DTYPE)
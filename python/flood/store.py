@@ -0,0 +1,222 @@
+"""Колоночное хранилище: таблица = папка, колонка = .npy (читается через memmap)"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import stations
+
+STORE_DIR = "store"
+
+# русские заголовки листов -> нормализованные имена
+SHEET_COLUMNS = {
+    "Регион": "region", "Станция_айди": "station_id", "Станция": "station_name",
+    "Дата": "date", "Сред": "t_mean", "Макс": "t_max", "Мин": "t_min",
+    "Средтемпвоздуха": "t_air_mean", "Макстемпвоздуха": "t_air_max", "Минтемпвоздуха": "t_air_min",
+    "Средтемппочвы": "t_soil_mean", "Макстемппочвы": "t_soil_max", "Минтемппочвы": "t_soil_min",
+    "Степеньпокрытияпокрова": "snow_cover", "Высотапокровасм": "snow_height_cm",
+    "Шифрпочвы": "soil_code", "Суммаосадки": "precip",
+    "Ст.покр.": "snow_cover", "Высота,см": "snow_height_cm", "Шифр": "soil_code", "Сумма": "precip"
+}
+TEXT_COLUMNS = ["region", "station_id", "station_name", "date"]
+SHEET_ROW = "sheet_row"  # номер строки листа Excel, из которой пришла строка таблицы
+# общий лист (воздух и почва вместе) -> таблица air_temp со схемой t_mean/t_max/t_min
+AIR_FROM_COMBINED = {"t_air_mean": "t_mean", "t_air_max": "t_max", "t_air_min": "t_min"}
+
+
+def _table_dir(table, root):
+    return os.path.join(root, table)
+
+
+def _meta_path(table, root):
+    return os.path.join(_table_dir(table, root), "meta.json")
+
+
+def read_meta(table, root=STORE_DIR):
+    with open(_meta_path(table, root), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_meta(table, meta, root):
+    tmp = _meta_path(table, root) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, _meta_path(table, root))
+
+
+def exists(table, root=STORE_DIR):
+    return os.path.exists(_meta_path(table, root))
+
+
+def _encode_column(values):
+    """Колонка -> (массив, описание типа)"""
+    s = pd.Series(values)
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes = np.asarray(s.cat.codes, dtype=np.int16)
+        return codes, {"kind": "cat", "categories": [str(c) for c in s.cat.categories]}
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.to_numpy(dtype="datetime64[ns]"), {"kind": "date"}
+    if pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+        return s.to_numpy(), {"kind": "num"}
+    # строки: словарное кодирование
+    codes, uniques = pd.factorize(s)
+    return codes.astype(np.int32), {"kind": "cat", "categories": [str(u) for u in uniques]}
+
+
+def write_columns(table, columns, root=STORE_DIR):
+    """Записать/заменить только переданные колонки (dict имя -> значения)"""
+    meta = read_meta(table, root) if exists(table, root) else {"nrows": None, "columns": {}}
+    path = _table_dir(table, root)
+    os.makedirs(path, exist_ok=True)
+
+    for name, values in columns.items():
+        arr, info = _encode_column(values)
+        if meta["nrows"] is None:
+            meta["nrows"] = len(arr)
+        if len(arr) != meta["nrows"]:
+            raise ValueError(f"{table}.{name}: {len(arr)} строк вместо {meta['nrows']}")
+        np.save(os.path.join(path, f"{name}.npy"), arr)
+        meta["columns"][name] = info
+
+    meta["version"] = meta.get("version", 0) + 1
+    _write_meta(table, meta, root)
+
+
+def write_table(table, df, root=STORE_DIR, source=None):
+    """Перезаписать таблицу целиком"""
+    path = _table_dir(table, root)
+    version = 0
+    if exists(table, root):
+        old = read_meta(table, root)
+        version = old.get("version", 0)
+        for name in old["columns"]:
+            os.remove(os.path.join(path, f"{name}.npy"))
+        os.remove(_meta_path(table, root))
+    write_columns(table, {c: df[c] for c in df.columns}, root)
+
+    # версия растёт и при полной перезаписи: по ней проверяются кэши
+    meta = read_meta(table, root)
+    meta["version"] = version + 1
+    if source is not None:
+        meta["source"] = source
+    _write_meta(table, meta, root)
+
+
+def read_arrays(table, columns=None, root=STORE_DIR, mmap=True):
+    """Сырые массивы колонок (коды для категориальных) без копирования"""
+    meta = read_meta(table, root)
+    columns = columns or list(meta["columns"])
+    mode = "r" if mmap else None
+    return {c: np.load(os.path.join(_table_dir(table, root), f"{c}.npy"), mmap_mode=mode) for c in columns}
+
+
+def read_table(table, columns=None, root=STORE_DIR):
+    """Таблица в виде DataFrame; категориальные колонки восстанавливаются"""
+    meta = read_meta(table, root)
+    columns = columns or list(meta["columns"])
+    arrays = read_arrays(table, columns, root)
+    out = {}
+    for c in columns:
+        info = meta["columns"][c]
+        if info["kind"] == "cat":
+            dtype = pd.CategoricalDtype(info["categories"])
+            out[c] = pd.Categorical.from_codes(np.asarray(arrays[c]), dtype=dtype)
+        else:
+            out[c] = np.asarray(arrays[c])
+    return pd.DataFrame(out)
+
+
+def changed_rows(table, columns, root=STORE_DIR):
+    """Номера строк, где новые значения отличаются от сохранённых"""
+    meta = read_meta(table, root)
+    changed = np.zeros(meta["nrows"], dtype=bool)
+    for name, values in columns.items():
+        new = pd.Series(values).astype(object)
+        if name not in meta["columns"]:
+            changed |= True
+            continue
+        old = read_table(table, [name], root)[name].astype(object)
+        changed |= ~((old == new) | (old.isna() & new.isna())).to_numpy()
+    return np.flatnonzero(changed)
+
+
+# ИМПОРТ ИЗ EXCEL
+def _parse_dates(s):
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.dt.floor("D")
+    parsed = pd.to_datetime(s, format="%d.%m.%Y", errors="coerce")
+    rest = parsed.isna() & s.notna()
+    parsed[rest] = pd.to_datetime(s[rest], errors="coerce")
+    return parsed
+
+
+def normalize_sheet(df):
+    """Лист Excel -> нормализованные колонки и типы (строки листа сохраняются 1:1)"""
+    df = df.rename(columns=SHEET_COLUMNS)
+    if "date" in df.columns:
+        df["date"] = _parse_dates(df["date"])
+    for c in df.columns:
+        if c not in TEXT_COLUMNS:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+    return stations.encode(df).reset_index(drop=True)
+
+
+def import_sheet(path, sheet, table, root=STORE_DIR, force=False, columns=None):
+    """Загрузить лист в хранилище, если его там нет или файл изменился.
+
+    columns: {нормализованное имя: имя в таблице} — взять только эти
+    колонки (и TEXT_COLUMNS) под другими именами; None — все как есть.
+    """
+    mtime = os.path.getmtime(path)
+    source = {"path": os.path.abspath(path), "sheet": sheet, "mtime": mtime, "columns": columns}
+    if exists(table, root) and not force:
+        src = read_meta(table, root).get("source", {})
+        if all(src.get(k) == v for k, v in source.items()):
+            return False
+    raw = pd.read_excel(path, sheet_name=sheet, header=0)
+    df = normalize_sheet(raw)
+    df[SHEET_ROW] = raw.index.to_numpy() + 2  # строка 1 — заголовок
+    if columns is not None:
+        df = df[[c for c in TEXT_COLUMNS if c in df.columns] + list(columns) + [SHEET_ROW]].rename(columns=columns)
+    write_table(table, df, root, source=source)
+    return True
+
+
+def export_to_excel(table, path, sheet, columns, rows=None, root=STORE_DIR):
+    """Вернуть в лист Excel только заданные колонки и строки.
+
+    columns: заголовок в Excel -> колонка хранилища; rows: номера строк
+    таблицы (по умолчанию все). Строка листа берётся из SHEET_ROW, а не
+    из номера строки таблицы. Остальные ячейки, листы и формат не трогаются.
+    """
+    from openpyxl import load_workbook
+
+    if SHEET_ROW not in read_meta(table, root)["columns"]:
+        raise ValueError(f"{table}: нет колонки {SHEET_ROW} — перезагрузите лист (import_sheet, force=True)")
+    table_df = read_table(table, list(columns.values()) + [SHEET_ROW], root)
+    rows = np.arange(len(table_df)) if rows is None else np.asarray(rows)
+    sheet_rows = table_df[SHEET_ROW].to_numpy()
+
+    wb = load_workbook(path)
+    ws = wb[sheet] if isinstance(sheet, str) else wb.worksheets[sheet]
+    header = {cell.value: cell.column for cell in ws[1]}
+
+    for name, col_name in columns.items():
+        col = header.get(name)
+        if col is None:
+            col = ws.max_column + 1
+            ws.cell(row=1, column=col, value=name)
+        values = table_df[col_name].astype(object).to_numpy()
+        for i in rows:
+            v = values[i]
+            ws.cell(row=int(sheet_rows[i]), column=col, value=None if pd.isna(v) else v)
+
+    wb.save(path)
+
+    # файл изменён нами: хранилище остаётся актуальным
+    meta = read_meta(table, root)
+    if "source" in meta:
+        meta["source"]["mtime"] = os.path.getmtime(path)
+        _write_meta(table, meta, root)
@@ -0,0 +1,172 @@
+"""Пакетный декодер сводок SYNOP (FM-12) в колоночную таблицу
+
+Сообщения разбираются не по одному: весь пакет проходит через один
+заранее скомпилированный шаблон, значения переводятся в числа над
+массивами строк целиком.
+
+Что извлекается:
+  раздел 1:  1snTTT (t_air), 2snTdTdTd (t_dew)
+  раздел 3:  1snTxTxTx (t_max), 2snTnTnTn (t_min), 3EsnTgTg (состояние
+             почвы без снега, мин. T поверхности), 4E'sss (состояние
+             снега, высота покрова)
+
+Сроки из кэша загрузчика (flood.synop_fetch) лежат таблицей хранилища
+SYNOP_TABLE как есть; суточные Сред/Макс/Мин выводятся из неё по
+запросу через resample.daily_cached (daily_table).
+"""
+
+import glob
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from . import resample, stations, store
+
+CACHE_DIR = os.path.join("cache", "synop")  # сырые ответы загрузчика
+SYNOP_TABLE = "synop"
+
+# одна строка ogimet целиком: IIiii,ГГГГ,ММ,ДД,ЧЧ,мм,AAXX ...=
+# разделы 1 и 3 идут в порядке индикаторов, поэтому нужные группы
+# ловятся опциональными позициями; всё остальное пропускается
+REPORT = re.compile(
+    r"^(\d{5}),(\d{4}),(\d\d),(\d\d),(\d\d),(\d\d),"
+    r"AAXX \d{4}[0-4/] \d{5} \S{5} \S{5}(?: 00\d{3})?"
+    r"(?: 1([01/])([\d/]{3}))?"                  # 1snTTT
+    r"(?: 2([019/])([\d/]{3}))?"                 # 2snTdTdTd (29UUU — влажность)
+    r"(?: [3-9][\d/]{4})*"
+    r"(?: 222\S*(?: (?!333)\S{5})*)?"
+    r"(?: 333"
+    r"(?: 0[\d/]{4})?"
+    r"(?: 1([01/])([\d/]{3}))?"                  # 1snTxTxTx
+    r"(?: 2([01/])([\d/]{3}))?"                  # 2snTnTnTn
+    r"(?: 3([\d/])([01/])([\d/]{2}))?"          # 3EsnTgTg
+    r"(?: 4([\d/])([\d/]{3}))?"                 # 4E'sss
+    r")?"
+    r"[^\n]*$",
+    re.MULTILINE,
+)
+FIELDS = ["wmo", "Y", "M", "D", "h", "m",
+          "t_sn", "t", "td_sn", "td", "tx_sn", "tx", "tn_sn", "tn",
+          "E", "tg_sn", "tg", "Es", "sss"]
+
+COLUMNS = ["wmo", "time", "t_air", "t_dew", "t_max", "t_min",
+           "ground_state", "t_ground_min", "snow_state", "snow_height_cm"]
+
+
+def _number(col):
+    """Колонка строк -> float32; пусто или '/' -> NaN"""
+    bad = (col == "") | (np.char.find(col, "/") >= 0)
+    return np.where(bad, "nan", col).astype(np.float32)
+
+
+def _signed(sn, col, scale):
+    v = _number(col) * scale
+    v[sn == "1"] *= -1
+    return v
+
+
+def decode(lines):
+    """Строки ogimet -> DataFrame с колонками COLUMNS (одна строка на сводку).
+
+    Весь пакет склеивается в один текст и разбирается одним проходом
+    REPORT.findall; дальше только операции над массивами строк.
+    """
+    text = "\n".join(line.strip() for line in lines)
+    rows = REPORT.findall(text.replace("=", ""))
+    if not rows:
+        return pd.DataFrame(columns=COLUMNS)
+    a = dict(zip(FIELDS, np.array(rows, dtype=str).T))
+
+    iso = a["Y"]
+    for sep, part in [("-", "M"), ("-", "D"), ("T", "h"), (":", "m")]:
+        iso = np.char.add(np.char.add(iso, sep), a[part])
+    time = iso.astype("datetime64[m]")
+
+    td = _signed(a["td_sn"], a["td"], 0.1)
+    td[a["td_sn"] == "9"] = np.nan
+
+    snow = _number(a["sss"])
+    snow[(snow == 997) | (snow == 998)] = 0.0
+    snow[snow >= 999] = np.nan
+
+    out = pd.DataFrame({
+        "wmo": a["wmo"].astype(np.int32),
+        "time": time.astype("datetime64[ns]"),
+        "t_air": _signed(a["t_sn"], a["t"], 0.1),
+        "t_dew": td,
+        "t_max": _signed(a["tx_sn"], a["tx"], 0.1),
+        "t_min": _signed(a["tn_sn"], a["tn"], 0.1),
+        "ground_state": _number(a["E"]),
+        "t_ground_min": _signed(a["tg_sn"], a["tg"], 1.0),
+        "snow_state": _number(a["Es"]),
+        "snow_height_cm": snow,
+    })
+    return out.sort_values(["wmo", "time"], kind="stable").reset_index(drop=True)
+
+
+def read_cache(cache_dir):
+    """Все сырые ответы из кэша загрузчика -> список строк"""
+    lines = []
+    for fname in sorted(glob.glob(os.path.join(cache_dir, "*", "*.txt"))):
+        with open(fname, encoding="utf-8") as f:
+            lines.extend(f.read().splitlines())
+    return lines
+
+
+def attach_stations(obs, registry=None):
+    """Добавить station_id/region по индексу ВМО из реестра"""
+    registry = stations.load_registry() if registry is None else registry
+    reg = registry.dropna(subset=["wmo"])
+    by_wmo = pd.Series(reg["station_id"].astype(object).to_numpy(), index=reg["wmo"].astype(int))
+    obs["station_id"] = obs["wmo"].map(by_wmo)
+    obs["region"] = obs["station_id"].str[:6]
+    return stations.encode(obs)
+
+
+def _script_daily(day):
+    """day(колонка) -> суточные mean/max/min; собрать колонки скриптов"""
+    daily = resample.to_script_columns(day("t_air"), "t_air").drop(columns="n")
+
+    # экстремумы из групп Tx/Tn, если они есть, иначе по срокам
+    tx, tn = day("t_max")["max"].to_numpy(), day("t_min")["min"].to_numpy()
+    daily["t_air_max"] = np.where(np.isnan(tx), daily["t_air_max"], tx)
+    daily["t_air_min"] = np.where(np.isnan(tn), daily["t_air_min"], tn)
+
+    daily["snow_height_cm"] = day("snow_height_cm")["max"].to_numpy()
+    daily["soil_code"] = day("ground_state")["max"].to_numpy()
+    return daily
+
+
+def to_daily(obs):
+    """Срочные наблюдения -> суточная таблица с именами колонок скриптов"""
+    obs = obs.sort_values(["wmo", "time"], kind="stable")
+    wmo, time = obs["wmo"].to_numpy(), obs["time"].to_numpy()
+    daily = _script_daily(lambda col: resample.daily(wmo, time, obs[col].to_numpy()))
+    return daily.rename(columns={"station_code": "wmo"})
+
+
+# ХРАНИЛИЩЕ
+def store_terms(cache_dir=CACHE_DIR, table=SYNOP_TABLE, root=store.STORE_DIR, force=False, registry=None):
+    """Все сроки из кэша загрузчика -> таблица хранилища, если кэш изменился"""
+    files = glob.glob(os.path.join(cache_dir, "*", "*.txt"))
+    if not files:
+        return False
+    source = {"cache_dir": os.path.abspath(cache_dir), "files": len(files),
+              "mtime": max(os.path.getmtime(f) for f in files)}
+    if store.exists(table, root) and not force and store.read_meta(table, root).get("source") == source:
+        return False
+    obs = attach_stations(decode(read_cache(cache_dir)), registry)
+    obs = obs.sort_values(["station_id", "time"], kind="stable").reset_index(drop=True)
+    store.write_table(table, obs, root, source=source)
+    return True
+
+
+def daily_table(table=SYNOP_TABLE, root=store.STORE_DIR):
+    """Суточная таблица станций реестра из сроков в хранилище (кэш resample.daily_cached)"""
+    daily = _script_daily(lambda col: resample.daily_cached(table, col, root))
+    codes = daily.pop("station_code").to_numpy()
+    daily.insert(0, "station_id", pd.Categorical.from_codes(codes, dtype=stations.STATION_DTYPE))
+    daily.insert(0, "region", pd.Categorical.from_codes(stations.STATION_REGION[codes], dtype=stations.REGION_DTYPE))
+    return daily
@@ -0,0 +1,141 @@
+"""Асинхронная загрузка суточных сводок SYNOP по станциям реестра
+
+Источник по умолчанию — ogimet (формат ответа: строки
+"IIiii,ГГГГ,ММ,ДД,ЧЧ,мм,AAXX ...="). Для работы без сети поднимается
+локальная заглушка flood.synop_mock. После загрузки сроки из кэша
+переносятся в таблицу хранилища (synop.store_terms).
+
+Запуск из папки python:
+    python -m flood.synop_fetch 2024-02-01 2024-04-30 [base_url]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import aiohttp
+import pandas as pd
+
+from . import stations, store, synop
+
+BASE_URL = "https://www.ogimet.com/cgi-bin/getsynop"
+CACHE_DIR = synop.CACHE_DIR
+
+CONCURRENCY = 8        # одновременных соединений
+RATE = 4.0             # запросов в секунду
+RETRIES = 4
+BACKOFF = 1.0          # с, удваивается на каждой попытке
+TIMEOUT = 30
+RETRY_STATUS = (429, 500, 502, 503, 504)
+FRESH_DAYS = 2         # сегодня и вчера (UTC) ещё дополняются — в кэш не кладутся
+
+
+def cache_path(wmo, day, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, str(wmo), f"{day:%Y-%m-%d}.txt")
+
+
+def is_complete(day, today=None):
+    """Сутки закрыты: сводки за них уже не будут дополняться (today — дата UTC)"""
+    today = pd.Timestamp.now(tz="UTC").tz_localize(None) if today is None else pd.Timestamp(today)
+    return pd.Timestamp(day) <= today.normalize() - pd.Timedelta(days=FRESH_DAYS)
+
+
+class RateLimiter:
+    """Не чаще rate запусков запросов в секунду (общий на все задачи)"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_time = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def fetch_day(session, limiter, base_url, wmo, day, cache_dir=CACHE_DIR,
+                    retries=RETRIES, backoff=BACKOFF):
+    """Сводки одной станции за сутки; сырой ответ закрытых суток кладётся в кэш на диске"""
+    fname = cache_path(wmo, day, cache_dir)
+    if os.path.exists(fname):
+        with open(fname, encoding="utf-8") as f:
+            return f.read()
+
+    params = {
+        "block": str(wmo),
+        "begin": f"{day:%Y%m%d}0000",
+        "end": f"{day:%Y%m%d}2359",
+    }
+    text, error = None, None
+    for attempt in range(retries + 1):
+        await limiter.wait()
+        try:
+            async with session.get(base_url, params=params) as resp:
+                if resp.status == 200:
+                    text = await resp.text()
+                    break
+                if resp.status not in RETRY_STATUS:
+                    raise RuntimeError(f"{wmo} {day:%Y-%m-%d}: HTTP {resp.status}")
+                error = f"HTTP {resp.status}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = repr(e)
+        if attempt < retries:
+            await asyncio.sleep(backoff * 2 ** attempt)
+
+    if text is None:
+        raise RuntimeError(f"{wmo} {day:%Y-%m-%d}: {error} после {retries} повторов")
+    if not is_complete(day):
+        return text
+
+    os.makedirs(os.path.dirname(fname), exist_ok=True)
+    tmp = fname + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, fname)
+    return text
+
+
+async def fetch_all(wmo_ids, start, end, base_url=BASE_URL, cache_dir=CACHE_DIR,
+                    concurrency=CONCURRENCY, rate=RATE, retries=RETRIES, backoff=BACKOFF):
+    """Все станции x все дни одной пулированной сессией.
+
+    Возвращает {(wmo, день): текст}; ошибки отдельных запросов попадают
+    в словарь как исключения, чтобы не терять остальные ответы.
+    """
+    days = pd.date_range(start, end, freq="D")
+    limiter = RateLimiter(rate)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        keys = [(int(w), d) for w in wmo_ids for d in days]
+        tasks = [fetch_day(session, limiter, base_url, w, d, cache_dir, retries, backoff) for w, d in keys]
+        texts = await asyncio.gather(*tasks, return_exceptions=True)
+    return dict(zip(keys, texts))
+
+
+def registry_wmo_ids():
+    reg = stations.load_registry()
+    return reg["wmo"].dropna().astype(int).tolist()
+
+
+def run(start, end, wmo_ids=None, **kwargs):
+    wmo_ids = registry_wmo_ids() if wmo_ids is None else wmo_ids
+    return asyncio.run(fetch_all(wmo_ids, start, end, **kwargs))
+
+
+if __name__ == "__main__":
+    start, end = sys.argv[1], sys.argv[2]
+    base_url = sys.argv[3] if len(sys.argv) > 3 else BASE_URL
+    result = run(start, end, base_url=base_url)
+    errors = {k: v for k, v in result.items() if isinstance(v, Exception)}
+    print(f"Загружено: {len(result) - len(errors)}, ошибок: {len(errors)}")
+    for (wmo, day), err in list(errors.items())[:10]:
+        print(f"  {wmo} {day:%Y-%m-%d}: {err}")
+    if synop.store_terms(CACHE_DIR):
+        print(f"{synop.SYNOP_TABLE}: сроков {store.read_meta(synop.SYNOP_TABLE)['nrows']}")
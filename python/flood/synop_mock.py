@@ -0,0 +1,85 @@
+"""Локальная заглушка источника SYNOP (тот же формат ответа, что у ogimet)
+
+Отдаёт детерминированные синтетические сводки за 00..21 UTC каждые 3 ч,
+умеет имитировать сбои (каждый N-й запрос -> 503 или другой код). Нужна, чтобы
+загрузчик flood.synop_fetch проверялся без сети.
+
+Запуск из папки python:  python -m flood.synop_mock [порт]
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+from aiohttp import web
+
+HOST, PORT = "127.0.0.1", 8060
+PATH = "/cgi-bin/getsynop"
+COUNTER = web.AppKey("counter", dict)  # число принятых запросов (для проверок)
+
+
+def _temp_group(prefix, t):
+    sn = 1 if t < 0 else 0
+    return f"{prefix}{sn}{int(round(abs(t) * 10)):03d}"
+
+
+def synthetic_report(wmo, ts):
+    """Одна сводка FM-12: температура, точка росы, давление, состояние почвы, снег"""
+    doy = ts.dayofyear + ts.hour / 24
+    rng = np.random.default_rng(int(wmo) * 100000 + ts.year * 400 + int(doy * 8))
+    t = -12 * np.cos(2 * np.pi * (doy - 15) / 365.25) + 4 - 4 * np.cos(2 * np.pi * (ts.hour - 3) / 24)
+    t += rng.normal(0, 1.5)
+    td = t - abs(rng.normal(3, 1))
+    snow = max(0, int(40 * np.cos(2 * np.pi * (doy - 40) / 365.25) + rng.normal(0, 2)))
+
+    groups = [
+        "AAXX", f"{ts.day:02d}{ts.hour:02d}1", f"{int(wmo):05d}", "41/96", "/0000",
+        _temp_group("1", t), _temp_group("2", td), "39950", "40150",
+    ]
+    if ts.hour in (0, 6, 12, 18):
+        tg = int(round(t - 2))
+        ground = 1 if tg < 0 else 0
+        groups += ["333", f"3{ground}{1 if tg < 0 else 0}{abs(tg):02d}"]
+        if snow > 0:
+            groups.append(f"4{7 if snow < 30 else 8}{snow:03d}")
+    return " ".join(groups) + "="
+
+
+def make_app(fail_every=0, fail_status=503):
+    counter = {"n": 0}
+
+    async def getsynop(request):
+        counter["n"] += 1
+        if fail_every and counter["n"] % fail_every == 0:
+            return web.Response(status=fail_status, text="busy")
+
+        q = request.query
+        try:
+            wmo = int(q["block"])
+            begin = pd.to_datetime(q["begin"], format="%Y%m%d%H%M")
+            end = pd.to_datetime(q["end"], format="%Y%m%d%H%M")
+        except (KeyError, ValueError):
+            return web.Response(status=400, text="bad request")
+
+        lines = []
+        for ts in pd.date_range(begin.ceil("3h"), end, freq="3h"):
+            lines.append(f"{wmo:05d},{ts:%Y,%m,%d,%H,%M},{synthetic_report(wmo, ts)}")
+        return web.Response(text="\n".join(lines) + "\n")
+
+    app = web.Application()
+    app[COUNTER] = counter
+    app.router.add_get(PATH, getsynop)
+    return app
+
+
+async def start(host=HOST, port=PORT, fail_every=0, fail_status=503):
+    """Поднять заглушку в текущем цикле событий; вернуть (runner, base_url)"""
+    runner = web.AppRunner(make_app(fail_every, fail_status))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner, f"http://{host}:{port}{PATH}"
+
+
+if __name__ == "__main__":
+    web.run_app(make_app(), host=HOST, port=int(sys.argv[1]) if len(sys.argv) > 1 else PORT)
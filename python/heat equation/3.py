@@ -0,0 +1,56 @@
+# ежедневный запуск: модель продвигается от последней контрольной точки станции
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flood import api, checkpoints, heat
+
+FILEPATH = "данныепроекта.xlsx"
+SEASON_START = "2024-02-01"
+
+df = heat.load_forcing(FILEPATH)
+df = df[df["date"] >= SEASON_START]
+
+log = []
+
+for station in sorted(df["station_id"].dropna().unique()):
+    dfd = heat.station_days(df, station)
+    if dfd.empty:
+        continue
+
+    # точка годится, только если ряд до её даты не менялся (поправки, запоздавшие наблюдения)
+    state = checkpoints.latest_state(station, dfd=dfd)
+    if state is None:
+        state = heat.initial_state(dfd["Tsurf"].iloc[0], dfd["date"].iloc[0])
+
+    # дни в конце ряда без наблюдений поверхности: Tsurf там только продолжена
+    # interpolate, их считаем в следующий запуск, когда придут данные
+    observed = dfd.apply(heat.surface_bc, axis=1).notna()
+    last_observed = dfd.loc[observed, "date"].max()
+    new_days = dfd[(dfd["date"] > state["date"]) & (dfd["date"] <= last_observed)]
+
+    # по одному шагу на новый день, контрольная точка на каждую дату
+    for i in range(len(new_days)):
+        state, res = heat.advance(state, new_days.iloc[[i]])
+        state["key"] = checkpoints.data_key(dfd, state["date"])
+        checkpoints.save_state(station, state)
+        checkpoints.append_results(station, res)
+
+    log.append({
+        "station_id": station,
+        "region": dfd["region"].iloc[0],
+        "new_days": len(new_days),
+        "last_date": state["date"],
+    })
+
+log = pd.DataFrame(log)
+print("\nОБНОВЛЕНИЕ МОДЕЛИ:")
+print(log.to_string(index=False))
+print(f"\nНовых шагов: {log['new_days'].sum() if not log.empty else 0}")
+
+# таблица результатов для сервиса (python -m flood.api)
+if not log.empty and log["new_days"].sum() > 0:
+    api.publish_results(checkpoints.collect_results())
@@ -0,0 +1,63 @@
+# многолетний непрерывный расчёт: окна 2021 и 2024 стартуют с раскрученного профиля
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flood import basins, heat, spinup
+
+FILEPATH = "данныепроекта.xlsx"
+YEARS = [2021, 2024]
+DATE_RANGE = {
+    2021: ("2021-02-01", "2021-05-01"),
+    2024: ("2024-02-01", "2024-05-01")
+}
+SPINUP_FROM = "2020-10-01"  # одна цепочка на все годы
+
+df = heat.load_forcing(FILEPATH)
+
+all_results = []
+
+for station in sorted(df["station_id"].dropna().unique()):
+    dfd = heat.station_days(df, station)
+    if dfd.empty:
+        continue
+
+    for year in YEARS:
+        date_start, date_end = DATE_RANGE[year]
+        _, res = spinup.run_window(station, dfd, date_start, date_end, start=SPINUP_FROM)
+        res["station_id"] = station
+        res["region"] = dfd["region"].iloc[0]
+        res["year"] = year
+        all_results.append(res)
+
+results_df = pd.concat(all_results)
+
+print("\nРЕЗУЛЬТАТ (раскрученный профиль):")
+print(
+    results_df
+    .groupby(["region", "year"])
+    .agg({
+        "M_rate": ["sum", "max"],
+        "Z_0C": "max",
+        "Q_stok": "sum"
+    })
+    .round(1)
+)
+
+# паводок идёт по бассейнам: сток станций -> приток Тобола, Урала, Илека, Есиля
+basin_df = basins.basin_runoff(results_df)
+basin_df["year"] = basin_df["date"].dt.year
+
+print("\nПРИТОК ПО БАССЕЙНАМ (слой, мм; макс. расход, м³/с):")
+print(
+    basin_df
+    .groupby(["basin", "year"])
+    .agg({
+        "Q_stok_mm": "sum",
+        "inflow_m3s": "max"
+    })
+    .round(1)
+)
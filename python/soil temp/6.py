@@ -1,8 +1,14 @@
+import os
+import sys
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.dates import DateFormatter
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from flood import snowstate
+
 file_path = "почва.xlsx"
 
 df = pd.read_excel(file_path, header=0)
@@ -35,23 +41,23 @@ df = df[df['month'].isin([2, 3, 4])]
 regions = df['region'].unique()
 n = len(regions)
 
-# КЛАССИФИКАЦИЯ СОСТОЯНИЯ СНЕГА
-def classify_snow(temp):
-    if temp < 0:
-        return "Снег (мороз)"
-    if 0 <= temp <= 1.5:
-        return "Мокрый снег"
-    if temp > 1.5:
-        return "Снег растаял"
-    return "Неопределено"
+# КЛАССИФИКАЦИЯ СОСТОЯНИЯ СНЕГА (гистерезис, смена — не меньше 2 дней подряд)
+df['snow_state'] = snowstate.LABELS[snowstate.UNKNOWN]
+transitions = []
+for year, part in df.groupby('year'):
+    codes, tr = snowstate.classify_frame(part, temp='t_surface_mean')
+    df.loc[part.index, 'snow_state'] = snowstate.labels(codes)
+    transitions.append(tr)
+transitions = pd.concat(transitions, ignore_index=True)
 
-df['snow_state'] = df['t_surface_mean'].apply(classify_snow)
+print("Смена состояния снега 2024:")
+print(transitions[transitions['date'].dt.year == 2024].to_string(index=False))
 
 state_colors = {
-    "Снег (мороз)": "blue",
-    "Мокрый снег": "purple",
-    "Снег растаял": "green",
-    "Неопределено": "gray"
+    snowstate.LABELS[snowstate.FROZEN]: "blue",
+    snowstate.LABELS[snowstate.WET]: "purple",
+    snowstate.LABELS[snowstate.MELTED]: "green",
+    snowstate.LABELS[snowstate.UNKNOWN]: "gray"
 }
 
 # АНОМАЛИЯ 2024 – 2021 (по дню-месяцу)
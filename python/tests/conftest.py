@@ -0,0 +1,43 @@
+"""Общие данные тестов: синтетический суточный ряд станций в схеме forcing"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from flood import stations
+
+STATIONS = ["KZ-ATY-01", "KZ-AKT-01", "KZ-KUS-01"]
+
+
+def make_forcing(start="2023-10-01", end="2024-04-30", station_ids=STATIONS, seed=0):
+    """Сезонный ход воздуха и почвы, снег, шум и пропуски (дни и целые отрезки)"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, end, freq="D")
+    doy = dates.dayofyear.to_numpy()
+    parts = []
+    for j, station in enumerate(station_ids):
+        t_air = 4 - 16 * np.cos(2 * np.pi * (doy - 15) / 365.25) + rng.normal(0, 3, len(dates))
+        t_soil = 0.6 * t_air + rng.normal(0, 1, len(dates))
+        snow = np.clip(30 * np.cos(2 * np.pi * (doy - 40) / 365.25) + rng.normal(0, 2, len(dates)), 0, None)
+        part = pd.DataFrame({
+            "region": station[:6], "station_id": station, "date": dates,
+            "t_air_mean": t_air, "t_air_max": t_air + 4, "t_air_min": t_air - 4,
+            "t_soil_mean": t_soil, "snow_height_cm": snow, "soil_code": float(j % 3),
+        })
+        part.loc[rng.random(len(dates)) < 0.2, "t_soil_mean"] = np.nan
+        gap = rng.integers(20, len(dates) - 20)
+        keep = (rng.random(len(dates)) > 0.05) & ((np.arange(len(dates)) < gap) | (np.arange(len(dates)) > gap + 6))
+        parts.append(part[keep])
+    return stations.encode(pd.concat(parts, ignore_index=True))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Пустая рабочая папка: хранилище и контрольные точки по умолчанию — в ней"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
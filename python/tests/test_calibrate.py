@@ -0,0 +1,30 @@
+"""Калибровка: сопряжённый градиент против центральных конечных разностей"""
+
+import numpy as np
+
+from conftest import make_forcing
+from flood import calibrate
+
+
+def test_adjoint_matches_finite_differences():
+    df = make_forcing(start="2023-12-01", end="2024-03-31")
+    batch = calibrate.prepare(df, "2024-02-15", "2024-03-31")
+    rng = np.random.default_rng(1)
+    logp = np.log(calibrate.prior()) + rng.uniform(-0.3, 0.3, len(calibrate.prior()))
+
+    _, g = calibrate.objective(logp, batch)
+    eps = 1e-5
+    fd = np.empty_like(g)
+    for i in range(len(logp)):
+        e = np.zeros_like(logp)
+        e[i] = eps
+        fd[i] = (calibrate.objective(logp + e, batch)[0] - calibrate.objective(logp - e, batch)[0]) / (2 * eps)
+    np.testing.assert_allclose(g, fd, rtol=1e-5, atol=1e-9 * np.abs(fd).max())
+    assert abs(g[-1]) > 0  # k_snow действительно входит в невязку
+
+
+def test_names_match_vector():
+    assert len(calibrate.names()) == len(calibrate.prior())
+    kappa, factor, k_snow = calibrate.unpack(calibrate.prior())
+    assert factor[calibrate.REFERENCE_CODE] == 1.0
+    assert k_snow == calibrate.heat.k_snow
@@ -0,0 +1,63 @@
+"""Нормы по дням года: порядок пакетов, правки, флаги QC, рост реестра"""
+
+import numpy as np
+import pandas as pd
+
+from conftest import make_forcing
+from flood import climatology, stations
+
+VARS = ["t_air_mean", "snow_height_cm"]
+
+
+def state(root):
+    return {v: climatology.load(v, root) for v in VARS}
+
+
+def assert_same(a, b):
+    for v in VARS:
+        np.testing.assert_array_equal(a[v]["n"], b[v]["n"])
+        np.testing.assert_array_equal(a[v]["hist"], b[v]["hist"])
+        np.testing.assert_allclose(a[v]["mean"], b[v]["mean"], atol=1e-9)
+        np.testing.assert_allclose(a[v]["M2"], b[v]["M2"], atol=1e-6)
+        np.testing.assert_array_equal(a[v]["absorbed"], b[v]["absorbed"])
+
+
+def test_order_independent(tmp_path):
+    df = make_forcing(start="2021-10-01", end="2024-04-30")
+    climatology.update(df, VARS, tmp_path / "full")
+    root = tmp_path / "parts"
+    late, early = df[df["date"] >= "2023-01-01"], df[df["date"] < "2023-01-01"]
+    climatology.update(late, VARS, root)
+    assert climatology.update(early, VARS, root)["t_air_mean"] == early["t_air_mean"].notna().sum()
+    assert climatology.update(df, VARS, root) == {v: 0 for v in VARS}
+    assert_same(state(tmp_path / "full"), state(root))
+
+
+def test_revised_and_flagged_days(tmp_path):
+    df = make_forcing()
+    root = tmp_path / "inc"
+    climatology.update(df, VARS, root)
+
+    df = df.copy()
+    fix = df.index[df["date"] == "2024-01-15"]
+    df.loc[fix, "t_air_mean"] += 7.0
+    df["qc_t_air_mean"] = np.uint8(0)
+    df.loc[df["date"] == "2024-02-03", "qc_t_air_mean"] = np.uint8(1)
+    assert climatology.update(df, VARS, root)["t_air_mean"] == len(fix) + (df["qc_t_air_mean"] > 0).sum()
+    climatology.update(df, VARS, tmp_path / "fresh")
+    assert_same(state(root), state(tmp_path / "fresh"))
+
+
+def test_registry_grows(tmp_path, monkeypatch):
+    df = make_forcing()
+    full = list(stations.STATION_DTYPE.categories)
+    # реестр без второй станции: коды всех следующих сдвинуты на один
+    monkeypatch.setattr(stations, "STATION_DTYPE", pd.CategoricalDtype(full[:1] + full[2:]))
+    climatology.update(df, VARS, tmp_path / "old")
+    monkeypatch.undo()
+
+    grown = state(tmp_path / "old")
+    assert grown["t_air_mean"]["n"].shape[0] == len(full)
+    climatology.update(df, VARS, tmp_path / "new")
+    assert_same(grown, state(tmp_path / "new"))
+    assert climatology.update(df, VARS, tmp_path / "old") == {v: 0 for v in VARS}
@@ -0,0 +1,51 @@
+"""Хранилище признаков: инкрементальное обновление против полной сборки"""
+
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from conftest import make_forcing
+from flood import features, store
+
+
+def rebuild():
+    shutil.rmtree(f"{store.STORE_DIR}/{features.FEATURES_TABLE}")
+    features.update()
+    return features.read()
+
+
+def test_incremental_matches_full(workdir):
+    df = make_forcing()
+    store.write_table("forcing", df[df["date"] < "2024-03-15"])
+    features.update()
+    store.write_table("forcing", df)
+    n = features.update(since=pd.Timestamp("2024-03-15"))
+    inc = features.read()
+    full = rebuild()
+    assert 0 < n < len(full)
+    pd.testing.assert_frame_equal(inc, full, check_exact=False, atol=1e-9)
+
+
+def test_revised_history_recomputed(workdir):
+    df = make_forcing()
+    store.write_table("forcing", df)
+    features.update()
+    df.loc[df["date"] == "2024-02-10", "t_air_mean"] += 15.0
+    store.write_table("forcing", df)
+    n = features.update()  # новых дней нет, но февраль изменился: пересчёт с 1 февраля
+    inc = features.read()
+    full = rebuild()
+    assert n == (full["date"] >= "2024-02-01").sum()
+    pd.testing.assert_frame_equal(inc, full, check_exact=False, atol=1e-9)
+
+
+def test_ddf_days_counts_observed_days(workdir):
+    df = make_forcing(start="2024-02-01")
+    store.write_table("forcing", df)
+    features.update(model=False)
+    out = features.read(["ddf_pos", "ddf_days"])
+    for station, part in out.groupby("station_id", observed=True):
+        n = df[df["station_id"] == station].sort_values("date")["t_air_mean"].notna().cumsum()
+        assert np.array_equal(part["ddf_days"].to_numpy(), n.to_numpy(dtype=float))
+    assert out["ddf_days"].max() < (pd.Timestamp("2024-04-30") - pd.Timestamp("2023-10-01")).days
@@ -0,0 +1,60 @@
+"""Флаги QC: инкрементальный прогон с since совпадает с полным"""
+
+import numpy as np
+import pandas as pd
+
+from conftest import make_forcing
+from flood import qc, store
+
+CUT = pd.Timestamp("2024-02-01")
+
+
+def forcing():
+    """Ряд с выбросами, скачком и серией одинаковых значений у границы CUT"""
+    df = make_forcing().sort_values(["date", "station_id"], ignore_index=True)
+    s0 = df["station_id"] == df["station_id"].iloc[0]
+    day = df["date"]
+    df.loc[s0 & (day == CUT - pd.Timedelta(days=1)), "t_air_mean"] += 30   # SPIKE накануне CUT
+    df.loc[s0 & (day == CUT + pd.Timedelta(days=3)), "t_air_mean"] = 70    # RANGE в новых днях
+    run = s0 & (day >= CUT - pd.Timedelta(days=3)) & (day < CUT + pd.Timedelta(days=3))
+    df.loc[run, "t_soil_mean"] = -1.5                                       # PERSIST через CUT
+    df.loc[df["date"] == CUT + pd.Timedelta(days=10), "snow_height_cm"] = 250  # STEP
+    df.loc[s0 & (day == CUT - pd.Timedelta(days=60)), "snow_height_cm"] = -5     # RANGE в старых днях
+    return df
+
+
+def grow(df, root, drop=()):
+    """Старые дни с их флагами, затем новые дни в конец таблицы (как дописывает загрузка)"""
+    old, new = df[df["date"] < CUT], df[df["date"] >= CUT]
+    store.write_table("t", old, root)
+    flags = qc.run_table("t", root=root)
+    old = old.assign(**{q: f for q, f in flags.items() if q not in drop})
+    new = new.assign(**{q: np.uint8(0) for q in flags if q not in drop})
+    df = pd.concat([old, new], ignore_index=True)
+    store.write_table("t", df, root)
+    return df
+
+
+def assert_same(flags, df):
+    full = qc.run(df, list(qc.LIMITS))
+    assert set(flags) == set(full)
+    for q in full:
+        np.testing.assert_array_equal(flags[q], full[q], err_msg=q)
+
+
+def test_incremental_equals_full(tmp_path):
+    df = grow(forcing(), tmp_path)
+    flags = qc.run_table("t", since=CUT, root=tmp_path)
+    assert_same(flags, df)
+    assert flags["qc_t_air_mean"].any() and flags["qc_t_soil_mean"].any() and flags["qc_snow_height_cm"].any()
+    stored = store.read_table("t", list(flags), tmp_path)
+    for q, f in flags.items():
+        np.testing.assert_array_equal(stored[q].to_numpy(), f)
+
+
+def test_new_column_full_pass(tmp_path):
+    df = grow(forcing(), tmp_path, drop=["qc_snow_height_cm"])
+    flags = qc.run_table("t", since=CUT, root=tmp_path)
+    assert_same(flags, df)
+    early = (df["date"] < CUT - pd.Timedelta(days=qc.WINDOW_DAYS)).to_numpy()
+    assert flags["qc_snow_height_cm"][early].any()
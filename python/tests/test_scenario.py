@@ -0,0 +1,44 @@
+"""Сценарии: этап с тем же ключом берётся из кэша, правка параметров пересчитывает только зависящие этапы"""
+
+import pandas as pd
+
+from conftest import make_forcing
+from flood import scenario, store
+
+CFG = {"name": "test", "years": [2024], "date_range": {2024: ["2024-02-01", "2024-03-15"]},
+       "spinup_from": "2023-10-01"}
+
+
+def setup(tmp_path):
+    store.write_table("forcing", make_forcing()[scenario.FORCING_COLUMNS], tmp_path / "store")
+    return {"root": tmp_path / "store", "cache": str(tmp_path / "cache")}
+
+
+def test_second_run_reuses_all(tmp_path):
+    where = setup(tmp_path)
+    first = scenario.run(CFG, **where)
+    assert not any(first["reused"].values())
+    second = scenario.run(CFG, **where)
+    assert all(second["reused"].values())
+    assert second["keys"] == first["keys"]
+    # из кэша station_id и region приходят категориальными: сравниваются значения
+    pd.testing.assert_frame_equal(second["results"], first["results"], check_dtype=False, check_categorical=False)
+
+
+def test_darsi_params_recompute_runoff_only(tmp_path):
+    where = setup(tmp_path)
+    first = scenario.run(CFG, **where)
+    cfg = dict(CFG, darsi_params={"KZ-ATY": {"K_sat": 1.0, "psi_f": 5}})
+    out = scenario.run(cfg, **where)
+    assert out["reused"] == {"forcing": True, "profiles": True, "runoff": False}
+    aty = (out["results"]["region"] == "KZ-ATY").to_numpy()
+    assert (out["results"]["q_infil"] != first["results"]["q_infil"])[aty].any()
+    pd.testing.assert_series_equal(out["results"]["q_infil"][~aty], first["results"]["q_infil"][~aty])
+
+
+def test_new_data_recompute_all(tmp_path):
+    where = setup(tmp_path)
+    scenario.run(CFG, **where)
+    store.write_table("forcing", make_forcing(seed=1)[scenario.FORCING_COLUMNS], where["root"])
+    out = scenario.run(CFG, **where)
+    assert not any(out["reused"].values())
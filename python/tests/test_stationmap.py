@@ -0,0 +1,22 @@
+"""Карта станций: строки csv вне реестра не теряются"""
+
+import pandas as pd
+import pytest
+
+from flood import stationmap
+
+
+def test_unmatched_rows_kept(tmp_path):
+    path = tmp_path / "coords.csv"
+    pd.DataFrame({
+        "stn": ["Атырау", "Ганюшкино", "Неизвестная", "АТЫРАУ"],
+        "region": ["KZ-ATY", "KZ-ATY", "KZ-AKT", "KZ-ATY"],
+        "latitude": [47.1, 46.6, 50.0, 47.2],
+        "longitude": [51.9, 49.3, 57.0, 51.8],
+    }).to_csv(path, index=False, encoding="utf-8")
+
+    with pytest.warns(UserWarning, match="Неизвестная"):
+        df = stationmap.points(path)
+    assert len(df) == 4
+    assert df["in_registry"].sum() == 2
+    assert set(df.loc[~df["in_registry"], "latitude"]) == {50.0, 47.2}
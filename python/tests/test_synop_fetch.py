@@ -0,0 +1,74 @@
+"""Загрузчик SYNOP против локальной заглушки: повторы на 429/5xx и кэш
+
+Запуск из папки python:  python -m pytest tests
+"""
+
+import asyncio
+import os
+import socket
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from flood import synop_fetch, synop_mock
+
+WMO = [35394, 35188]
+DAYS = ("2024-03-01", "2024-03-03")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind((synop_mock.HOST, 0))
+        return s.getsockname()[1]
+
+
+def fetch(cache_dir, start, end, fail_every=0, fail_status=503, retries=synop_fetch.RETRIES):
+    """fetch_all против заглушки; вернуть (ответы, число запросов к заглушке)"""
+    async def go():
+        runner, url = await synop_mock.start(port=free_port(), fail_every=fail_every, fail_status=fail_status)
+        try:
+            out = await synop_fetch.fetch_all(WMO, start, end, base_url=url, cache_dir=cache_dir,
+                                              rate=0, retries=retries, backoff=0)
+        finally:
+            await runner.cleanup()
+        return out, runner.app[synop_mock.COUNTER]["n"]
+    return asyncio.run(go())
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retry(tmp_path, status):
+    out, n = fetch(str(tmp_path), *DAYS, fail_every=2, fail_status=status)
+    assert len(out) == len(WMO) * 3
+    assert not [v for v in out.values() if isinstance(v, Exception)]
+    assert n > len(out)  # сбойные запросы повторены
+    for (wmo, day), text in out.items():
+        assert text.startswith(f"{wmo:05d},{day:%Y,%m,%d},00,00,AAXX")
+
+
+def test_retries_exhausted(tmp_path):
+    out, _ = fetch(str(tmp_path), *DAYS, fail_every=1, retries=1)
+    assert all(isinstance(v, RuntimeError) for v in out.values())
+    assert not os.path.exists(os.path.join(tmp_path, str(WMO[0])))
+
+
+def test_cache_hit(tmp_path):
+    first, _ = fetch(str(tmp_path), *DAYS)
+    assert os.path.exists(synop_fetch.cache_path(WMO[0], pd.Timestamp(DAYS[0]), str(tmp_path)))
+    # заглушка отвечает только ошибками — всё должно прийти из кэша
+    second, n = fetch(str(tmp_path), *DAYS, fail_every=1, retries=0)
+    assert n == 0
+    assert second == first
+
+
+def test_fresh_days_not_cached(tmp_path):
+    today = pd.Timestamp.now(tz="UTC").tz_localize(None).normalize()
+    start = today - pd.Timedelta(days=synop_fetch.FRESH_DAYS)
+    out, _ = fetch(str(tmp_path), start, today)
+    assert not [v for v in out.values() if isinstance(v, Exception)]
+    cached = {day for _, day in out if os.path.exists(synop_fetch.cache_path(WMO[0], day, str(tmp_path)))}
+    assert cached == {start}
+    _, n = fetch(str(tmp_path), start, today)
+    assert n == len(WMO) * synop_fetch.FRESH_DAYS  # сегодня и вчера запрошены заново